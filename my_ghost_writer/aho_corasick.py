@@ -0,0 +1,69 @@
+from collections import deque
+from typing import Iterator
+
+
+class AhoCorasickAutomaton:
+    """
+    Aho-Corasick automaton matching many patterns within a text in a single pass: the scan is linear in the text length
+    plus the number of matches, whatever the number of patterns.
+    """
+    def __init__(self, patterns: list[str]):
+        self.patterns = patterns
+        # the goto transitions, the failure link and the ids of the patterns ending at every node
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.outputs: list[list[int]] = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            self._add_pattern(pattern_id, pattern)
+        # the nearest node along the failure links with some outputs, to emit the matches without walking all the links
+        self.output_link: list[int] = [0] * len(self.goto)
+        self._build_links()
+
+    def _add_pattern(self, pattern_id: int, pattern: str) -> None:
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = self.goto[node][char] = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+            node = next_node
+        self.outputs[node].append(pattern_id)
+
+    def _build_links(self) -> None:
+        # breadth first, so the failure link of every node (a shorter suffix) is set before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            fail_node = self.fail[node]
+            self.output_link[node] = fail_node if self.outputs[fail_node] else self.output_link[fail_node]
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = fail_node
+                while char not in self.goto[state] and state:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int, int]]:
+        """
+        Find all the (possibly overlapping) occurrences of the patterns within the text.
+
+        Args:
+            text (str): the text to scan.
+
+        Returns:
+            Iterator[tuple[int, int, int]]: a generator of (start, end, pattern id) tuples, sorted by end offset.
+        """
+        node = 0
+        for i, char in enumerate(text):
+            while char not in self.goto[node] and node:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            output_node = node
+            while output_node:
+                for pattern_id in self.outputs[output_node]:
+                    yield i + 1 - len(self.patterns[pattern_id]), i + 1, pattern_id
+                output_node = self.output_link[output_node]
@@ -0,0 +1,170 @@
+import hashlib
+import threading
+import uuid
+from array import array
+from collections import Counter
+
+from my_ghost_writer.constants import app_logger, ANALYSIS_SESSION_MAX_ITEMS
+from my_ghost_writer.result_cache import ResultCache
+from my_ghost_writer.text_parsers import count_ngrams_ids, get_ngram_stem, get_rows_indices, tokenize_with_spans
+from my_ghost_writer.type_hints import RequestTextRowsParentList, TextNgramsCount, TokenFilter
+
+
+def get_row_hash(row: str) -> str:
+    """Get the content hash of a single text row."""
+    return hashlib.blake2b(row.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class AnalysisSession:
+    """
+    Incremental n-grams count of a document edited over time. The n-grams of every distinct row are counted
+    only once and kept keyed by the row content hash: on update() only the added rows are tokenized and stemmed,
+    while the contributions of the removed rows are subtracted from the n-grams counts.
+    Since n-grams never cross the rows, the per-row contributions are exact and don't depend on the row position.
+    """
+    def __init__(self, n: int = 3, token_filters: list[TokenFilter] | None = None):
+        self.session_id = uuid.uuid4().hex
+        self.n = n
+        self.token_filters = token_filters
+        self.stems_list: list[str] = []
+        self.stems_ids: dict[str, int] = {}
+        # row hash => n-grams occurrences within the row, as flat [start, end, start, end, ...] arrays
+        self.rows_ngrams: dict[str, dict[int | tuple[int, ...], array]] = {}
+        # row hash => number of current rows with that content
+        self.rows_refs: Counter[str] = Counter()
+        self.rows_hashes: list[str] = []
+        self.valid_textrows_with_num: RequestTextRowsParentList = []
+        self.ngram_counts: Counter[int | tuple[int, ...]] = Counter()
+        self.lock = threading.Lock()
+
+    def update(self, valid_textrows_with_num: RequestTextRowsParentList) -> dict:
+        """
+        Replace the session text rows, counting only the rows not already within the session.
+
+        Args:
+            valid_textrows_with_num (list[dict]): the new text rows dicts, see text_parsers.get_valid_textrows_with_num().
+
+        Returns:
+            dict: a dict with the number of "added_rows" and "removed_rows" and the "counts_delta" dict with the
+                new count of every n-gram stem whose count changed (0 for the removed ones).
+        """
+        with self.lock:
+            rows_hashes = [get_row_hash(textrow["text"]) for textrow in valid_textrows_with_num]
+            new_refs = Counter(rows_hashes)
+            removed_refs = self.rows_refs - new_refs
+            added_refs = new_refs - self.rows_refs
+            new_rows = {}
+            for textrow, row_hash in zip(valid_textrows_with_num, rows_hashes):
+                if row_hash in added_refs and row_hash not in self.rows_ngrams:
+                    new_rows[row_hash] = textrow["text"]
+            self._count_rows(new_rows)
+
+            # net count change of every n-gram within the removed or added rows
+            keys_delta: Counter[int | tuple[int, ...]] = Counter()
+            for row_hash, n_removed in removed_refs.items():
+                for ngram_key, spans in self.rows_ngrams[row_hash].items():
+                    keys_delta[ngram_key] -= n_removed * (len(spans) // 2)
+                if n_removed == self.rows_refs[row_hash]:
+                    del self.rows_ngrams[row_hash]
+            for row_hash, n_added in added_refs.items():
+                for ngram_key, spans in self.rows_ngrams[row_hash].items():
+                    keys_delta[ngram_key] += n_added * (len(spans) // 2)
+            counts_delta = {}
+            for ngram_key, delta in keys_delta.items():
+                if not delta:
+                    continue
+                count = self.ngram_counts[ngram_key] + delta
+                if count > 0:
+                    self.ngram_counts[ngram_key] = count
+                else:
+                    del self.ngram_counts[ngram_key]
+                counts_delta[get_ngram_stem(self.stems_list, ngram_key)] = count
+
+            self.rows_refs = new_refs
+            self.rows_hashes = rows_hashes
+            self.valid_textrows_with_num = valid_textrows_with_num
+        n_added_rows, n_removed_rows = sum(added_refs.values()), sum(removed_refs.values())
+        app_logger.info(f"session {self.session_id}: {n_added_rows} added rows, {n_removed_rows} removed rows, "
+                        f"{len(new_rows)} counted rows, {len(counts_delta)} changed n-grams.")
+        return {"added_rows": n_added_rows, "removed_rows": n_removed_rows, "counts_delta": counts_delta}
+
+    def _count_rows(self, new_rows: dict[str, str]) -> None:
+        """
+        Count the n-grams of the given rows (keyed by row hash) one row at a time, to keep the same n-grams order
+        (unigrams, then bigrams, ...) used by count_ngrams_ids() within every row, remapping their stem ids to the session ones.
+        """
+        for row_hash, row in new_rows.items():
+            row_stems_list, row_ngram_occurrences = count_ngrams_ids(
+                (tokenize_with_spans(row),), n=self.n, token_filters=self.token_filters
+            )
+            row_ids = []
+            for stem in row_stems_list:
+                stem_id = self.stems_ids.get(stem)
+                if stem_id is None:
+                    stem_id = self.stems_ids[stem] = len(self.stems_list)
+                    self.stems_list.append(stem)
+                row_ids.append(stem_id)
+            row_ngrams = {}
+            for row_key, row_occurrences in row_ngram_occurrences.items():
+                if isinstance(row_key, int):
+                    ngram_key = row_ids[row_key]
+                else:
+                    ngram_key = tuple([row_ids[stem_id] for stem_id in row_key])
+                # drop the row positions (always zero), keeping the [start, end, ...] values
+                del row_occurrences[0::3]
+                row_ngrams[ngram_key] = row_occurrences
+            self.rows_ngrams[row_hash] = row_ngrams
+
+    def get_ngrams_count(self) -> TextNgramsCount:
+        """
+        Assemble the per-row contributions in the same TextNgramsCount produced by text_parsers.count_text_ngrams()
+        for the current rows, without tokenizing or stemming them again.
+
+        Returns:
+            TextNgramsCount: the interned stems, the n-grams occurrences and the rows indices.
+        """
+        with self.lock:
+            _, idx_rows, idx_rows_child, idx_rows_parent, rows_dict = get_rows_indices(self.valid_textrows_with_num)
+            ngram_occurrences: dict[int | tuple[int, ...], array] = {}
+            for n_row_position, row_hash in enumerate(self.rows_hashes):
+                for ngram_key, spans in self.rows_ngrams[row_hash].items():
+                    occurrences = ngram_occurrences.get(ngram_key)
+                    if occurrences is None:
+                        occurrences = ngram_occurrences[ngram_key] = array("l")
+                    for j in range(0, len(spans), 2):
+                        occurrences.extend((n_row_position, spans[j], spans[j + 1]))
+            return {
+                "n_total_rows": len(self.rows_hashes),
+                "stems_list": list(self.stems_list),
+                "ngram_occurrences": ngram_occurrences,
+                "idx_rows": idx_rows,
+                "idx_rows_child": idx_rows_child,
+                "idx_rows_parent": idx_rows_parent,
+                "rows_dict": rows_dict
+            }
+
+
+def get_analysis_session(session_id: str | None, n: int = 3, token_filters: list[TokenFilter] | None = None) -> AnalysisSession:
+    """
+    Get an analysis session by id, or create a new one when missing (no session id, expired or evicted session)
+    or created with different n-grams order or token filters.
+
+    Args:
+        session_id (str | None): the id of an existing session.
+        n (int): The maximum number of words to consider for n-grams.
+        token_filters (list[str] | None): the token filters applied before counting, see text_parsers.count_ngrams_ids().
+
+    Returns:
+        AnalysisSession: the existing or the new analysis session.
+    """
+    if session_id is not None:
+        session = analysis_sessions.get(session_id)
+        if session is not None and session.n == n and sorted(session.token_filters or []) == sorted(token_filters or []):
+            return session
+        app_logger.info(f"session {session_id} not found or with different parameters, creating a new one...")
+    session = AnalysisSession(n=n, token_filters=token_filters)
+    analysis_sessions.set(session.session_id, session)
+    return session
+
+
+analysis_sessions = ResultCache(ANALYSIS_SESSION_MAX_ITEMS)
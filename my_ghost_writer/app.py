@@ -1,8 +1,10 @@
 import asyncio
 import http
 import json
+import re
 from datetime import datetime
 from http.client import responses
+from typing import Any, Callable, Iterator
 
 import requests
 import uvicorn
@@ -13,21 +15,38 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import ValidationError
 from pymongo import __version__ as pymongo_version
 from pymongo.errors import PyMongoError
 
 from my_ghost_writer import pymongo_operations_rw
+from my_ghost_writer.analysis_session import analysis_sessions, get_analysis_session
+from my_ghost_writer.document_registry import document_registry, get_document_sentences_boundaries, get_document_textrows
+from my_ghost_writer.echoes import get_echoes
+from my_ghost_writer.frequency_delta import get_ngrams_count_delta
+from my_ghost_writer.heavy_hitters import count_text_ngrams_heavy_hitters
+from my_ghost_writer.inverted_index import get_inverted_index, inverted_indexes
+from my_ghost_writer.near_duplicates import get_near_duplicate_sentences
 from my_ghost_writer import text_parsers
-from my_ghost_writer.constants import (ALLOWED_ORIGIN_LIST, API_MODE, DOMAIN, IS_TESTING, LOG_LEVEL,
+from my_ghost_writer.constants import (ALLOWED_ORIGIN_LIST, API_MODE, DOMAIN, HEAVY_HITTERS_TOP_K, IS_TESTING, LOG_LEVEL,
    ME_CONFIG_MONGODB_HEALTHCHECK_SLEEP, ME_CONFIG_MONGODB_USE_OK, PORT, RAPIDAPI_HOST, STATIC_FOLDER,
-   STATIC_FOLDER_LITEKOBOLDAINET, WORDSAPI_KEY, WORDSAPI_URL, app_logger)
+   STATIC_FOLDER_LITEKOBOLDAINET, TOKEN_FILTERS, WORDSAPI_KEY, WORDSAPI_URL, app_logger)
 from my_ghost_writer.pymongo_utils import mongodb_health_check
-from my_ghost_writer.text_parsers2 import find_synonyms_for_phrase, custom_synonym_handler
+from my_ghost_writer.reference_frequencies import get_overuse_scores, get_reference_frequencies
+from my_ghost_writer.repeated_phrases import get_repeated_phrases
+from my_ghost_writer.result_cache import words_frequency_cache
+from my_ghost_writer.text_parsers2 import (count_text_ngrams_lemmas_cached, find_synonyms_for_phrase, custom_synonym_handler,
+    get_document_doc)
 from my_ghost_writer.thesaurus import get_current_info_wordnet
+from my_ghost_writer.words_frequency_search import search_index_cache, search_words_frequency
 from my_ghost_writer.type_hints import (RequestQueryThesaurusInflatedBody, RequestQueryThesaurusWordsapiBody,
-    RequestSplitText, RequestTextFrequencyBody, MultiWordSynonymResponse, CustomSynonymRequest)
+    RequestSplitText, RequestTextFrequencyBody, MultiWordSynonymResponse, CustomSynonymRequest, TextNgramsCount,
+    RequestWordsFrequencyOffsetsBody, RequestWordsFrequencySessionBody, RequestRepeatedPhrasesBody,
+    RequestEchoesBody, RequestIndexChapterBody, RequestIndexSearchBody, RequestIndexFrequenciesBody,
+    RequestNearDuplicatesBody, RequestWordsFrequencyDeltaBody, RequestSplitTextBatch, RequestDocumentBody,
+    RequestWordsFrequencySearchBody, RequestCustomLexiconMatchesBody, RequestCountedTextBody)
 
 
 async def mongo_health_check_background_task():
@@ -43,6 +62,7 @@ async def mongo_health_check_background_task():
 async def lifespan(app: FastAPI):
     task = asyncio.create_task(mongo_health_check_background_task())
     yield
+    text_parsers.shutdown_process_pool()
     task.cancel()
     try:
         await task
@@ -104,27 +124,413 @@ def health_mongo() -> str:
     return f"ME_CONFIG_MONGODB_USE_OK:{ME_CONFIG_MONGODB_USE_OK}..."
 
 
-@app.post("/words-frequency")
-def get_words_frequency(body: RequestTextFrequencyBody | str) -> JSONResponse:
+def stream_words_frequency_ndjson(
+        ngrams_count: TextNgramsCount,
+        t0: datetime,
+        cache_hit: bool,
+        content_hash: str | None = None,
+        offsets_limit: int | None = None,
+        histograms: dict[str, list[int]] | None = None,
+        collocations: list[dict] | None = None,
+        overuse: dict[str, dict] | None = None
+) -> Iterator[str]:
+    """
+    Stream the words frequency as NDJSON: a header line with the number of total rows, the cache hit flag, the content
+    hash and, if given, the collocations, then one line for every n-gram entry (with its "stem" key and, if given, its "histogram" and
+    its "overuse" score) and a trailer line with the duration.
+    """
+    header = {"n_total_rows": ngrams_count["n_total_rows"], "cache_hit": cache_hit, "content_hash": content_hash}
+    if collocations is not None:
+        header["collocations"] = collocations
+    yield json.dumps(header) + "\n"
+    for ngram_stem, entry in text_parsers.iter_words_frequency_from_count(ngrams_count, offsets_limit=offsets_limit):
+        if histograms is not None:
+            entry["histogram"] = histograms[ngram_stem]
+        if overuse is not None and ngram_stem in overuse:
+            entry["overuse"] = overuse[ngram_stem]
+        yield json.dumps({"stem": ngram_stem, **entry}) + "\n"
+    duration = (datetime.now() - t0).total_seconds()
+    app_logger.info(f"streamed words frequency, duration: {duration:.3f}s.")
+    yield json.dumps({"duration": f"{duration:.3f}"}) + "\n"
+
+
+def get_document_artifact(get_artifact: Callable[[str], Any], document_id: str) -> Any:
+    """Get the text or a derived artifact of a registered document, with a 404 error if missing or evicted."""
+    try:
+        return get_artifact(document_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Document '{document_id}' not found, upload it again with /documents.")
+
+
+def get_counted_text(body_validated: RequestCountedTextBody) -> tuple[TextNgramsCount, str, bool]:
+    """
+    Get the counted n-grams of a request body, by the content hash returned by /words-frequency (with a 404 error if
+    no longer cached) or by counting (or reading from the cache) its text or document.
+    """
+    if body_validated.content_hash is not None:
+        ngrams_count = words_frequency_cache.get(body_validated.content_hash)
+        if ngrams_count is None:
+            raise HTTPException(status_code=404, detail="No cached analysis found for 'content_hash'.")
+        return ngrams_count, body_validated.content_hash, True
+    if body_validated.document_id is None:
+        text = body_validated.text
+    else:
+        text = get_document_artifact(get_document_textrows, body_validated.document_id)
+    token_filters = TOKEN_FILTERS if body_validated.token_filters is None else body_validated.token_filters
+    return text_parsers.count_text_ngrams_cached(text, token_filters=token_filters)
+
+
+@app.get("/health-cache")
+def health_cache() -> JSONResponse:
+    return JSONResponse(status_code=200, content={
+        "words_frequency": words_frequency_cache.get_stats(),
+        "words_frequency_search": search_index_cache.get_stats(),
+        "stems": text_parsers.get_stem_cache_info(),
+        "analysis_sessions": analysis_sessions.get_stats(),
+        "sentences_boundaries": text_parsers.sentences_boundaries_cache.get_stats(),
+        "documents": document_registry.get_stats(),
+        "inverted_indexes": inverted_indexes.get_stats()
+    })
+
+
+@app.post("/documents")
+def add_document(body: RequestDocumentBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestDocumentBody.model_validate_json(body)
+    try:
+        content_response = document_registry.add(body_validated.text)
+    except ValueError as ex:
+        raise HTTPException(status_code=413, detail=str(ex))
+    duration = (datetime.now() - t0).total_seconds()
+    content_response["duration"] = f"{duration:.3f}"
+    return JSONResponse(status_code=200, content=content_response)
+
+
+@app.delete("/documents/{document_id}")
+def delete_document(document_id: str) -> JSONResponse:
+    get_document_artifact(document_registry.remove, document_id)
+    return JSONResponse(status_code=200, content={"document_id": document_id})
+
+
+@app.post("/words-frequency", response_model=None)
+def get_words_frequency(body: RequestTextFrequencyBody | str) -> JSONResponse | StreamingResponse:
     t0 = datetime.now()
     app_logger.info(f"body type: {type(body)}.")
     app_logger.debug(f"body: {body}.")
     body_validated = RequestTextFrequencyBody.model_validate_json(body)
-    text = body_validated.text
+    if body_validated.document_id is None:
+        text = body_validated.text
+    else:
+        text = get_document_artifact(get_document_textrows, body_validated.document_id)
     app_logger.info(f"LOG_LEVEL: '{LOG_LEVEL}', length of text: {len(text)}, type of 'text':'{type(text)}'.")
     if len(text) < 100:
         app_logger.debug(f"text from request: {text} ...")
-    n_total_rows, words_stems_dict = text_parsers.text_stemming(text)
-    dumped = json.dumps(words_stems_dict)
-    app_logger.debug(f"dumped: {dumped} ...")
+    token_filters = TOKEN_FILTERS if body_validated.token_filters is None else body_validated.token_filters
+    # a single pipeline: count the n-grams, score the optional parts needing all the counts, filter, add the other
+    # optional parts and render, so every response has the same keys (null for the optional parts not requested)
+    heavy_hitters_info = None
+    reference = None
+    if body_validated.grouping == "lemma" and body_validated.approximate:
+        raise HTTPException(status_code=422, detail="The lemmas are always counted exactly, the approximate counts work only on the stems.")
+    if body_validated.collocations and body_validated.approximate:
+        # the heavy hitters keep only the top_k n-grams, so the unigrams marginals and the tokens total would be wrong
+        raise HTTPException(status_code=422, detail="The collocations need the exact counts, not the approximate ones.")
+    if body_validated.overuse_reference:
+        if body_validated.grouping == "lemma":
+            raise HTTPException(status_code=422, detail="The overuse reference frequencies are keyed by stem, not by lemma.")
+        if body_validated.approximate:
+            # the text relative frequencies would be computed only on the top_k unigrams
+            raise HTTPException(status_code=422, detail="The overuse scores need the exact counts, not the approximate ones.")
+        try:
+            reference = get_reference_frequencies(body_validated.overuse_reference)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Reference frequencies '{body_validated.overuse_reference}' not found.")
+    if body_validated.grouping == "lemma":
+        # the offsets omitted by offsets_limit are paged by /words-frequency-offsets with the returned content_hash,
+        # since sending the text again would count the stems
+        ngrams_count, content_hash, cache_hit = count_text_ngrams_lemmas_cached(text, token_filters=token_filters)
+    elif body_validated.approximate:
+        ngrams_count, heavy_hitters_info = count_text_ngrams_heavy_hitters(
+            text, top_k=body_validated.top_k or HEAVY_HITTERS_TOP_K, token_filters=token_filters
+        )
+        content_hash, cache_hit = None, False
+    else:
+        ngrams_count, content_hash, cache_hit = text_parsers.count_text_ngrams_cached(text, token_filters=token_filters)
+    collocations = None
+    if body_validated.collocations:
+        # scored before filtering, on the complete unigrams and bigrams counts
+        collocations = text_parsers.get_bigrams_collocations(
+            ngrams_count,
+            min_count=body_validated.collocations_min_count,
+            sort_by=body_validated.collocations,
+            top_k=body_validated.collocations_top_k
+        )
+    # scored before filtering, too, so the text frequencies are relative to all the words
+    overuse = None if reference is None else get_overuse_scores(ngrams_count, reference)
+    ngrams_count = text_parsers.filter_ngrams_count(
+        ngrams_count,
+        min_count=body_validated.min_count,
+        top_k=body_validated.top_k,
+        n_words_ngram=body_validated.n_words_ngram
+    )
+    histograms = None
+    if body_validated.histogram_bins:
+        histograms = text_parsers.get_ngrams_histograms(
+            ngrams_count, n_bins=body_validated.histogram_bins, histogram_by=body_validated.histogram_by
+        )
+    if overuse is not None:
+        kept_stems = {
+            text_parsers.get_ngram_stem(ngrams_count["stems_list"], ngram_key) for ngram_key in ngrams_count["ngram_occurrences"]
+        }
+        overuse = {stem: score for stem, score in overuse.items() if stem in kept_stems}
+    if body_validated.format == "ndjson":
+        return StreamingResponse(
+            stream_words_frequency_ndjson(
+                ngrams_count, t0, cache_hit, content_hash=content_hash, offsets_limit=body_validated.offsets_limit,
+                histograms=histograms, collocations=collocations, overuse=overuse
+            ),
+            media_type="application/x-ndjson"
+        )
+    words_stems_dict = text_parsers.get_words_frequency_from_count(
+        ngrams_count, response_format=body_validated.format, offsets_limit=body_validated.offsets_limit
+    )
+    duration = (datetime.now() - t0).total_seconds()
+    content_response = {
+        "words_frequency": json.dumps(words_stems_dict),
+        "duration": f"{duration:.3f}",
+        "n_total_rows": ngrams_count["n_total_rows"],
+        "cache_hit": cache_hit,
+        "content_hash": content_hash,
+        "heavy_hitters": heavy_hitters_info,
+        "histograms": histograms,
+        "collocations": collocations,
+        "overuse": overuse
+    }
+    app_logger.info(f"stem cache: {text_parsers.get_stem_cache_info()}, words frequency cache: {words_frequency_cache.get_stats()}.")
+    app_logger.info(f"content_response: {content_response["duration"]}, heavy hitters: {heavy_hitters_info} ...")
+    return JSONResponse(status_code=200, content=content_response)
+
+
+@app.post("/words-frequency-offsets")
+def get_words_frequency_offsets(body: RequestWordsFrequencyOffsetsBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestWordsFrequencyOffsetsBody.model_validate_json(body)
+    app_logger.info(f"stem: '{body_validated.stem}', cursor: {body_validated.cursor}, limit: {body_validated.limit}.")
+    ngrams_count, content_hash, cache_hit = get_counted_text(body_validated)
+    offsets_page = text_parsers.get_ngram_offsets(
+        ngrams_count, body_validated.stem, cursor=body_validated.cursor, limit=body_validated.limit,
+        content_hash=content_hash
+    )
+    t1 = datetime.now()
+    duration = (t1 - t0).total_seconds()
+    content_response = {
+        "duration": f"{duration:.3f}", "stem": body_validated.stem, "content_hash": content_hash, "cache_hit": cache_hit,
+        **offsets_page
+    }
+    app_logger.info(f"content_response: {content_response["duration"]}, count: {offsets_page["count"]} ...")
+    return JSONResponse(status_code=200, content=content_response)
+
+
+@app.post("/words-frequency-delta")
+def get_words_frequency_delta(body: RequestWordsFrequencyDeltaBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestWordsFrequencyDeltaBody.model_validate_json(body)
+    token_filters = TOKEN_FILTERS if body_validated.token_filters is None else body_validated.token_filters
+    ngrams_counts = []
+    cache_hits = []
+    for revision, text, content_hash in (
+            ("old", body_validated.old_text, body_validated.old_content_hash),
+            ("new", body_validated.new_text, body_validated.new_content_hash)
+    ):
+        if (text is None) == (content_hash is None):
+            raise HTTPException(status_code=422, detail=f"Send either '{revision}_text' or '{revision}_content_hash'.")
+        if text is not None:
+            ngrams_count, _, cache_hit = text_parsers.count_text_ngrams_cached(text, token_filters=token_filters)
+        else:
+            # the content hash returned by /words-frequency, the analysis must still be within the cache
+            ngrams_count, cache_hit = words_frequency_cache.get(content_hash), True
+            if ngrams_count is None:
+                raise HTTPException(status_code=404, detail=f"No cached analysis found for '{revision}_content_hash'.")
+        ngrams_counts.append(ngrams_count)
+        cache_hits.append(cache_hit)
+    content_response = get_ngrams_count_delta(
+        *ngrams_counts,
+        min_delta=body_validated.min_delta,
+        top_k=body_validated.top_k,
+        n_words_ngram=body_validated.n_words_ngram
+    )
+    duration = (datetime.now() - t0).total_seconds()
+    content_response["duration"] = f"{duration:.3f}"
+    content_response["cache_hit"] = {"old": cache_hits[0], "new": cache_hits[1]}
+    app_logger.info(f"content_response: {content_response["duration"]}, delta: {len(content_response["delta"])} ...")
+    return JSONResponse(status_code=200, content=content_response)
+
+
+@app.post("/words-frequency-search")
+def get_words_frequency_search(body: RequestWordsFrequencySearchBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestWordsFrequencySearchBody.model_validate_json(body)
+    app_logger.info(f"query: '{body_validated.query}', match: {body_validated.match}, offset: {body_validated.offset}.")
+    ngrams_count, content_hash, cache_hit = get_counted_text(body_validated)
+    try:
+        search_result = search_words_frequency(
+            ngrams_count,
+            content_hash,
+            query=body_validated.query,
+            match=body_validated.match,
+            sort_by=body_validated.sort_by,
+            reverse=body_validated.reverse,
+            min_count=body_validated.min_count,
+            n_words_ngram=body_validated.n_words_ngram,
+            offset=body_validated.offset,
+            limit=body_validated.limit,
+            offsets_limit=body_validated.offsets_limit
+        )
+    except re.error as ex:
+        raise HTTPException(status_code=422, detail=f"Invalid regex query: {ex}.")
+    duration = (datetime.now() - t0).total_seconds()
+    content_response = {
+        "duration": f"{duration:.3f}",
+        "n_total_rows": ngrams_count["n_total_rows"],
+        "cache_hit": cache_hit,
+        "content_hash": content_hash,
+        **search_result
+    }
+    app_logger.info(f"content_response: {content_response["duration"]}, matches: {search_result["n_matches"]} ...")
+    return JSONResponse(status_code=200, content=content_response)
+
+
+@app.post("/words-frequency-session")
+def get_words_frequency_session(body: RequestWordsFrequencySessionBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestWordsFrequencySessionBody.model_validate_json(body)
+    token_filters = TOKEN_FILTERS if body_validated.token_filters is None else body_validated.token_filters
+    session = get_analysis_session(body_validated.session_id, token_filters=token_filters)
+    valid_textrows_with_num = text_parsers.get_valid_textrows_with_num(body_validated.text)
+    session_update = session.update(valid_textrows_with_num)
+    content_response = {"session_id": session.session_id, "n_total_rows": len(valid_textrows_with_num), **session_update}
+    if body_validated.format != "delta":
+        words_stems_dict = text_parsers.get_words_frequency_from_count(
+            session.get_ngrams_count(), response_format=body_validated.format
+        )
+        content_response["words_frequency"] = json.dumps(words_stems_dict)
+    t1 = datetime.now()
+    duration = (t1 - t0).total_seconds()
+    content_response["duration"] = f"{duration:.3f}"
+    app_logger.info(f"content_response: {content_response["duration"]}, session: {session.session_id}, "
+                    f"added_rows: {session_update["added_rows"]}, removed_rows: {session_update["removed_rows"]} ...")
+    return JSONResponse(status_code=200, content=content_response)
+
+
+@app.post("/repeated-phrases")
+def get_repeated_phrases_by_text(body: RequestRepeatedPhrasesBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestRepeatedPhrasesBody.model_validate_json(body)
+    app_logger.info(f"length of text: {len(body_validated.text)}, min_words: {body_validated.min_words}, min_count: {body_validated.min_count}.")
+    token_filters = TOKEN_FILTERS if body_validated.token_filters is None else body_validated.token_filters
+    n_total_rows, repeated_phrases = get_repeated_phrases(
+        body_validated.text,
+        min_words=body_validated.min_words,
+        min_count=body_validated.min_count,
+        top_k=body_validated.top_k,
+        token_filters=token_filters
+    )
+    t1 = datetime.now()
+    duration = (t1 - t0).total_seconds()
+    content_response = {"duration": f"{duration:.3f}", "n_total_rows": n_total_rows, "repeated_phrases": repeated_phrases}
+    app_logger.info(f"content_response: {content_response["duration"]}, repeated phrases: {len(repeated_phrases)} ...")
+    return JSONResponse(status_code=200, content=content_response)
+
+
+@app.post("/echoes")
+def get_echoes_by_text(body: RequestEchoesBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestEchoesBody.model_validate_json(body)
+    app_logger.info(f"length of text: {len(body_validated.text)}, window: {body_validated.window} {body_validated.unit}.")
+    token_filters = TOKEN_FILTERS if body_validated.token_filters is None else body_validated.token_filters
+    n_total_rows, echoes = get_echoes(
+        body_validated.text,
+        window=body_validated.window,
+        unit=body_validated.unit,
+        min_count=body_validated.min_count,
+        top_k=body_validated.top_k,
+        token_filters=token_filters
+    )
+    t1 = datetime.now()
+    duration = (t1 - t0).total_seconds()
+    content_response = {"duration": f"{duration:.3f}", "n_total_rows": n_total_rows, "echoes": echoes}
+    app_logger.info(f"content_response: {content_response["duration"]}, echoes: {len(echoes)} ...")
+    return JSONResponse(status_code=200, content=content_response)
+
+
+@app.post("/near-duplicate-sentences")
+def get_near_duplicate_sentences_by_text(body: RequestNearDuplicatesBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestNearDuplicatesBody.model_validate_json(body)
+    app_logger.info(f"length of text: {len(body_validated.text)}, threshold: {body_validated.threshold}.")
+    n_total_rows, near_duplicates = get_near_duplicate_sentences(
+        body_validated.text,
+        threshold=body_validated.threshold,
+        shingle_size=body_validated.shingle_size,
+        min_words=body_validated.min_words,
+        top_k=body_validated.top_k
+    )
     t1 = datetime.now()
     duration = (t1 - t0).total_seconds()
-    content_response = {'words_frequency': dumped, "duration": f"{duration:.3f}", "n_total_rows": n_total_rows}
-    app_logger.info(f"content_response: {content_response["duration"]}, {content_response["n_total_rows"]} ...")
-    app_logger.debug(f"content_response: {content_response} ...")
+    content_response = {"duration": f"{duration:.3f}", "n_total_rows": n_total_rows, "near_duplicates": near_duplicates}
+    app_logger.info(f"content_response: {content_response["duration"]}, near duplicates: {len(near_duplicates)} ...")
     return JSONResponse(status_code=200, content=content_response)
 
 
+@app.post("/index/{project_id}/chapter")
+def set_index_chapter(project_id: str, body: RequestIndexChapterBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    body_validated = RequestIndexChapterBody.model_validate_json(body)
+    app_logger.info(f"project: '{project_id}', chapter: '{body_validated.chapter_id}', length of text: {len(body_validated.text)}.")
+    chapter_info = get_inverted_index(project_id).set_chapter(body_validated.chapter_id, body_validated.text)
+    duration = (datetime.now() - t0).total_seconds()
+    return JSONResponse(status_code=200, content={"duration": f"{duration:.3f}", **chapter_info})
+
+
+@app.delete("/index/{project_id}/chapter/{chapter_id}")
+def delete_index_chapter(project_id: str, chapter_id: str) -> JSONResponse:
+    try:
+        get_inverted_index(project_id).remove_chapter(chapter_id)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return JSONResponse(status_code=200, content={"message": f"Chapter '{chapter_id}' removed successfully."})
+
+
+@app.post("/index/{project_id}/search")
+def search_index(project_id: str, body: RequestIndexSearchBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    body_validated = RequestIndexSearchBody.model_validate_json(body)
+    search_result = get_inverted_index(project_id).search(body_validated.phrase, limit=body_validated.limit)
+    duration = (datetime.now() - t0).total_seconds()
+    app_logger.info(f"project: '{project_id}', phrase stem: '{search_result["stem"]}', count: {search_result["count"]}, duration: {duration:.3f}.")
+    return JSONResponse(status_code=200, content={"duration": f"{duration:.3f}", **search_result})
+
+
+@app.post("/index/{project_id}/frequencies")
+def get_index_frequencies(project_id: str, body: RequestIndexFrequenciesBody | str) -> JSONResponse:
+    t0 = datetime.now()
+    body_validated = RequestIndexFrequenciesBody.model_validate_json(body)
+    inverted_index = get_inverted_index(project_id)
+    frequencies = inverted_index.get_frequencies(stems=body_validated.stems, top_k=body_validated.top_k)
+    duration = (datetime.now() - t0).total_seconds()
+    return JSONResponse(status_code=200, content={
+        "duration": f"{duration:.3f}", "chapters": inverted_index.get_chapters_ids(), "frequencies": frequencies
+    })
+
+
 @app.post("/split-text")
 def get_sentence_sliced_by_word_and_positions(body: RequestSplitText | str) -> JSONResponse:
     t0 = datetime.now()
@@ -136,15 +542,24 @@ def get_sentence_sliced_by_word_and_positions(body: RequestSplitText | str) -> J
             end = body_validated.end
             start = body_validated.start
             text = body_validated.text
+            document_id = body_validated.document_id
             word = body_validated.word
         except ValidationError:
             assert isinstance(body, RequestSplitText), f"body MUST be of type RequestSplitText, not of '{type(body)}'!"
             end = body.end
             start = body.start
             text = body.text
+            document_id = body.document_id
             word = body.word
         try:
-            sentence, start_in_sentence, end_in_sentence = text_parsers.get_sentence_by_word(text, word, start, end)
+            if document_id is None:
+                sentence, start_in_sentence, end_in_sentence = text_parsers.get_sentence_by_word(text, word, start, end)
+            else:
+                text = get_document_artifact(document_registry.get_text, document_id)
+                starts, ends = get_document_artifact(get_document_sentences_boundaries, document_id)
+                sentence, start_in_sentence, end_in_sentence = text_parsers.find_sentence_by_word(text, starts, ends, word, start, end)
+        except HTTPException:
+            raise
         except Exception as e0:
             app_logger.error(f"end:'{end}', start:'{start}', word:'{word}'.")
             app_logger.error("text:")
@@ -159,6 +574,8 @@ def get_sentence_sliced_by_word_and_positions(body: RequestSplitText | str) -> J
         app_logger.info(f"content_response: {content_response["duration"]}, sentence_len: {sentence_len} ...")
         app_logger.debug(f"content_response: {content_response} ...")
         return JSONResponse(status_code=200, content=content_response)
+    except HTTPException:
+        raise
     except Exception as e1:
         app_logger.error(f"URL: query => {type(body)} {body};")
         app_logger.error("exception:")
@@ -166,6 +583,27 @@ def get_sentence_sliced_by_word_and_positions(body: RequestSplitText | str) -> J
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
 
+@app.post("/split-text-batch")
+def get_sentences_sliced_by_words_and_positions(body: RequestSplitTextBatch | str) -> JSONResponse:
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestSplitTextBatch.model_validate_json(body)
+    words_positions = [(item.start, item.end, item.word) for item in body_validated.words]
+    if body_validated.document_id is None:
+        app_logger.info(f"length of text: {len(body_validated.text)}, words: {len(words_positions)}.")
+        sentences = text_parsers.get_sentences_by_words(body_validated.text, words_positions)
+    else:
+        app_logger.info(f"document_id: {body_validated.document_id}, words: {len(words_positions)}.")
+        text = get_document_artifact(document_registry.get_text, body_validated.document_id)
+        boundaries = get_document_artifact(get_document_sentences_boundaries, body_validated.document_id)
+        sentences = text_parsers.get_sentences_by_words(text, words_positions, boundaries=boundaries)
+    t1 = datetime.now()
+    duration = (t1 - t0).total_seconds()
+    content_response = {"duration": f"{duration:.3f}", "sentences": sentences}
+    app_logger.info(f"content_response: {content_response["duration"]}, sentences: {len(sentences)} ...")
+    return JSONResponse(status_code=200, content=content_response)
+
+
 @app.post("/thesaurus-wordsapi")
 def get_thesaurus_wordsapi(body: RequestQueryThesaurusWordsapiBody | str) -> JSONResponse:
     t0 = datetime.now()
@@ -240,26 +678,34 @@ async def get_synonyms_for_phrase(body: RequestQueryThesaurusInflatedBody):
         end = body_validated.end
         start = body_validated.start
         text = body_validated.text
+        document_id = body_validated.document_id
         word = body_validated.word
     except ValidationError:
         assert isinstance(body, RequestQueryThesaurusInflatedBody), f"body MUST be of type RequestSplitText, not of '{type(body)}'!"
         end = body.end
         start = body.start
         text = body.text
+        document_id = body.document_id
         word = body.word
     app_logger.info(f"end:{end}!")
     app_logger.info(f"start:{start}!")
     app_logger.info(f"text:{text}!")
+    app_logger.info(f"document_id:{document_id}!")
     app_logger.info(f"word:{word}!")
 
     # if use_mongo...
 
     try:
+        doc = None
+        if document_id is not None:
+            text = get_document_artifact(document_registry.get_text, document_id)
+            doc = get_document_artifact(get_document_doc, document_id)
         # The new function in text_parsers2 does all the heavy lifting
         results = find_synonyms_for_phrase(
-            text=body.text,
-            start_idx=body.start,
-            end_idx=body.end
+            text=text,
+            start_idx=start,
+            end_idx=end,
+            doc=doc
         )
         t1 = datetime.now()
         duration = (t1 - t0).total_seconds()
@@ -316,6 +762,22 @@ async def delete_custom_synonyms(word: str):
         raise HTTPException(status_code=500, detail=f"Failed to delete custom synonyms: {str(e)}")
 
 
+@app.post("/thesaurus-custom-matches")
+def get_custom_synonyms_matches(body: RequestCustomLexiconMatchesBody | str) -> JSONResponse:
+    """Finds where the custom lexicon words and their related words appear within a text or an uploaded document."""
+    t0 = datetime.now()
+    app_logger.info(f"body type: {type(body)}.")
+    body_validated = RequestCustomLexiconMatchesBody.model_validate_json(body)
+    if body_validated.document_id is None:
+        text = body_validated.text
+    else:
+        text = get_document_artifact(document_registry.get_text, body_validated.document_id)
+    matches = custom_synonym_handler.find_matches(text)
+    duration = (datetime.now() - t0).total_seconds()
+    app_logger.info(f"found {len(matches)} custom lexicon matches, duration: {duration:.3f}s.")
+    return JSONResponse(status_code=200, content={"matches": matches, "duration": f"{duration:.3f}"})
+
+
 @app.exception_handler(HTTPException)
 def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
     origin = request.headers.get("origin")
@@ -20,6 +20,32 @@ IS_TESTING = bool(os.getenv('IS_TESTING', ""))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 API_MODE = bool(os.getenv("API_MODE", ""))
 N_WORDS_GRAM = int(os.getenv("N_WORDS_GRAM", 2))
+STEM_CACHE_SIZE = int(os.getenv("STEM_CACHE_SIZE", 200000))
+CLASSIFY_TOKEN_CACHE_SIZE = int(os.getenv("CLASSIFY_TOKEN_CACHE_SIZE", 200000))
+TOKEN_FILTERS = [token_filter.strip() for token_filter in os.getenv("TOKEN_FILTERS", "").split(",") if token_filter.strip()]
+RESULT_CACHE_MAX_ITEMS = int(os.getenv("RESULT_CACHE_MAX_ITEMS", 16))
+RESULT_CACHE_DISK_FOLDER = os.getenv("RESULT_CACHE_DISK_FOLDER")
+RESULT_CACHE_DISK_MAX_BYTES = int(os.getenv("RESULT_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024))
+ANALYSIS_SESSION_MAX_ITEMS = int(os.getenv("ANALYSIS_SESSION_MAX_ITEMS", 32))
+SENTENCES_BOUNDARIES_CACHE_MAX_ITEMS = int(os.getenv("SENTENCES_BOUNDARIES_CACHE_MAX_ITEMS", 64))
+DOCUMENT_REGISTRY_MAX_BYTES = int(os.getenv("DOCUMENT_REGISTRY_MAX_BYTES", 256 * 1024 * 1024))
+HEAVY_HITTERS_CAPACITY = int(os.getenv("HEAVY_HITTERS_CAPACITY", 20000))
+HEAVY_HITTERS_TOP_K = int(os.getenv("HEAVY_HITTERS_TOP_K", 1000))
+COUNT_MIN_WIDTH_BITS = int(os.getenv("COUNT_MIN_WIDTH_BITS", 16))
+COUNT_MIN_DEPTH = int(os.getenv("COUNT_MIN_DEPTH", 4))
+INVERTED_INDEX_FOLDER = Path(os.getenv("INVERTED_INDEX_FOLDER", str(PROJECT_ROOT_FOLDER / "inverted_index")))
+INVERTED_INDEX_MAX_PROJECTS = int(os.getenv("INVERTED_INDEX_MAX_PROJECTS", 8))
+REPEATED_PHRASES_MAX_RESULTS = int(os.getenv("REPEATED_PHRASES_MAX_RESULTS", 1000))
+MINHASH_NUM_PERM = int(os.getenv("MINHASH_NUM_PERM", 128))
+MINHASH_BANDS = int(os.getenv("MINHASH_BANDS", 32))
+MINHASH_BUCKET_MAX_PAIRS = int(os.getenv("MINHASH_BUCKET_MAX_PAIRS", 1000))
+REFERENCE_FREQUENCIES_FOLDER = Path(os.getenv("REFERENCE_FREQUENCIES_FOLDER", str(PROJECT_ROOT_FOLDER / "reference_frequencies")))
+PARALLEL_MIN_TEXT_LENGTH = int(os.getenv("PARALLEL_MIN_TEXT_LENGTH", 500000))
+PARALLEL_MAX_WORKERS = int(os.getenv("PARALLEL_MAX_WORKERS", os.cpu_count() or 1))
+SPACY_PIPE_BATCH_SIZE = int(os.getenv("SPACY_PIPE_BATCH_SIZE", 256))
+SPACY_PIPE_N_PROCESS = int(os.getenv("SPACY_PIPE_N_PROCESS", min(PARALLEL_MAX_WORKERS, 4)))
+SPACY_LEMMA_PIPES = ["tok2vec", "tagger", "attribute_ruler", "lemmatizer"]
+SPACY_TOKEN_BYTES = int(os.getenv("SPACY_TOKEN_BYTES", 256))
 NLTK_DATA = os.getenv("NLTK_DATA", str(PROJECT_ROOT_FOLDER / "nltk_data"))
 WORDNET_LANGUAGES=(os.getenv("WORDNET_LANGUAGES", "eng,"))
 SPACY_MODEL_NAME=os.getenv("SPACY_MODEL_NAME", "en_core_web_sm")
@@ -1,5 +1,8 @@
+import threading
 from typing import Any
 
+from my_ghost_writer.aho_corasick import AhoCorasickAutomaton
+
 
 class CustomSynonymHandler:
     def __init__(self):
@@ -7,6 +10,10 @@ class CustomSynonymHandler:
         self.lexicon: dict[str, dict[str, list[dict[str, Any]]]] = {}
         # For reverse lookups
         self.inverted_index: dict[str, set[str]] = {}
+        # incremented on every change, the automaton used by find_matches() is rebuilt lazily when outdated
+        self.version = 0
+        self._automaton: tuple[int, AhoCorasickAutomaton, list[list[dict[str, str | None]]]] | None = None
+        self._automaton_lock = threading.Lock()
 
     def add_entry(self, word: str, related: list[dict[str, Any]]):
         word = word.lower()
@@ -25,6 +32,7 @@ class CustomSynonymHandler:
                 if w not in self.inverted_index:
                     self.inverted_index[w] = set()
                 self.inverted_index[w].add(word)
+        self.version += 1
 
     def delete_entry(self, word: str):
         word = word.lower()
@@ -35,6 +43,7 @@ class CustomSynonymHandler:
             for group in relation_groups:
                 self._update_group_words(group, word)
         del self.lexicon[word]
+        self.version += 1
 
     def _update_group_words(self, group, word):
         for w in group["words"]:
@@ -52,3 +61,44 @@ class CustomSynonymHandler:
     def reverse_lookup(self, related_word: str) -> set[str]:
         related_word = related_word.lower()
         return self.inverted_index.get(related_word, set())
+
+    def _get_automaton(self) -> tuple[AhoCorasickAutomaton, list[list[dict[str, str | None]]]]:
+        """Get the automaton of the lexicon words and of their related words, rebuilt only if the lexicon changed."""
+        with self._automaton_lock:
+            if self._automaton is None or self._automaton[0] != self.version:
+                relations: dict[str, list[dict[str, str | None]]] = {}
+                for word, relation_groups in self.lexicon.items():
+                    relations.setdefault(word, []).append({"entry": word, "relation_type": None})
+                    for relation_type, groups in relation_groups.items():
+                        for group in groups:
+                            for w in group["words"]:
+                                relation = {"entry": word, "relation_type": relation_type}
+                                if w and relation not in relations.setdefault(w, []):
+                                    relations[w].append(relation)
+                self._automaton = self.version, AhoCorasickAutomaton(list(relations)), list(relations.values())
+            return self._automaton[1], self._automaton[2]
+
+    def find_matches(self, text: str) -> list[dict[str, Any]]:
+        """
+        Find where the lexicon words and their related words appear within a text, scanning it once whatever
+        the lexicon size. The matches are case-insensitive, on whole words, and can overlap (e.g. "new york" and "york").
+
+        Args:
+            text (str): the text to scan.
+
+        Returns:
+            list[dict]: the matches sorted by start offset, with the "start" and "end" offsets, the matched "text" and the
+                "relations" list ({"entry": lexicon word, "relation_type": e.g. "synonym", or None for the lexicon word itself}).
+        """
+        automaton, relations = self._get_automaton()
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # a few characters change length when lowercased, keep them unchanged to preserve the offsets
+            lowered = "".join(char.lower() if len(char.lower()) == 1 else char for char in text)
+        matches = []
+        for start, end, pattern_id in automaton.iter_matches(lowered):
+            if (start > 0 and lowered[start - 1].isalnum()) or (end < len(lowered) and lowered[end].isalnum()):
+                continue
+            matches.append({"start": start, "end": end, "text": text[start:end], "relations": relations[pattern_id]})
+        matches.sort(key=lambda match: (match["start"], -match["end"]))
+        return matches
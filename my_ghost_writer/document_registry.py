@@ -0,0 +1,137 @@
+import hashlib
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Callable
+
+from my_ghost_writer.constants import app_logger, DOCUMENT_REGISTRY_MAX_BYTES
+from my_ghost_writer.text_parsers import build_sentences_boundaries, get_valid_textrows_with_num
+from my_ghost_writer.type_hints import RequestTextRowsParentList
+
+
+class DocumentRegistry:
+    """
+    In-memory store of the uploaded texts, keyed by the sha256 of their content, with their derived artifacts
+    (e.g. the parsed text rows, the sentences boundaries, the spaCy doc) built on demand and shared between the requests.
+    The documents are evicted in least recently used order when the estimated size of the texts and of their artifacts
+    goes above max_bytes; the artifacts are evicted together with their document.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.documents: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self.n_bytes = 0
+        self.lock = threading.RLock()
+        self.stats = {"hits": 0, "misses": 0, "artifacts_hits": 0, "artifacts_misses": 0, "evictions": 0}
+
+    def add(self, text: str) -> dict[str, Any]:
+        """
+        Store a text, if not already stored.
+
+        Args:
+            text (str): the text to store, plain text str or json str (see text_parsers.get_valid_textrows_with_num()).
+
+        Returns:
+            dict: a dict with the "document_id", the text size "n_bytes" and whether the document was "created".
+        """
+        document_id = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        n_bytes = len(text.encode("utf-8"))
+        if n_bytes > self.max_bytes:
+            raise ValueError(f"The document size ({n_bytes} bytes) is greater than the registry size ({self.max_bytes} bytes).")
+        with self.lock:
+            created = document_id not in self.documents
+            if created:
+                self.documents[document_id] = {"text": text, "artifacts": {}, "n_bytes": n_bytes}
+                self.n_bytes += n_bytes
+            self.documents.move_to_end(document_id)
+            self._evict(document_id)
+        app_logger.info(f"document {document_id} ({n_bytes} bytes), created: {created}, registry: {self.n_bytes} bytes.")
+        return {"document_id": document_id, "n_bytes": n_bytes, "created": created}
+
+    def _get_document(self, document_id: str) -> dict[str, Any]:
+        document = self.documents.get(document_id)
+        if document is None:
+            self.stats["misses"] += 1
+            raise KeyError(f"No document found with id '{document_id}'.")
+        self.stats["hits"] += 1
+        self.documents.move_to_end(document_id)
+        return document
+
+    def get_text(self, document_id: str) -> str:
+        """Get the text of a document, raising a KeyError if missing (never stored or evicted)."""
+        with self.lock:
+            return self._get_document(document_id)["text"]
+
+    def get_artifact(self, document_id: str, name: str, build: Callable[[str], tuple[Any, int]]) -> Any:
+        """
+        Get an artifact derived from a document text, building it on the first request.
+
+        Args:
+            document_id (str): the document id.
+            name (str): the artifact name, e.g. "sentences_boundaries".
+            build (Callable): a function getting the document text and returning the artifact and its estimated size in bytes.
+
+        Returns:
+            Any: the artifact, raising a KeyError if the document is missing.
+        """
+        with self.lock:
+            document = self._get_document(document_id)
+            artifact = document["artifacts"].get(name)
+            if artifact is not None:
+                self.stats["artifacts_hits"] += 1
+                return artifact[0]
+            self.stats["artifacts_misses"] += 1
+            text = document["text"]
+        # built without holding the lock, two concurrent requests could build the same artifact
+        value, n_bytes = build(text)
+        with self.lock:
+            if self.documents.get(document_id) is document and name not in document["artifacts"]:
+                document["artifacts"][name] = value, n_bytes
+                document["n_bytes"] += n_bytes
+                self.n_bytes += n_bytes
+                self._evict(document_id)
+        app_logger.info(f"built artifact '{name}' of document {document_id}: {n_bytes} bytes.")
+        return value
+
+    def remove(self, document_id: str) -> None:
+        """Remove a document and its artifacts, raising a KeyError if missing."""
+        with self.lock:
+            document = self.documents.pop(document_id, None)
+            if document is None:
+                raise KeyError(f"No document found with id '{document_id}'.")
+            self.n_bytes -= document["n_bytes"]
+
+    def _evict(self, keep_document_id: str) -> None:
+        while self.n_bytes > self.max_bytes and len(self.documents) > 1:
+            document_id, document = next(iter(self.documents.items()))
+            if document_id == keep_document_id:
+                break
+            del self.documents[document_id]
+            self.n_bytes -= document["n_bytes"]
+            self.stats["evictions"] += 1
+
+    def get_stats(self) -> dict[str, int]:
+        with self.lock:
+            return {**self.stats, "n_items": len(self.documents), "n_bytes": self.n_bytes, "max_bytes": self.max_bytes}
+
+
+def get_document_textrows(document_id: str) -> RequestTextRowsParentList:
+    """Get the text rows dicts of a document (see text_parsers.get_valid_textrows_with_num()), parsed only once."""
+    def build(text: str) -> tuple[RequestTextRowsParentList, int]:
+        valid_textrows_with_num = get_valid_textrows_with_num(text)
+        n_bytes = sum(sys.getsizeof(textrow) + sys.getsizeof(textrow["text"]) for textrow in valid_textrows_with_num)
+        return valid_textrows_with_num, n_bytes
+
+    return document_registry.get_artifact(document_id, "textrows", build)
+
+
+def get_document_sentences_boundaries(document_id: str) -> tuple[array, array]:
+    """Get the sentences boundaries of a document (see text_parsers.get_sentences_boundaries()), built only once."""
+    def build(text: str) -> tuple[tuple[array, array], int]:
+        starts, ends = build_sentences_boundaries(text)
+        return (starts, ends), 2 * starts.itemsize * len(starts)
+
+    return document_registry.get_artifact(document_id, "sentences_boundaries", build)
+
+
+document_registry = DocumentRegistry(DOCUMENT_REGISTRY_MAX_BYTES)
@@ -0,0 +1,157 @@
+from typing import Literal
+
+import numpy as np
+
+from my_ghost_writer.constants import app_logger
+from my_ghost_writer.text_parsers import classify_token, get_valid_textrows_with_num, stem_word, tokenize_with_spans
+from my_ghost_writer.type_hints import RequestTextRowsParentList, TokenFilter
+
+
+def get_words_positions(
+        valid_textrows_with_num: RequestTextRowsParentList, token_filters: list[TokenFilter] | None = None
+) -> tuple[list[str], dict[str, np.ndarray]]:
+    """
+    Get the stem id and the positions of every word token of the given rows, as numpy arrays. Punctuation tokens are
+    always skipped; the stopwords are skipped with the "stopwords" token filter, but they still count in the token positions.
+
+    Args:
+        valid_textrows_with_num (list[dict]): the text rows dicts, see text_parsers.get_valid_textrows_with_num().
+        token_filters (list[str] | None): the token filters, only "stopwords" is used.
+
+    Returns:
+        tuple[list[str], dict[str, np.ndarray]]: the list of the interned stems and a dict of parallel arrays:
+            "stem_ids", "tokens" (word position within the whole text), "chars_start" and "chars_end" (character position
+            within the whole text, with rows joined by a newline), "rows" (row position), "starts" and "ends" (within the row).
+    """
+    skip_stopwords = bool(token_filters) and "stopwords" in token_filters
+    stems_list: list[str] = []
+    stems_ids: dict[str, int] = {}
+    stem_ids, tokens, rows, starts, ends, rows_offsets = [], [], [], [], [], []
+    n_token = 0
+    row_offset = 0
+    for n_row_position, textrow in enumerate(valid_textrows_with_num):
+        row = textrow["text"]
+        for word, start, end in tokenize_with_spans(row):
+            is_punctuation, _, is_stopword = classify_token(word)
+            if is_punctuation:
+                continue
+            n_token += 1
+            if skip_stopwords and is_stopword:
+                continue
+            stem = stem_word(word)
+            stem_id = stems_ids.get(stem)
+            if stem_id is None:
+                stem_id = stems_ids[stem] = len(stems_list)
+                stems_list.append(stem)
+            stem_ids.append(stem_id)
+            tokens.append(n_token)
+            rows.append(n_row_position)
+            starts.append(start)
+            ends.append(end)
+            rows_offsets.append(row_offset)
+        row_offset += len(row) + 1
+    starts_array = np.array(starts, dtype=np.int64)
+    ends_array = np.array(ends, dtype=np.int64)
+    rows_offsets_array = np.array(rows_offsets, dtype=np.int64)
+    return stems_list, {
+        "stem_ids": np.array(stem_ids, dtype=np.int64),
+        "tokens": np.array(tokens, dtype=np.int64),
+        "chars_start": rows_offsets_array + starts_array,
+        "chars_end": rows_offsets_array + ends_array,
+        "rows": np.array(rows, dtype=np.int64),
+        "starts": starts_array,
+        "ends": ends_array
+    }
+
+
+def find_echo_clusters(
+        stem_ids: np.ndarray, starts: np.ndarray, ends: np.ndarray, window: int, min_count: int = 2
+) -> list[np.ndarray]:
+    """
+    Find the clusters of occurrences of the same stem where every occurrence is at most window units after the previous
+    one, with a single sort by (stem, position) and vectorized diffs instead of comparing every pair of occurrences.
+
+    Args:
+        stem_ids (np.ndarray): the stem id of every occurrence.
+        starts (np.ndarray): the start position of every occurrence (word position or character position).
+        ends (np.ndarray): the end position of every occurrence (equal to starts for word positions).
+        window (int): the maximum distance between the end of an occurrence and the start of the next one.
+        min_count (int): the minimum number of occurrences within a cluster.
+
+    Returns:
+        list[np.ndarray]: the occurrences indices of every cluster, sorted by position.
+    """
+    if len(stem_ids) < 2:
+        return []
+    order = np.lexsort((starts, stem_ids))
+    sorted_stem_ids = stem_ids[order]
+    gaps = starts[order][1:] - ends[order][:-1]
+    # close[i] is True when the sorted occurrences i and i + 1 belong to the same cluster
+    close = (sorted_stem_ids[1:] == sorted_stem_ids[:-1]) & (gaps <= window)
+    cluster_labels = np.concatenate(([0], np.cumsum(~close)))
+    cluster_sizes = np.bincount(cluster_labels)
+    boundaries = np.flatnonzero(np.diff(cluster_labels)) + 1
+    clusters = np.split(order, boundaries)
+    return [cluster for cluster, size in zip(clusters, cluster_sizes) if size >= min_count]
+
+
+def get_echoes(
+        text: str | RequestTextRowsParentList,
+        window: int = 30,
+        unit: Literal["tokens", "chars"] = "tokens",
+        min_count: int = 2,
+        top_k: int | None = None,
+        token_filters: list[TokenFilter] | None = None
+) -> tuple[int, list[dict]]:
+    """
+    Find the "echoes", the same stem repeated within a short distance, e.g. the same word twice in a few lines.
+
+    Args:
+        text (str): plain text str, json str or list of text rows dicts (see text_parsers.get_valid_textrows_with_num()).
+        window (int): the maximum distance between two occurrences of the same stem within an echo cluster.
+        unit (str): "tokens" to measure the distance in words (1 for adjacent words), "chars" to measure it in characters
+            between the end of an occurrence and the start of the next one.
+        min_count (int): the minimum number of occurrences within an echo cluster (default is 2).
+        top_k (int | None): return only the top_k clusters.
+        token_filters (list[str] | None): use ["stopwords"] to ignore the stopwords echoes.
+
+    Returns:
+        tuple[int, list[dict]]: the number of processed total rows and the echo clusters, sorted by descending count and
+            ascending span, with their "stem", "count", "span" (the distance between the first and last occurrence)
+            and "offsets_array".
+    """
+    valid_textrows_with_num = get_valid_textrows_with_num(text)
+    stems_list, positions = get_words_positions(valid_textrows_with_num, token_filters=token_filters)
+    if unit == "chars":
+        starts, ends = positions["chars_start"], positions["chars_end"]
+    else:
+        starts = ends = positions["tokens"]
+    clusters = find_echo_clusters(positions["stem_ids"], starts, ends, window, min_count=min_count)
+    spans = [int(ends[cluster[-1]] - starts[cluster[0]]) for cluster in clusters]
+    ranking = sorted(range(len(clusters)), key=lambda i: (-len(clusters[i]), spans[i], int(starts[clusters[i][0]])))
+    if top_k is not None:
+        ranking = ranking[:top_k]
+    app_logger.info(f"found {len(clusters)} echo clusters with window {window} {unit}.")
+
+    echoes = []
+    for i in ranking:
+        cluster = clusters[i]
+        offsets_array = []
+        for n_row_position, start, end in zip(
+                positions["rows"][cluster].tolist(), positions["starts"][cluster].tolist(), positions["ends"][cluster].tolist()
+        ):
+            textrow = valid_textrows_with_num[n_row_position]
+            offsets_array.append({
+                "word": textrow["text"][start:end],
+                "offsets": [start, end],
+                "n_row": textrow["idxRow"],
+                "n_row_child": textrow.get("idxRowChild"),
+                "n_row_parent": textrow.get("idxRowParent")
+            })
+        echoes.append({
+            "stem": stems_list[int(positions["stem_ids"][cluster[0]])],
+            "count": len(cluster),
+            "span": spans[i],
+            "offsets_array": offsets_array
+        })
+    return len(valid_textrows_with_num), echoes
@@ -0,0 +1,117 @@
+from collections import Counter
+
+from my_ghost_writer.constants import app_logger
+from my_ghost_writer.text_parsers import get_n_words_ngram, get_ngram_stem
+from my_ghost_writer.type_hints import TextNgramsCount
+
+
+def get_sorted_ngrams_counts(
+        ngrams_count: TextNgramsCount, n_words_ngram: list[int] | None = None
+) -> list[tuple[str, int, int | tuple[int, ...]]]:
+    """
+    Get the (n-gram stem, count, n-gram key) tuples of the given counted n-grams, sorted by n-gram stem.
+
+    Args:
+        ngrams_count (TextNgramsCount): the counted n-grams, see text_parsers.count_text_ngrams().
+        n_words_ngram (list[int] | None): keep only the n-grams with these numbers of words.
+
+    Returns:
+        list[tuple[str, int, int | tuple[int, ...]]]: the sorted (n-gram stem, count, n-gram key) tuples.
+    """
+    stems_list = ngrams_count["stems_list"]
+    return sorted(
+        (get_ngram_stem(stems_list, ngram_key), len(occurrences) // 3, ngram_key)
+        for ngram_key, occurrences in ngrams_count["ngram_occurrences"].items()
+        if n_words_ngram is None or get_n_words_ngram(ngram_key) in n_words_ngram
+    )
+
+
+def get_word_prefix(ngrams_count: TextNgramsCount, ngram_key: int | tuple[int, ...]) -> str:
+    """Get the most common surface word of an n-gram, like the 'word_prefix' of the words frequency entries."""
+    occurrences = ngrams_count["ngram_occurrences"][ngram_key]
+    rows_dict, idx_rows = ngrams_count["rows_dict"], ngrams_count["idx_rows"]
+    words = Counter(
+        rows_dict[idx_rows[occurrences[j]]][occurrences[j + 1]:occurrences[j + 2]] for j in range(0, len(occurrences), 3)
+    )
+    return words.most_common(1)[0][0]
+
+
+def get_delta_status(old_count: int, new_count: int) -> str:
+    """Get the status of a changed n-gram: "added", "removed", "increased" or "decreased"."""
+    if old_count == 0:
+        return "added"
+    if new_count == 0:
+        return "removed"
+    return "increased" if new_count > old_count else "decreased"
+
+
+def get_ngrams_count_delta(
+        old_ngrams_count: TextNgramsCount,
+        new_ngrams_count: TextNgramsCount,
+        min_delta: int = 1,
+        top_k: int | None = None,
+        n_words_ngram: list[int] | None = None
+) -> dict:
+    """
+    Compare the counted n-grams of two revisions of the same text, merging the two count tables sorted by n-gram stem
+    in a single pass. The n-grams stems are compared as strings, since the stem ids of two counts are unrelated.
+
+    Args:
+        old_ngrams_count (TextNgramsCount): the counted n-grams of the old revision.
+        new_ngrams_count (TextNgramsCount): the counted n-grams of the new revision.
+        min_delta (int): keep only the n-grams whose count changed at least by min_delta (default is 1).
+        top_k (int | None): return only the top_k n-grams, sorted by descending absolute delta.
+        n_words_ngram (list[int] | None): compare only the n-grams with these numbers of words.
+
+    Returns:
+        dict: a dict with the "delta" list (every item has the "stem", "word_prefix", "n_words_ngram", "old_count",
+            "new_count", "delta" and "status" ("added", "removed", "increased" or "decreased") keys) and the
+            "n_added", "n_removed", "n_increased" and "n_decreased" totals, before top_k.
+    """
+    old_sorted = get_sorted_ngrams_counts(old_ngrams_count, n_words_ngram=n_words_ngram)
+    new_sorted = get_sorted_ngrams_counts(new_ngrams_count, n_words_ngram=n_words_ngram)
+    # (stem, old count, new count, old n-gram key, new n-gram key) of the changed n-grams
+    changes = []
+    i, j = 0, 0
+    while i < len(old_sorted) or j < len(new_sorted):
+        if j == len(new_sorted) or (i < len(old_sorted) and old_sorted[i][0] < new_sorted[j][0]):
+            stem, old_count, old_key = old_sorted[i]
+            changes.append((stem, old_count, 0, old_key, None))
+            i += 1
+        elif i == len(old_sorted) or new_sorted[j][0] < old_sorted[i][0]:
+            stem, new_count, new_key = new_sorted[j]
+            changes.append((stem, 0, new_count, None, new_key))
+            j += 1
+        else:
+            stem, old_count, old_key = old_sorted[i]
+            _, new_count, new_key = new_sorted[j]
+            if old_count != new_count:
+                changes.append((stem, old_count, new_count, old_key, new_key))
+            i += 1
+            j += 1
+    changes = [change for change in changes if abs(change[2] - change[1]) >= min_delta]
+    statuses = Counter(get_delta_status(old_count, new_count) for _, old_count, new_count, _, _ in changes)
+    changes.sort(key=lambda change: (-abs(change[2] - change[1]), change[0]))
+    if top_k is not None:
+        changes = changes[:top_k]
+    app_logger.info(f"compared {len(old_sorted)} and {len(new_sorted)} n-grams: {dict(statuses)}.")
+
+    delta = []
+    for stem, old_count, new_count, old_key, new_key in changes:
+        ngrams_count, ngram_key = (old_ngrams_count, old_key) if new_key is None else (new_ngrams_count, new_key)
+        delta.append({
+            "stem": stem,
+            "word_prefix": get_word_prefix(ngrams_count, ngram_key),
+            "n_words_ngram": get_n_words_ngram(ngram_key),
+            "old_count": old_count,
+            "new_count": new_count,
+            "delta": new_count - old_count,
+            "status": get_delta_status(old_count, new_count)
+        })
+    return {
+        "delta": delta,
+        "n_added": statuses["added"],
+        "n_removed": statuses["removed"],
+        "n_increased": statuses["increased"],
+        "n_decreased": statuses["decreased"]
+    }
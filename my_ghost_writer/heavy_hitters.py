@@ -0,0 +1,226 @@
+import heapq
+import math
+from array import array
+from typing import Hashable, Iterable, Iterator
+
+import numpy as np
+
+from my_ghost_writer.constants import (app_logger, COUNT_MIN_DEPTH, COUNT_MIN_WIDTH_BITS, HEAVY_HITTERS_CAPACITY,
+    HEAVY_HITTERS_TOP_K)
+from my_ghost_writer.text_parsers import (get_rows_indices, get_valid_textrows_with_num, iter_ngrams_windows,
+    split_tokens_segments, stem_word, tokenize_with_spans)
+from my_ghost_writer.type_hints import RequestTextRowsParentList, TextNgramsCount, TokenFilter
+
+
+class CountMinSketch:
+    """
+    Count-Min sketch with depth rows of 2**width_bits counters, using multiply-shift hashing over the python hash
+    of the keys: the estimates never underestimate and, with probability 1 - exp(-depth), they overestimate by at
+    most e / 2**width_bits times the total count. Memory doesn't depend on the number of distinct keys.
+    """
+    def __init__(self, width_bits: int, depth: int, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.width = 1 << width_bits
+        self.depth = depth
+        self.shift = np.uint64(64 - width_bits)
+        # odd multipliers for the multiply-shift hash functions
+        self.multipliers = rng.integers(0, 2 ** 64, size=(depth, 1), dtype=np.uint64) | np.uint64(1)
+        self.increments = rng.integers(0, 2 ** 64, size=(depth, 1), dtype=np.uint64)
+        self.table = np.zeros((depth, self.width), dtype=np.int64)
+        self.rows = np.arange(depth)[:, None]
+        self.total = 0
+
+    def _get_columns(self, keys: list[Hashable]) -> np.ndarray:
+        hashes = np.array([hash(key) for key in keys], dtype=np.int64).view(np.uint64)
+        return ((self.multipliers * hashes + self.increments) >> self.shift).astype(np.intp)
+
+    def add(self, keys: list[Hashable]) -> None:
+        """Add one occurrence of every given key."""
+        if not keys:
+            return
+        columns = self._get_columns(keys)
+        np.add.at(self.table, (np.broadcast_to(self.rows, columns.shape), columns), 1)
+        self.total += len(keys)
+
+    def estimate(self, keys: list[Hashable]) -> np.ndarray:
+        """Get the estimated count of the given keys."""
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        return self.table[self.rows, self._get_columns(keys)].min(axis=0)
+
+    def get_error_bound(self) -> tuple[float, float]:
+        """Get the maximum overestimation of the counts and the probability that it holds."""
+        return math.e / self.width * self.total, 1 - math.exp(-self.depth)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters summary with a fixed number of counters: a new key replaces the key with the minimum
+    count, inheriting it as error. Every key with a count greater than total / capacity is always monitored, and the
+    count of every monitored key overestimates the real one by at most its error.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: dict[Hashable, int] = {}
+        self.errors: dict[Hashable, int] = {}
+        # (count, key) min heap with one entry for every monitored key; since the counts only grow,
+        # the heap counts can be lower than the current ones and they are updated lazily on eviction
+        self.heap: list[tuple[int, Hashable]] = []
+        self.total = 0
+
+    def add(self, key: Hashable) -> None:
+        """Add one occurrence of the given key."""
+        self.total += 1
+        count = self.counts.get(key)
+        if count is not None:
+            self.counts[key] = count + 1
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            self.errors[key] = 0
+            heapq.heappush(self.heap, (1, key))
+            return
+        while True:
+            min_count, min_key = self.heap[0]
+            current_count = self.counts[min_key]
+            if current_count == min_count:
+                break
+            heapq.heapreplace(self.heap, (current_count, min_key))
+        heapq.heapreplace(self.heap, (min_count + 1, key))
+        del self.counts[min_key]
+        del self.errors[min_key]
+        self.counts[key] = min_count + 1
+        self.errors[key] = min_count
+
+
+def iter_rows_ngrams_stems(
+        valid_textrows_with_num: RequestTextRowsParentList, n: int = 3, token_filters: list[TokenFilter] | None = None
+) -> Iterator[list[tuple[tuple[str, ...], int, int]]]:
+    """
+    Yield, for every row, the (stems tuple, start, end) of its n-grams (from 1 up to n words) in the same order and
+    with the same token filters used by text_parsers.count_ngrams_ids(), without keeping them in memory.
+
+    Args:
+        valid_textrows_with_num (list[dict]): the text rows dicts, see text_parsers.get_valid_textrows_with_num().
+        n (int): The maximum number of words to consider for n-grams.
+        token_filters (list[str] | None): the token filters applied before counting.
+
+    Returns:
+        Iterator[list[tuple]]: a generator of lists of (stems tuple, start, end) tuples, one for every row.
+    """
+    skip_stopwords = bool(token_filters) and "stopwords" in token_filters
+    for textrow in valid_textrows_with_num:
+        tokens_spans = tokenize_with_spans(textrow["text"])
+        segments = split_tokens_segments(tokens_spans, token_filters) if token_filters else (list(tokens_spans),)
+        row_ngrams = []
+        for segment in segments:
+            stems_tokens = [stem_word(word) for word, _, _ in segment]
+            for n_words_ngram, starts_windows in iter_ngrams_windows(segment, n=n, skip_stopwords=skip_stopwords):
+                for i in starts_windows:
+                    row_ngrams.append((tuple(stems_tokens[i:i + n_words_ngram]), segment[i][1], segment[i + n_words_ngram - 1][2]))
+        yield row_ngrams
+
+
+def get_heavy_hitters(
+        rows_ngrams: Iterable[list[tuple[tuple[str, ...], int, int]]],
+        top_k: int,
+        capacity: int = HEAVY_HITTERS_CAPACITY,
+        width_bits: int = COUNT_MIN_WIDTH_BITS,
+        depth: int = COUNT_MIN_DEPTH
+) -> tuple[list[tuple[str, ...]], dict]:
+    """
+    Select the top_k most frequent n-grams in a single pass and in fixed memory: Space-Saving picks the candidates,
+    then they are ranked by the minimum between their Space-Saving count and their Count-Min estimate.
+
+    Args:
+        rows_ngrams (Iterable): the n-grams of every row, see iter_rows_ngrams_stems().
+        top_k (int): the number of n-grams to select.
+        capacity (int): the number of Space-Saving counters.
+        width_bits (int): the Count-Min sketch width, as power of 2.
+        depth (int): the Count-Min sketch depth.
+
+    Returns:
+        tuple[list[tuple[str, ...]], dict]: the selected n-grams (as stems tuples) and the error bounds info dict.
+    """
+    space_saving = SpaceSaving(capacity)
+    sketch = CountMinSketch(width_bits, depth)
+    for row_ngrams in rows_ngrams:
+        keys = [ngram_stems for ngram_stems, _, _ in row_ngrams]
+        for key in keys:
+            space_saving.add(key)
+        sketch.add(keys)
+    candidates = list(space_saving.counts)
+    estimates = np.minimum(np.array([space_saving.counts[key] for key in candidates], dtype=np.int64), sketch.estimate(candidates))
+    selected_positions = np.argsort(-estimates, kind="stable")[:top_k]
+    count_min_error, count_min_confidence = sketch.get_error_bound()
+    heavy_hitters_info = {
+        "n_ngrams_total": space_saving.total,
+        "capacity": capacity,
+        "guaranteed_min_count": space_saving.total / capacity,
+        "count_min_error": count_min_error,
+        "count_min_confidence": count_min_confidence
+    }
+    return [candidates[position] for position in selected_positions.tolist()], heavy_hitters_info
+
+
+def count_text_ngrams_heavy_hitters(
+        text: str | RequestTextRowsParentList,
+        n: int = 3,
+        top_k: int = HEAVY_HITTERS_TOP_K,
+        token_filters: list[TokenFilter] | None = None
+) -> tuple[TextNgramsCount, dict]:
+    """
+    Approximate, bounded memory version of text_parsers.count_text_ngrams() for very large texts: a first pass selects
+    the top_k heavy hitters n-grams with get_heavy_hitters(), a second pass collects the exact occurrences of these
+    n-grams only. The memory used by the first pass is set by the HEAVY_HITTERS_CAPACITY, COUNT_MIN_WIDTH_BITS and
+    COUNT_MIN_DEPTH constants, not by the text size.
+
+    Args:
+        text (str): plain text str, json str or list of text rows dicts (see text_parsers.get_valid_textrows_with_num()).
+        n (int): The maximum number of words to consider for n-grams (default is 3).
+        top_k (int): the number of n-grams to select (default is from the HEAVY_HITTERS_TOP_K constant).
+        token_filters (list[str] | None): the token filters applied before counting, see text_parsers.count_ngrams_ids().
+
+    Returns:
+        tuple[TextNgramsCount, dict]: the counted heavy hitters n-grams, sorted by descending count, and the error bounds
+            info dict (see get_heavy_hitters()).
+    """
+    valid_textrows_with_num = get_valid_textrows_with_num(text)
+    heavy_hitters, heavy_hitters_info = get_heavy_hitters(
+        iter_rows_ngrams_stems(valid_textrows_with_num, n=n, token_filters=token_filters), top_k=top_k
+    )
+    app_logger.info(f"selected {len(heavy_hitters)} heavy hitters n-grams: {heavy_hitters_info}.")
+
+    stems_list: list[str] = []
+    stems_ids: dict[str, int] = {}
+    ngram_keys: dict[tuple[str, ...], int | tuple[int, ...]] = {}
+    for ngram_stems in heavy_hitters:
+        ids_stems = []
+        for stem in ngram_stems:
+            stem_id = stems_ids.get(stem)
+            if stem_id is None:
+                stem_id = stems_ids[stem] = len(stems_list)
+                stems_list.append(stem)
+            ids_stems.append(stem_id)
+        ngram_keys[ngram_stems] = ids_stems[0] if len(ids_stems) == 1 else tuple(ids_stems)
+    ngram_occurrences: dict[int | tuple[int, ...], array] = {}
+    rows_ngrams = iter_rows_ngrams_stems(valid_textrows_with_num, n=n, token_filters=token_filters)
+    for n_row_position, row_ngrams in enumerate(rows_ngrams):
+        for ngram_stems, start, end in row_ngrams:
+            ngram_key = ngram_keys.get(ngram_stems)
+            if ngram_key is None:
+                continue
+            occurrences = ngram_occurrences.get(ngram_key)
+            if occurrences is None:
+                occurrences = ngram_occurrences[ngram_key] = array("l")
+            occurrences.extend((n_row_position, start, end))
+    _, idx_rows, idx_rows_child, idx_rows_parent, rows_dict = get_rows_indices(valid_textrows_with_num)
+    return {
+        "n_total_rows": len(valid_textrows_with_num),
+        "stems_list": stems_list,
+        "ngram_occurrences": dict(sorted(ngram_occurrences.items(), key=lambda item: len(item[1]), reverse=True)),
+        "idx_rows": idx_rows,
+        "idx_rows_child": idx_rows_child,
+        "idx_rows_parent": idx_rows_parent,
+        "rows_dict": rows_dict
+    }, heavy_hitters_info
@@ -0,0 +1,233 @@
+import hashlib
+import os
+import pickle
+import threading
+from array import array
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from my_ghost_writer.constants import app_logger, INVERTED_INDEX_FOLDER, INVERTED_INDEX_MAX_PROJECTS
+from my_ghost_writer.result_cache import get_content_hash, ResultCache
+from my_ghost_writer.text_parsers import get_valid_textrows_with_num, stem_word, tokenize_with_spans
+from my_ghost_writer.type_hints import RequestTextRowsParentList
+
+
+def get_safe_name(name: str) -> str:
+    """Get a file system safe name for a project or chapter id."""
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()[:32]
+
+
+def build_chapter_index(chapter_id: str, valid_textrows_with_num: RequestTextRowsParentList) -> dict[str, Any]:
+    """
+    Build the positional index of a chapter: for every stem the sorted array of its token positions, plus the row position,
+    start and end of every token to convert the positions back to offsets.
+
+    Args:
+        chapter_id (str): the chapter id.
+        valid_textrows_with_num (list[dict]): the chapter text rows dicts, see text_parsers.get_valid_textrows_with_num().
+
+    Returns:
+        dict: the chapter index, with the "chapter_id", "content_hash", "textrows", "postings", "rows", "starts" and "ends" keys.
+    """
+    postings: dict[str, array] = {}
+    rows, starts, ends = array("l"), array("l"), array("l")
+    n_token = 0
+    for n_row_position, textrow in enumerate(valid_textrows_with_num):
+        for word, start, end in tokenize_with_spans(textrow["text"]):
+            stem = stem_word(word)
+            positions = postings.get(stem)
+            if positions is None:
+                positions = postings[stem] = array("l")
+            positions.append(n_token)
+            rows.append(n_row_position)
+            starts.append(start)
+            ends.append(end)
+            n_token += 1
+    return {
+        "chapter_id": chapter_id,
+        "content_hash": get_content_hash(valid_textrows_with_num),
+        "textrows": valid_textrows_with_num,
+        "postings": postings,
+        "rows": rows,
+        "starts": starts,
+        "ends": ends
+    }
+
+
+class InvertedIndex:
+    """
+    Project level positional inverted index (stem => chapter => token positions) persisted in a folder, one pickle file
+    for every chapter: adding, replacing or removing a chapter only writes or deletes its own file. The chapters and
+    the stem => chapters lookup are loaded on the first use.
+    """
+    def __init__(self, folder: str | Path):
+        self.folder = Path(folder)
+        self.chapters: dict[str, dict[str, Any]] | None = None
+        self.stems_chapters: dict[str, set[str]] = {}
+        self.lock = threading.RLock()
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self.chapters is None:
+            self.chapters = {}
+            for path in sorted(self.folder.glob("*.pkl")):
+                try:
+                    with open(path, "rb") as src:
+                        chapter_index = pickle.load(src)
+                except (OSError, pickle.UnpicklingError, EOFError) as ex:
+                    app_logger.warning(f"can't read chapter index file '{path}': {ex}.")
+                    continue
+                self._add_stems_chapters(chapter_index)
+            app_logger.info(f"loaded {len(self.chapters)} chapters from '{self.folder}'.")
+        return self.chapters
+
+    def _add_stems_chapters(self, chapter_index: dict[str, Any]) -> None:
+        chapter_id = chapter_index["chapter_id"]
+        self.chapters[chapter_id] = chapter_index
+        for stem in chapter_index["postings"]:
+            self.stems_chapters.setdefault(stem, set()).add(chapter_id)
+
+    def _remove_stems_chapters(self, chapter_id: str) -> None:
+        chapter_index = self.chapters.pop(chapter_id)
+        for stem in chapter_index["postings"]:
+            chapters = self.stems_chapters[stem]
+            chapters.discard(chapter_id)
+            if not chapters:
+                del self.stems_chapters[stem]
+
+    def get_chapters_ids(self) -> list[str]:
+        with self.lock:
+            return list(self._load())
+
+    def set_chapter(self, chapter_id: str, text: str | RequestTextRowsParentList) -> dict[str, Any]:
+        """
+        Add or replace a chapter; an unchanged chapter (same content hash) isn't indexed again.
+
+        Args:
+            chapter_id (str): the chapter id.
+            text (str): plain text str, json str or list of text rows dicts (see text_parsers.get_valid_textrows_with_num()).
+
+        Returns:
+            dict: a dict with the "chapter_id", the number of tokens "n_tokens" and the "status" ("added", "replaced" or "unchanged").
+        """
+        valid_textrows_with_num = get_valid_textrows_with_num(text)
+        with self.lock:
+            chapters = self._load()
+            current_index = chapters.get(chapter_id)
+            if current_index is not None and current_index["content_hash"] == get_content_hash(valid_textrows_with_num):
+                return {"chapter_id": chapter_id, "n_tokens": len(current_index["rows"]), "status": "unchanged"}
+            chapter_index = build_chapter_index(chapter_id, valid_textrows_with_num)
+            self.folder.mkdir(parents=True, exist_ok=True)
+            path = self.folder / f"{get_safe_name(chapter_id)}.pkl"
+            tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+            with open(tmp_path, "wb") as dst:
+                pickle.dump(chapter_index, dst, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            if current_index is not None:
+                self._remove_stems_chapters(chapter_id)
+            self._add_stems_chapters(chapter_index)
+        status = "added" if current_index is None else "replaced"
+        app_logger.info(f"chapter '{chapter_id}' {status} within '{self.folder}'.")
+        return {"chapter_id": chapter_id, "n_tokens": len(chapter_index["rows"]), "status": status}
+
+    def remove_chapter(self, chapter_id: str) -> None:
+        """Remove a chapter, raising a KeyError if missing."""
+        with self.lock:
+            chapters = self._load()
+            if chapter_id not in chapters:
+                raise KeyError(f"No chapter found with id '{chapter_id}'.")
+            (self.folder / f"{get_safe_name(chapter_id)}.pkl").unlink(missing_ok=True)
+            self._remove_stems_chapters(chapter_id)
+
+    def get_frequencies(self, stems: list[str] | None = None, top_k: int | None = None) -> dict[str, dict[str, Any]]:
+        """
+        Get the book-wide frequency of the given stems (or of all the stems), from the posting lists lengths.
+
+        Args:
+            stems (list[str] | None): the stems to count, default is all the indexed stems.
+            top_k (int | None): return only the top_k most frequent stems.
+
+        Returns:
+            dict: the stems sorted by descending count (then by stem) with their "count" and the "chapters" dict
+                of the per-chapter counts.
+        """
+        with self.lock:
+            chapters = self._load()
+            frequencies = {}
+            for stem in self.stems_chapters if stems is None else stems:
+                chapters_counts = {
+                    chapter_id: len(chapters[chapter_id]["postings"][stem]) for chapter_id in sorted(self.stems_chapters.get(stem, ()))
+                }
+                frequencies[stem] = {"count": sum(chapters_counts.values()), "chapters": chapters_counts}
+        sorted_stems = sorted(frequencies, key=lambda stem: (-frequencies[stem]["count"], stem))
+        if top_k is not None:
+            sorted_stems = sorted_stems[:top_k]
+        return {stem: frequencies[stem] for stem in sorted_stems}
+
+    def search(self, phrase: str, limit: int | None = None) -> dict[str, Any]:
+        """
+        Find where a word or a phrase (matched by stems, within the same row) is used within the whole project:
+        the chapters are the intersection of the stems chapters sets, then, within every chapter, the phrase positions
+        are the intersection of the posting lists of its stems shifted by their position within the phrase.
+
+        Args:
+            phrase (str): the word or phrase to search, tokenized and stemmed like the indexed chapters.
+            limit (int | None): the maximum number of offsets to return for every chapter.
+
+        Returns:
+            dict: a dict with the phrase "stem", the total "count" and the "chapters" dict with the "count"
+                and "offsets_array" for every chapter.
+        """
+        query_stems = [stem_word(word) for word, _, _ in tokenize_with_spans(phrase)]
+        result = {"stem": " ".join(query_stems), "count": 0, "chapters": {}}
+        if not query_stems:
+            return result
+        with self.lock:
+            chapters = self._load()
+            chapters_ids = set.intersection(*[self.stems_chapters.get(stem, set()) for stem in query_stems])
+            for chapter_id in sorted(chapters_ids):
+                chapter_index = chapters[chapter_id]
+                postings = chapter_index["postings"]
+                positions = np.frombuffer(postings[query_stems[0]], dtype=np.dtype("l"))
+                for shift, stem in enumerate(query_stems[1:], start=1):
+                    positions = np.intersect1d(positions, np.frombuffer(postings[stem], dtype=np.dtype("l")) - shift, assume_unique=True)
+                    if len(positions) == 0:
+                        break
+                rows = np.frombuffer(chapter_index["rows"], dtype=np.dtype("l"))
+                last_positions = positions + len(query_stems) - 1
+                positions = positions[rows[positions] == rows[last_positions]]
+                if len(positions) == 0:
+                    continue
+                offsets_array = []
+                for position in positions[:limit].tolist():
+                    textrow = chapter_index["textrows"][chapter_index["rows"][position]]
+                    start, end = chapter_index["starts"][position], chapter_index["ends"][position + len(query_stems) - 1]
+                    offsets_array.append({
+                        "word": textrow["text"][start:end],
+                        "offsets": [start, end],
+                        "n_row": textrow["idxRow"],
+                        "n_row_child": textrow.get("idxRowChild"),
+                        "n_row_parent": textrow.get("idxRowParent")
+                    })
+                result["chapters"][chapter_id] = {"count": len(positions), "offsets_array": offsets_array}
+                result["count"] += len(positions)
+        return result
+
+
+def get_inverted_index(project_id: str) -> InvertedIndex:
+    """
+    Get the inverted index of a project, stored within a sub folder of the INVERTED_INDEX_FOLDER constant.
+    Only the INVERTED_INDEX_MAX_PROJECTS most recently used projects are kept in memory: every change is already
+    persisted, so an evicted project is loaded again from its folder on the next use.
+    """
+    with inverted_indexes_lock:
+        inverted_index = inverted_indexes.get(project_id)
+        if inverted_index is None:
+            inverted_index = InvertedIndex(Path(INVERTED_INDEX_FOLDER) / get_safe_name(project_id))
+            inverted_indexes.set(project_id, inverted_index)
+        return inverted_index
+
+
+inverted_indexes = ResultCache(INVERTED_INDEX_MAX_PROJECTS)
+inverted_indexes_lock = threading.Lock()
@@ -0,0 +1,174 @@
+from itertools import chain, islice
+from typing import Iterator
+
+import numpy as np
+
+from my_ghost_writer.constants import app_logger, MINHASH_BANDS, MINHASH_BUCKET_MAX_PAIRS, MINHASH_NUM_PERM
+from my_ghost_writer.text_parsers import get_valid_textrows_with_num, split_tokens_segments, stem_word, tokenize_with_spans
+from my_ghost_writer.type_hints import RequestTextRowsParentList
+
+
+def get_sentences_shingles(
+        valid_textrows_with_num: RequestTextRowsParentList, shingle_size: int = 2, min_words: int = 5
+) -> tuple[list[tuple[int, int, int]], list[set[int]]]:
+    """
+    Split the rows in sentences with the same tokenizer used by the words frequency ("sentence" and "punctuation"
+    token filters, see text_parsers.split_tokens_segments()) and get the set of hashed stems shingles of every sentence.
+
+    Args:
+        valid_textrows_with_num (list[dict]): the text rows dicts, see text_parsers.get_valid_textrows_with_num().
+        shingle_size (int): the number of consecutive stems of every shingle (shorter sentences use a single shingle).
+        min_words (int): skip the sentences with less than min_words words.
+
+    Returns:
+        tuple[list[tuple[int, int, int]], list[set[int]]]: the (row position, start, end) of every sentence
+            and its set of shingles hashes.
+    """
+    sentences_spans = []
+    shingles_list = []
+    for n_row_position, textrow in enumerate(valid_textrows_with_num):
+        for segment in split_tokens_segments(tokenize_with_spans(textrow["text"]), ["punctuation", "sentence"]):
+            if len(segment) < min_words:
+                continue
+            stems_tokens = [stem_word(word) for word, _, _ in segment]
+            size = min(shingle_size, len(stems_tokens))
+            shingles_list.append({hash(tuple(stems_tokens[i:i + size])) for i in range(len(stems_tokens) - size + 1)})
+            sentences_spans.append((n_row_position, segment[0][1], segment[-1][2]))
+    return sentences_spans, shingles_list
+
+
+def get_minhash_signatures(
+        shingles_list: list[set[int]], num_perm: int = MINHASH_NUM_PERM, seed: int = 0, chunk_size: int = 20000
+) -> np.ndarray:
+    """
+    Compute the MinHash signatures of the given shingles sets: every permutation is a multiply-add hash function over
+    uint64 (a bijection since the multipliers are odd), applied to all the shingles of a chunk of sentences at once,
+    then numpy.minimum.reduceat() gets the minimum for every sentence.
+
+    Args:
+        shingles_list (list[set[int]]): the non-empty shingles hashes sets.
+        num_perm (int): the number of hash functions, the signature length.
+        seed (int): the random seed of the hash functions.
+        chunk_size (int): the maximum number of shingles hashed together, to bound the memory usage.
+
+    Returns:
+        np.ndarray: the (number of sentences, num_perm) uint64 signatures matrix.
+    """
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(0, 2 ** 64, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+    increments = rng.integers(0, 2 ** 64, size=(num_perm, 1), dtype=np.uint64)
+    signatures = np.empty((len(shingles_list), num_perm), dtype=np.uint64)
+    first = 0
+    while first < len(shingles_list):
+        last = first + 1
+        n_shingles = len(shingles_list[first])
+        while last < len(shingles_list) and n_shingles + len(shingles_list[last]) <= chunk_size:
+            n_shingles += len(shingles_list[last])
+            last += 1
+        chunk = shingles_list[first:last]
+        lengths = np.array([len(shingles) for shingles in chunk], dtype=np.int64)
+        hashes = np.fromiter(chain.from_iterable(chunk), dtype=np.int64, count=int(lengths.sum())).view(np.uint64)
+        permuted = multipliers * hashes + increments
+        boundaries = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        signatures[first:last] = np.minimum.reduceat(permuted, boundaries, axis=1).T
+        first = last
+    return signatures
+
+
+def iter_bucket_pairs(bucket: list[int]) -> Iterator[tuple[int, int]]:
+    """Yield the (i, j) pairs of a sorted LSH bucket by increasing distance within the bucket, the nearest ones first."""
+    for distance in range(1, len(bucket)):
+        for i in range(len(bucket) - distance):
+            yield bucket[i], bucket[i + distance]
+
+
+def get_lsh_candidates(
+        signatures: np.ndarray, n_bands: int = MINHASH_BANDS, max_bucket_pairs: int = MINHASH_BUCKET_MAX_PAIRS
+) -> set[tuple[int, int]]:
+    """
+    Get the candidate near-duplicate pairs with LSH banding: the signatures are split in n_bands bands, every band is
+    hashed to a single value and the sentences sharing a band hash are candidates, without comparing all the pairs.
+    A bucket of m sentences (e.g. the same sentence repeated many times) has m * (m - 1) / 2 pairs, so only the first
+    max_bucket_pairs ones are taken: the consecutive members come first, keeping every bucket member in a candidate pair.
+
+    Args:
+        signatures (np.ndarray): the MinHash signatures, see get_minhash_signatures().
+        n_bands (int): the number of bands; it must divide the signatures length.
+        max_bucket_pairs (int): the maximum number of candidate pairs taken from every bucket.
+
+    Returns:
+        set[tuple[int, int]]: the (i, j) candidate pairs, with i < j.
+    """
+    n_sentences, num_perm = signatures.shape
+    if n_bands < 1 or num_perm % n_bands:
+        raise ValueError(f"The number of bands ({n_bands}) must divide the signatures length ({num_perm}).")
+    rows_per_band = num_perm // n_bands
+    band_multipliers = np.random.default_rng(1).integers(0, 2 ** 64, size=rows_per_band, dtype=np.uint64) | np.uint64(1)
+    candidates = set()
+    for band in range(n_bands):
+        band_signatures = signatures[:, band * rows_per_band:(band + 1) * rows_per_band]
+        band_hashes = (band_signatures * band_multipliers).sum(axis=1)
+        order = np.argsort(band_hashes, kind="stable")
+        sorted_hashes = band_hashes[order]
+        boundaries = np.flatnonzero(sorted_hashes[1:] != sorted_hashes[:-1]) + 1
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2:
+                continue
+            candidates.update(islice(iter_bucket_pairs(sorted(bucket.tolist())), max_bucket_pairs))
+    return candidates
+
+
+def get_near_duplicate_sentences(
+        text: str | RequestTextRowsParentList,
+        threshold: float = 0.7,
+        shingle_size: int = 2,
+        min_words: int = 5,
+        top_k: int | None = None
+) -> tuple[int, list[dict]]:
+    """
+    Find the pairs of near-duplicate sentences (e.g. repeated with small changes in LLM assisted drafts) with MinHash
+    signatures and LSH banding, so the cost is sub-quadratic in the number of sentences; the candidate pairs are then
+    verified with the exact Jaccard similarity of their shingles sets.
+
+    Args:
+        text (str): plain text str, json str or list of text rows dicts (see text_parsers.get_valid_textrows_with_num()).
+        threshold (float): the minimum Jaccard similarity between the sentences shingles sets (default is 0.7).
+        shingle_size (int): the number of consecutive stems of every shingle (default is 2).
+        min_words (int): skip the sentences with less than min_words words (default is 5).
+        top_k (int | None): return only the top_k pairs.
+
+    Returns:
+        tuple[int, list[dict]]: the number of processed total rows and the near-duplicate pairs, sorted by descending
+            "similarity", with the "sentences" list of the two sentences and their offsets.
+    """
+    valid_textrows_with_num = get_valid_textrows_with_num(text)
+    sentences_spans, shingles_list = get_sentences_shingles(valid_textrows_with_num, shingle_size=shingle_size, min_words=min_words)
+    if len(shingles_list) < 2:
+        return len(valid_textrows_with_num), []
+    signatures = get_minhash_signatures(shingles_list)
+    candidates = get_lsh_candidates(signatures)
+    pairs = []
+    for first, second in candidates:
+        first_shingles, second_shingles = shingles_list[first], shingles_list[second]
+        similarity = len(first_shingles & second_shingles) / len(first_shingles | second_shingles)
+        if similarity >= threshold:
+            pairs.append((similarity, first, second))
+    pairs.sort(key=lambda pair: (-pair[0], pair[1], pair[2]))
+    if top_k is not None:
+        pairs = pairs[:top_k]
+    app_logger.info(f"{len(shingles_list)} sentences, {len(candidates)} LSH candidates, {len(pairs)} near-duplicate pairs.")
+
+    near_duplicates = []
+    for similarity, first, second in pairs:
+        sentences = []
+        for n_row_position, start, end in (sentences_spans[first], sentences_spans[second]):
+            textrow = valid_textrows_with_num[n_row_position]
+            sentences.append({
+                "sentence": textrow["text"][start:end],
+                "offsets": [start, end],
+                "n_row": textrow["idxRow"],
+                "n_row_child": textrow.get("idxRowChild"),
+                "n_row_parent": textrow.get("idxRowParent")
+            })
+        near_duplicates.append({"similarity": round(similarity, 4), "sentences": sentences})
+    return len(valid_textrows_with_num), near_duplicates
@@ -0,0 +1,206 @@
+import hashlib
+import os
+import struct
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+
+from my_ghost_writer.constants import app_logger, REFERENCE_FREQUENCIES_FOLDER
+from my_ghost_writer.text_parsers import classify_token, get_n_words_ngram, get_ngram_stem, stem_word, tokenize_with_spans
+from my_ghost_writer.type_hints import TextNgramsCount
+
+
+# file layout: the header (magic, table size, number of stems, total count) followed by the table size
+# uint64 stem hashes and then by the table size uint64 counts; the empty slots have a zero hash
+REFERENCE_MAGIC = b"MGWREF01"
+REFERENCE_HEADER = struct.Struct("<8sQQQ")
+
+
+def get_stems_hashes(stems: Iterable[str]) -> np.ndarray:
+    """
+    Get a stable (unlike the python hash(), randomized for every process) and non-zero 64 bit hash of the given stems.
+
+    Args:
+        stems (Iterable[str]): the stems to hash.
+
+    Returns:
+        np.ndarray: the uint64 hashes.
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(stem.encode("utf-8"), digest_size=8).digest(), "little") or 1 for stem in stems
+    ]
+    return np.array(hashes, dtype=np.uint64)
+
+
+def get_hashes_slots(table_hashes: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    """
+    Find the slots of the given hashes within an open addressing (linear probing) table, probing all the hashes at once.
+
+    Args:
+        table_hashes (np.ndarray): the table of uint64 hashes, its size is a power of 2.
+        hashes (np.ndarray): the uint64 hashes to find.
+
+    Returns:
+        np.ndarray: the slot of every hash: the one holding it or the empty slot where it should be inserted.
+    """
+    mask = np.uint64(len(table_hashes) - 1)
+    slots = (hashes & mask).astype(np.int64)
+    pending = np.arange(len(hashes))
+    while len(pending):
+        slot_hashes = table_hashes[slots[pending]]
+        pending = pending[(slot_hashes != hashes[pending]) & (slot_hashes != 0)]
+        slots[pending] = (slots[pending] + 1) & int(mask)
+    return slots
+
+
+def write_reference_frequencies(stems_counts: dict[str, int], output_path: str | Path) -> Path:
+    """
+    Write the stems counts to a reference frequencies file, a memory-mappable hash table with a load factor <= 0.5.
+
+    Args:
+        stems_counts (dict[str, int]): the count of every stem.
+        output_path (str | Path): the output file path.
+
+    Returns:
+        Path: the output file path.
+    """
+    output_path = Path(output_path)
+    table_size = 1 << max(4, (2 * len(stems_counts) - 1).bit_length())
+    table_hashes = np.zeros(table_size, dtype=np.uint64)
+    table_counts = np.zeros(table_size, dtype=np.uint64)
+    # insert one stem at a time, since two stems can collide within the same slot
+    for stem_hash, count in zip(get_stems_hashes(stems_counts).tolist(), stems_counts.values()):
+        slot = int(get_hashes_slots(table_hashes, np.array([stem_hash], dtype=np.uint64))[0])
+        table_hashes[slot] = stem_hash
+        table_counts[slot] += count
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(f".{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb") as dst:
+        dst.write(REFERENCE_HEADER.pack(REFERENCE_MAGIC, table_size, len(stems_counts), sum(stems_counts.values())))
+        dst.write(table_hashes.astype("<u8").tobytes())
+        dst.write(table_counts.astype("<u8").tobytes())
+    os.replace(tmp_path, output_path)
+    app_logger.info(f"written {len(stems_counts)} stems to '{output_path}', table size: {table_size}.")
+    return output_path
+
+
+def build_reference_frequencies(corpus_paths: Iterable[str | Path], output_path: str | Path) -> Path:
+    """
+    Build a reference frequencies file from plain text corpora files, counting the stems of the word tokens
+    (tokenized and stemmed like the words frequency).
+
+    Args:
+        corpus_paths (Iterable[str | Path]): the plain text corpora files, read one line at a time.
+        output_path (str | Path): the output file path.
+
+    Returns:
+        Path: the output file path.
+    """
+    stems_counts = Counter()
+    for corpus_path in corpus_paths:
+        app_logger.info(f"counting stems of '{corpus_path}'...")
+        with open(corpus_path, encoding="utf-8", errors="replace") as src:
+            for row in src:
+                stems_counts.update(
+                    stem_word(word) for word, _, _ in tokenize_with_spans(row) if not classify_token(word)[0]
+                )
+    return write_reference_frequencies(stems_counts, output_path)
+
+
+class ReferenceFrequencies:
+    """
+    Read-only reference stem frequencies, memory-mapped from a file written by write_reference_frequencies():
+    the pages are loaded lazily by the OS and shared between the processes, and every lookup is a hash table probe.
+    """
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as src:
+            magic, table_size, self.n_stems, self.total = REFERENCE_HEADER.unpack(src.read(REFERENCE_HEADER.size))
+        if magic != REFERENCE_MAGIC:
+            raise ValueError(f"'{self.path}' isn't a reference frequencies file.")
+        self.table_hashes = np.memmap(self.path, dtype="<u8", mode="r", offset=REFERENCE_HEADER.size, shape=(table_size,))
+        self.table_counts = np.memmap(
+            self.path, dtype="<u8", mode="r", offset=REFERENCE_HEADER.size + 8 * table_size, shape=(table_size,)
+        )
+
+    def get_counts(self, stems: list[str]) -> np.ndarray:
+        """Get the reference count of the given stems (0 for the missing ones)."""
+        if not stems:
+            return np.zeros(0, dtype=np.int64)
+        hashes = get_stems_hashes(stems)
+        slots = get_hashes_slots(self.table_hashes, hashes)
+        found = self.table_hashes[slots] == hashes
+        return np.where(found, self.table_counts[slots], 0).astype(np.int64)
+
+
+def get_reference_frequencies(name: str) -> ReferenceFrequencies:
+    """
+    Get the reference frequencies named name (the file name.bin within the REFERENCE_FREQUENCIES_FOLDER constant),
+    loaded once for every process.
+
+    Args:
+        name (str): the reference frequencies name.
+
+    Returns:
+        ReferenceFrequencies: the memory-mapped reference frequencies, raising a FileNotFoundError if missing.
+    """
+    with reference_frequencies_lock:
+        reference = reference_frequencies.get(name)
+        if reference is None:
+            reference = reference_frequencies[name] = ReferenceFrequencies(Path(REFERENCE_FREQUENCIES_FOLDER) / f"{name}.bin")
+            app_logger.info(f"loaded reference frequencies '{name}': {reference.n_stems} stems, total {reference.total}.")
+        return reference
+
+
+def get_overuse_scores(ngrams_count: TextNgramsCount, reference: ReferenceFrequencies, smoothing: float = 0.5) -> dict[str, dict]:
+    """
+    Score how much every single word stem is overused compared to the reference corpus, with the base 2 log-ratio between
+    the stem relative frequency within the text and within the reference. Both frequencies use additive (Lidstone)
+    smoothing over the same vocabulary, the reference stems plus the text stems missing from it (V stems):
+    (count + smoothing) / (total + smoothing * V), so the stems missing from the reference have a high but finite score.
+    The n-grams with more than one word aren't scored.
+
+    Args:
+        ngrams_count (TextNgramsCount): the counted n-grams, see text_parsers.count_text_ngrams().
+        reference (ReferenceFrequencies): the reference frequencies, see get_reference_frequencies().
+        smoothing (float): the value added to every count (default is 0.5).
+
+    Returns:
+        dict[str, dict]: the "log_ratio" and "reference_count" of every unigram stem, sorted by descending "log_ratio".
+    """
+    stems_list = ngrams_count["stems_list"]
+    stems, counts = [], []
+    for ngram_key, occurrences in ngrams_count["ngram_occurrences"].items():
+        stem = get_ngram_stem(stems_list, ngram_key)
+        if get_n_words_ngram(ngram_key) == 1 and not classify_token(stem)[0]:
+            stems.append(stem)
+            counts.append(len(occurrences) // 3)
+    if not stems:
+        return {}
+    counts_array = np.array(counts, dtype=np.float64)
+    reference_counts = reference.get_counts(stems)
+    vocabulary_size = reference.n_stems + int(np.count_nonzero(reference_counts == 0))
+    text_frequencies = (counts_array + smoothing) / (counts_array.sum() + smoothing * vocabulary_size)
+    reference_frequencies_array = (reference_counts + smoothing) / (reference.total + smoothing * vocabulary_size)
+    log_ratios = np.log2(text_frequencies / reference_frequencies_array)
+    order = np.argsort(-log_ratios, kind="stable")
+    return {
+        stems[i]: {"log_ratio": round(float(log_ratios[i]), 4), "reference_count": int(reference_counts[i])}
+        for i in order.tolist()
+    }
+
+
+reference_frequencies: dict[str, ReferenceFrequencies] = {}
+reference_frequencies_lock = threading.Lock()
+
+
+if __name__ == "__main__":
+    # usage: python -m my_ghost_writer.reference_frequencies <name> <corpus.txt> [<corpus.txt> ...]
+    if len(sys.argv) < 3:
+        app_logger.error("usage: python -m my_ghost_writer.reference_frequencies <name> <corpus.txt> [<corpus.txt> ...]")
+        sys.exit(1)
+    build_reference_frequencies(sys.argv[2:], Path(REFERENCE_FREQUENCIES_FOLDER) / f"{sys.argv[1]}.bin")
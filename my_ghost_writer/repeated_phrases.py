@@ -0,0 +1,217 @@
+from collections import Counter
+
+import numpy as np
+
+from my_ghost_writer.constants import app_logger, REPEATED_PHRASES_MAX_RESULTS
+from my_ghost_writer.text_parsers import get_valid_textrows_with_num, split_tokens_segments, stem_word, tokenize_with_spans
+from my_ghost_writer.type_hints import RequestTextRowsParentList, TokenFilter
+
+
+def get_stem_ids_sequence(
+        valid_textrows_with_num: RequestTextRowsParentList, token_filters: list[TokenFilter] | None = None
+) -> tuple[list[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Concatenate the stem ids of all the rows in a single sequence. Every row (and every segment produced by the
+    token filters, see text_parsers.split_tokens_segments()) ends with a unique separator value, greater than
+    all the stem ids, so that no repeated phrase can cross it.
+
+    Args:
+        valid_textrows_with_num (list[dict]): the text rows dicts, see text_parsers.get_valid_textrows_with_num().
+        token_filters (list[str] | None): the "punctuation" and "sentence" token filters ("stopwords" is ignored).
+
+    Returns:
+        tuple: the list of the interned stems, the sequence of stem ids and separators and, for every sequence
+            position, the row position, the token start and the token end (-1 for the separators).
+    """
+    stems_list: list[str] = []
+    stems_ids: dict[str, int] = {}
+    segments_ids = []
+    segments_spans = []
+    for n_row_position, textrow in enumerate(valid_textrows_with_num):
+        for segment in split_tokens_segments(tokenize_with_spans(textrow["text"]), token_filters):
+            ids_tokens = []
+            for word, _, _ in segment:
+                stem = stem_word(word)
+                stem_id = stems_ids.get(stem)
+                if stem_id is None:
+                    stem_id = stems_ids[stem] = len(stems_list)
+                    stems_list.append(stem)
+                ids_tokens.append(stem_id)
+            segments_ids.append(ids_tokens)
+            segments_spans.append([(n_row_position, start, end) for _, start, end in segment])
+    sequence = []
+    spans = []
+    for n_segment, (ids_tokens, spans_tokens) in enumerate(zip(segments_ids, segments_spans)):
+        sequence.extend(ids_tokens)
+        sequence.append(len(stems_list) + n_segment)
+        spans.extend(spans_tokens)
+        spans.append((-1, -1, -1))
+    spans_array = np.array(spans, dtype=np.int64).reshape(-1, 3)
+    return stems_list, np.array(sequence, dtype=np.int64), spans_array[:, 0], spans_array[:, 1], spans_array[:, 2]
+
+
+def build_suffix_array(sequence: np.ndarray) -> np.ndarray:
+    """
+    Build the suffix array of an integer sequence by prefix doubling: every round sorts the suffixes by the pair
+    of ranks of their first k and next k values, so it needs at most log2(N) rounds of O(N log N) sorting.
+
+    Args:
+        sequence (np.ndarray): the integer sequence.
+
+    Returns:
+        np.ndarray: the start positions of the sequence suffixes, in lexicographic order.
+    """
+    n_values = len(sequence)
+    if n_values == 0:
+        return np.zeros(0, dtype=np.int64)
+    _, rank = np.unique(sequence, return_inverse=True)
+    rank = rank.astype(np.int64)
+    suffix_array = np.argsort(rank, kind="stable")
+    k = 1
+    while rank.max() < n_values - 1:
+        # rank + 1 of the suffix starting k positions later, 0 for the ones going past the end
+        next_rank = np.zeros(n_values, dtype=np.int64)
+        next_rank[:n_values - k] = rank[k:] + 1
+        keys = rank * (n_values + 1) + next_rank
+        suffix_array = np.argsort(keys, kind="stable")
+        sorted_keys = keys[suffix_array]
+        rank = np.empty(n_values, dtype=np.int64)
+        rank[suffix_array] = np.concatenate(([0], np.cumsum(sorted_keys[1:] != sorted_keys[:-1])))
+        k *= 2
+    return suffix_array
+
+
+def build_lcp_array(sequence: list[int], suffix_array: list[int]) -> list[int]:
+    """
+    Build the longest common prefix array with the Kasai algorithm, in O(N).
+
+    Args:
+        sequence (list[int]): the integer sequence.
+        suffix_array (list[int]): the suffix array of the sequence, see build_suffix_array().
+
+    Returns:
+        list[int]: the length of the common prefix between every suffix (in suffix array order) and the previous one
+            (0 for the first one).
+    """
+    n_values = len(sequence)
+    rank = [0] * n_values
+    for i, position in enumerate(suffix_array):
+        rank[position] = i
+    lcp = [0] * n_values
+    h = 0
+    for i in range(n_values):
+        if rank[i] == 0:
+            h = 0
+            continue
+        j = suffix_array[rank[i] - 1]
+        while i + h < n_values and j + h < n_values and sequence[i + h] == sequence[j + h]:
+            h += 1
+        lcp[rank[i]] = h
+        if h > 0:
+            h -= 1
+    return lcp
+
+
+def is_left_maximal(sequence: list[int], positions: list[int]) -> bool:
+    """Check if the occurrences at the given positions are preceded by at least two different values (or the sequence start)."""
+    first_value = sequence[positions[0] - 1] if positions[0] > 0 else -1
+    return any((sequence[position - 1] if position > 0 else -1) != first_value for position in positions[1:])
+
+
+def find_maximal_repeats(
+        sequence: list[int], suffix_array: list[int], lcp: list[int], min_words: int = 2, min_count: int = 2
+) -> list[tuple[int, list[int]]]:
+    """
+    Find the maximal repeated sub-sequences enumerating the LCP intervals with a stack: every interval is a
+    sub-sequence repeated at all its suffix positions that can't be extended on the right; it's reported only when
+    it can't be extended on the left, too (the occurrences are preceded by different values).
+    A sub-sequence with overlapping occurrences is periodic, a tandem run of a shorter sub-sequence (e.g. a
+    sentence repeated many times in a row): it isn't reported, otherwise every run length would be reported as a
+    repeat of its own and the output would grow quadratically with the number of repetitions.
+
+    Args:
+        sequence (list[int]): the integer sequence.
+        suffix_array (list[int]): the suffix array of the sequence.
+        lcp (list[int]): the LCP array, see build_lcp_array().
+        min_words (int): the minimum length of the repeated sub-sequences.
+        min_count (int): the minimum number of occurrences.
+
+    Returns:
+        list[tuple[int, list[int]]]: the (length, sorted start positions) of every maximal repeat.
+    """
+    repeats = []
+    n_values = len(sequence)
+    # stack of (lcp value, left bound) of the open intervals
+    stack = [(0, 0)]
+    for right in range(1, n_values + 1):
+        current_lcp = lcp[right] if right < n_values else 0
+        left = right - 1
+        while stack[-1][0] > current_lcp:
+            length, left = stack.pop()
+            count = right - left
+            if length >= min_words and count >= min_count and is_left_maximal(sequence, suffix_array[left:right]):
+                positions = sorted(suffix_array[left:right])
+                if all(next_position - position >= length for position, next_position in zip(positions, positions[1:])):
+                    repeats.append((length, positions))
+        if stack[-1][0] < current_lcp:
+            stack.append((current_lcp, left))
+    return repeats
+
+
+def get_repeated_phrases(
+        text: str | RequestTextRowsParentList,
+        min_words: int = 4,
+        min_count: int = 2,
+        top_k: int | None = None,
+        token_filters: list[TokenFilter] | None = None
+) -> tuple[int, list[dict]]:
+    """
+    Find the maximal repeated phrases of any length (by stems) within the given text, using a suffix array and
+    an LCP array over the stem ids sequence of the whole text: unlike text_parsers.text_stemming() there's no
+    maximum n-grams length and memory doesn't grow with the phrases length.
+
+    Args:
+        text (str): plain text str, json str or list of text rows dicts (see text_parsers.get_valid_textrows_with_num()).
+        min_words (int): the minimum number of tokens of the repeated phrases (default is 4).
+        min_count (int): the minimum number of occurrences (default is 2).
+        top_k (int | None): return only the top_k phrases (never more than the REPEATED_PHRASES_MAX_RESULTS constant).
+        token_filters (list[str] | None): the "punctuation" and "sentence" token filters, see text_parsers.split_tokens_segments().
+
+    Returns:
+        tuple[int, list[dict]]: the number of processed total rows and the repeated phrases, sorted by descending number of
+            words and count, with their "phrase_stem", "n_words_ngram", "count", "word_prefix" (the most common
+            'word' in offsets_array) and "offsets_array".
+    """
+    valid_textrows_with_num = get_valid_textrows_with_num(text)
+    stems_list, sequence, rows_positions, starts, ends = get_stem_ids_sequence(valid_textrows_with_num, token_filters)
+    suffix_array = build_suffix_array(sequence).tolist()
+    sequence_list = sequence.tolist()
+    lcp = build_lcp_array(sequence_list, suffix_array)
+    repeats = find_maximal_repeats(sequence_list, suffix_array, lcp, min_words=min_words, min_count=min_count)
+    repeats.sort(key=lambda repeat: (-repeat[0], -len(repeat[1]), repeat[1][0]))
+    top_k = REPEATED_PHRASES_MAX_RESULTS if top_k is None else min(top_k, REPEATED_PHRASES_MAX_RESULTS)
+    repeats = repeats[:top_k]
+    app_logger.info(f"found {len(repeats)} repeated phrases within {len(sequence_list)} tokens.")
+
+    repeated_phrases = []
+    for length, positions in repeats:
+        offsets_array = []
+        for position in positions:
+            textrow = valid_textrows_with_num[rows_positions[position]]
+            start, end = int(starts[position]), int(ends[position + length - 1])
+            offsets_array.append({
+                "word": textrow["text"][start:end],
+                "offsets": [start, end],
+                "n_row": textrow["idxRow"],
+                "n_row_child": textrow.get("idxRowChild"),
+                "n_row_parent": textrow.get("idxRowParent")
+            })
+        most_common_word, _ = Counter([offsets["word"] for offsets in offsets_array]).most_common(1)[0]
+        repeated_phrases.append({
+            "phrase_stem": " ".join([stems_list[stem_id] for stem_id in sequence_list[positions[0]:positions[0] + length]]),
+            "n_words_ngram": length,
+            "count": len(positions),
+            "word_prefix": most_common_word,
+            "offsets_array": offsets_array
+        })
+    return len(valid_textrows_with_num), repeated_phrases
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from my_ghost_writer.constants import (app_logger, RESULT_CACHE_DISK_FOLDER, RESULT_CACHE_DISK_MAX_BYTES,
+    RESULT_CACHE_MAX_ITEMS)
+from my_ghost_writer.type_hints import RequestTextRowsParentList
+
+
+def get_content_hash(valid_textrows_with_num: RequestTextRowsParentList, *params: Any) -> str:
+    """
+    Get a content hash for the given text rows and parameters: the same rows (sent as plain text, json str or list of dicts)
+    with the same parameters always have the same hash.
+
+    Args:
+        valid_textrows_with_num (list[dict]): the text rows dicts, see text_parsers.get_valid_textrows_with_num().
+        params: other json serializable values to include within the hash, e.g. the n-grams order.
+
+    Returns:
+        str: the sha256 hex digest.
+    """
+    hash_obj = hashlib.sha256()
+    for textrow in valid_textrows_with_num:
+        normalized_row = [textrow["idxRow"], textrow.get("idxRowChild"), textrow.get("idxRowParent"), textrow["text"]]
+        hash_obj.update(json.dumps(normalized_row).encode("utf-8"))
+        hash_obj.update(b"\n")
+    hash_obj.update(json.dumps(params).encode("utf-8"))
+    return hash_obj.hexdigest()
+
+
+class ResultCache:
+    """
+    Two tiers cache for analysis results keyed by content hash: an in-memory LRU and an optional
+    disk folder (pickle files) evicting the least recently used files above a size limit.
+    """
+    def __init__(self, max_items: int, disk_folder: str | Path | None = None, disk_max_bytes: int = 0):
+        self.max_items = max_items
+        self.disk_folder = Path(disk_folder) if disk_folder else None
+        self.disk_max_bytes = disk_max_bytes
+        self.items: OrderedDict[str, Any] = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        if self.disk_folder is not None:
+            self.disk_folder.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Any | None:
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.items[key]
+        value = self._read_disk(key)
+        with self.lock:
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._set_memory(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self.lock:
+            self._set_memory(key, value)
+        self._write_disk(key, value)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.items.clear()
+            for stat in self.stats:
+                self.stats[stat] = 0
+
+    def get_stats(self) -> dict[str, int | float]:
+        with self.lock:
+            n_requests = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hit_ratio = (self.stats["hits"] + self.stats["disk_hits"]) / n_requests if n_requests else 0.0
+            return {**self.stats, "hit_ratio": round(hit_ratio, 4), "n_items": len(self.items), "max_items": self.max_items}
+
+    def _set_memory(self, key: str, value: Any) -> None:
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_items:
+            self.items.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _get_disk_path(self, key: str) -> Path:
+        return self.disk_folder / f"{key}.pkl"
+
+    def _read_disk(self, key: str) -> Any | None:
+        if self.disk_folder is None:
+            return None
+        path = self._get_disk_path(key)
+        try:
+            with open(path, "rb") as src:
+                value = pickle.load(src)
+            # update the modification time, used as last access time by the disk eviction
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as ex:
+            app_logger.warning(f"can't read cache file '{path}': {ex}.")
+            return None
+
+    def _write_disk(self, key: str, value: Any) -> None:
+        if self.disk_folder is None:
+            return
+        path = self._get_disk_path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "wb") as dst:
+                pickle.dump(value, dst, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as ex:
+            app_logger.warning(f"can't write cache file '{path}': {ex}.")
+            return
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        files = []
+        for path in self.disk_folder.glob("*.pkl"):
+            try:
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+            except FileNotFoundError:
+                continue
+        total_size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total_size <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+            with self.lock:
+                self.stats["disk_evictions"] += 1
+
+
+words_frequency_cache = ResultCache(
+    RESULT_CACHE_MAX_ITEMS, disk_folder=RESULT_CACHE_DISK_FOLDER, disk_max_bytes=RESULT_CACHE_DISK_MAX_BYTES
+)
@@ -1,47 +1,277 @@
-from typing import Iterator
+import hashlib
+import heapq
+import multiprocessing
+import re
+from bisect import bisect_right
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Iterator, Literal
 
+import numpy as np
 from nltk import PorterStemmer
+from spacy.lang.en.stop_words import STOP_WORDS
 
-from my_ghost_writer.constants import app_logger, N_WORDS_GRAM
-from my_ghost_writer.type_hints import RequestTextRowsParentList, ResponseTextRowsDict
+from my_ghost_writer.constants import (app_logger, CLASSIFY_TOKEN_CACHE_SIZE, N_WORDS_GRAM, PARALLEL_MAX_WORKERS,
+    PARALLEL_MIN_TEXT_LENGTH, RESULT_CACHE_MAX_ITEMS, SENTENCES_BOUNDARIES_CACHE_MAX_ITEMS, STEM_CACHE_SIZE)
+from my_ghost_writer.result_cache import get_content_hash, ResultCache, words_frequency_cache
+from my_ghost_writer.type_hints import (RequestTextRowsParentList, ResponseFormat, ResponseTextRowsDict, TextNgramsCount,
+    TokenFilter, WordStem)
 
 import json
-from nltk.tokenize import sent_tokenize, wordpunct_tokenize, WordPunctTokenizer
+from nltk.tokenize import PunktTokenizer
 
 
 ps = PorterStemmer()
+# same regular expression (and flags) used by nltk WordPunctTokenizer
+WORD_PUNCT_PATTERN = re.compile(r"\w+|[^\w\s]+", re.UNICODE | re.MULTILINE | re.DOTALL)
+WORD_CHAR_PATTERN = re.compile(r"\w", re.UNICODE)
+SENTENCE_END_PATTERN = re.compile(r"[.!?…]")
+# reusable process pool for the parallel n-grams counting, see get_process_pool()
+process_pool: dict[str, ProcessPoolExecutor | None] = {"executor": None}
+# sentences boundaries of the recent texts, see get_sentences_boundaries()
+sentences_boundaries_cache = ResultCache(SENTENCES_BOUNDARIES_CACHE_MAX_ITEMS)
+stems_ids_cache = ResultCache(RESULT_CACHE_MAX_ITEMS)
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem_word(word: str) -> str:
+    """
+    Process-wide memoized wrapper around the Porter stemmer: the same words are stemmed again and again
+    within a text and between requests, so the cache size is bounded by the STEM_CACHE_SIZE constant.
+
+    Args:
+        word (str): The word to stem.
+
+    Returns:
+        str: The stem of the given word.
+    """
+    return ps.stem(word=word)
+
+
+def get_stem_cache_info() -> dict[str, int]:
+    """
+    Get the stem cache counters.
+
+    Returns:
+        dict[str, int]: a dict with the hits, misses, max size and current size of the stem cache.
+    """
+    info = stem_word.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "maxsize": info.maxsize, "currsize": info.currsize}
+
+
+def tokenize_with_spans(row: str) -> Iterator[tuple[str, int, int]]:
+    """
+    Tokenize a text row like nltk wordpunct_tokenize() and WordPunctTokenizer().span_tokenize() together,
+    with a single regex pass.
+
+    Args:
+        row (str): The text row to tokenize.
+
+    Returns:
+        Iterator[tuple[str, int, int]]: a generator of (token, start, end) tuples.
+    """
+    for match in WORD_PUNCT_PATTERN.finditer(row):
+        start, end = match.span()
+        yield match.group(), start, end
+
+
+@lru_cache(maxsize=1)
+def get_punkt_tokenizer() -> PunktTokenizer:
+    """Get the english punkt sentence tokenizer (the same used by nltk sent_tokenize()), loaded only once."""
+    return PunktTokenizer("english")
+
+
+def get_sentences_boundaries(text: str) -> tuple[array, array]:
+    """
+    Get the sorted start and end offsets of the sentences of the given text, from the punkt tokenizer span_tokenize().
+    The boundaries are stored within an LRU cache keyed by the text hash, so the same document is segmented only once.
+
+    Args:
+        text (str): The text to split in sentences.
+
+    Returns:
+        tuple[array, array]: the start offsets and the end offsets of the sentences.
+    """
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    boundaries = sentences_boundaries_cache.get(text_hash)
+    if boundaries is None:
+        boundaries = build_sentences_boundaries(text)
+        sentences_boundaries_cache.set(text_hash, boundaries)
+    return boundaries
+
+
+def build_sentences_boundaries(text: str) -> tuple[array, array]:
+    """Get the start and end offsets of the sentences of the given text, without the cache (see get_sentences_boundaries())."""
+    starts, ends = array("l"), array("l")
+    for start, end in get_punkt_tokenizer().span_tokenize(text):
+        starts.append(start)
+        ends.append(end)
+    return starts, ends
 
 
 def get_sentence_by_word(text: str, word: str, start_position: int, end_position: int) -> tuple[str, int, int]:
-    sentences = sent_tokenize(text)
-    offset = 0
-    for sent in sentences:
-        start = text.find(sent, offset)
-        end = start + len(sent)
-        if start <= start_position < end:
-            check_word = text[start_position:end_position]
-            assert check_word == word, f"word '{word}' doesn't match with start '{start_position}' and end '{end_position}' positions!"
-            start_in_sentence = start_position - start
-            end_in_sentence = start_in_sentence + end_position - start_position
-            return sent, start_in_sentence, end_in_sentence
-        offset = end
+    starts, ends = get_sentences_boundaries(text)
+    return find_sentence_by_word(text, starts, ends, word, start_position, end_position)
+
+
+def get_sentences_by_words(
+        text: str, words_positions: list[tuple[int, int, str]], boundaries: tuple[array, array] | None = None
+) -> list[dict]:
+    """
+    Batch version of get_sentence_by_word(): the text is hashed and segmented once for all the given words.
+
+    Args:
+        text (str): The text to split in sentences.
+        words_positions (list[tuple[int, int, str]]): the (start, end, word) of every word occurrence.
+        boundaries (tuple[array, array] | None): the sentences boundaries, if already available
+            (default is from get_sentences_boundaries()).
+
+    Returns:
+        list[dict]: for every word occurrence, a dict with the "sentence", "start_in_sentence" and "end_in_sentence"
+            keys, or with the "error" key if the word doesn't match the text at the given positions.
+    """
+    starts, ends = get_sentences_boundaries(text) if boundaries is None else boundaries
+    results = []
+    for start_position, end_position, word in words_positions:
+        try:
+            sentence, start_in_sentence, end_in_sentence = find_sentence_by_word(
+                text, starts, ends, word, start_position, end_position
+            )
+            results.append({"sentence": sentence, "start_in_sentence": start_in_sentence, "end_in_sentence": end_in_sentence})
+        except (AssertionError, ValueError) as ex:
+            results.append({"error": str(ex)})
+    return results
+
+
+def find_sentence_by_word(
+        text: str, starts: array, ends: array, word: str, start_position: int, end_position: int
+) -> tuple[str, int, int]:
+    """
+    Find the sentence containing the given word with a binary search over the sentences boundaries.
+
+    Args:
+        text (str): The text split in sentences.
+        starts (array): the sorted start offsets of the sentences, see get_sentences_boundaries().
+        ends (array): the end offsets of the sentences.
+        word (str): The word to find.
+        start_position (int): The start offset of the word within the text.
+        end_position (int): The end offset of the word within the text.
+
+    Returns:
+        tuple[str, int, int]: the sentence and the start and end offsets of the word within the sentence.
+    """
+    n_sentence = bisect_right(starts, start_position) - 1
+    if n_sentence >= 0 and start_position < ends[n_sentence]:
+        start, end = starts[n_sentence], ends[n_sentence]
+        check_word = text[start_position:end_position]
+        assert check_word == word, f"word '{word}' doesn't match with start '{start_position}' and end '{end_position}' positions!"
+        start_in_sentence = start_position - start
+        end_in_sentence = start_in_sentence + end_position - start_position
+        return text[start:end], start_in_sentence, end_in_sentence
     raise ValueError(f"Can't find the given '{word}' word, with position '{start_position}', within the given text!")
 
 
-def text_stemming(text: str | RequestTextRowsParentList, n = 3) -> ResponseTextRowsDict:
+def text_stemming(
+        text: str | RequestTextRowsParentList,
+        n = 3,
+        response_format: ResponseFormat = "dict",
+        parallel: bool | None = None,
+        min_count: int = 1,
+        top_k: int | None = None,
+        n_words_ngram: list[int] | None = None,
+        offsets_limit: int | None = None,
+        token_filters: list[TokenFilter] | None = None
+) -> ResponseTextRowsDict:
     """
     Applies Porter Stemmer algorithm to reduce words in a given text to their base form;
-    then it uses WordPunctTokenizer() to produce a dict of words frequency with, for
+    then it uses a WordPunctTokenizer() regex to produce a dict of words frequency with, for
     every recognized base form, a list of these repeated words with their position.
 
     Args:
         text (str): Input string containing the text to be stemmed.
         n (int): The maximum number of words to consider for n-grams (default is 3).
+        response_format (str): "dict" (default) for a word frequency dict with an offsets dict for every occurrence,
+            "columnar" for the compact columnar representation from get_ngrams_columnar_from_ids().
+        parallel (bool | None): count the n-grams with count_ngrams_ids_parallel(). When None (default) the parallel
+            mode is used only for texts longer than the PARALLEL_MIN_TEXT_LENGTH constant.
+        min_count (int): keep only the n-grams with at least this count (default is 1, all the n-grams).
+        top_k (int | None): keep only the top_k most frequent n-grams, sorted by descending count.
+        n_words_ngram (list[int] | None): keep only the n-grams with these numbers of words.
+        offsets_limit (int | None): return at most offsets_limit offsets for every n-gram, together with
+            a 'next_cursor' to get the next ones using get_ngram_offsets().
+        token_filters (list[str] | None): the token filters applied before counting, see count_ngrams_ids().
 
     Returns:
         tuple[int, dict]: a tuple with the number of processed total rows within the initial text and the word frequency dict
     """
 
+    ngrams_count = count_text_ngrams(text, n=n, parallel=parallel, token_filters=token_filters)
+    ngrams_count = filter_ngrams_count(ngrams_count, min_count=min_count, top_k=top_k, n_words_ngram=n_words_ngram)
+    words_stems_dict = get_words_frequency_from_count(ngrams_count, response_format=response_format, offsets_limit=offsets_limit)
+    return ngrams_count["n_total_rows"], words_stems_dict
+
+
+def text_stemming_cached(
+        text: str | RequestTextRowsParentList,
+        n = 3,
+        response_format: ResponseFormat = "dict",
+        min_count: int = 1,
+        top_k: int | None = None,
+        n_words_ngram: list[int] | None = None,
+        offsets_limit: int | None = None,
+        token_filters: list[TokenFilter] | None = None
+) -> tuple[int, dict, str, bool]:
+    """
+    Like text_stemming(), but the counted n-grams are read from (or stored to) the words frequency result cache,
+    see count_text_ngrams_cached().
+
+    Returns:
+        tuple[int, dict, str, bool]: the number of processed total rows, the word frequency dict, the content hash of the
+            counted n-grams (e.g. for /words-frequency-delta) and whether it was a cache hit.
+    """
+    ngrams_count, content_hash, cache_hit = count_text_ngrams_cached(text, n=n, token_filters=token_filters)
+    ngrams_count = filter_ngrams_count(ngrams_count, min_count=min_count, top_k=top_k, n_words_ngram=n_words_ngram)
+    words_stems_dict = get_words_frequency_from_count(ngrams_count, response_format=response_format, offsets_limit=offsets_limit)
+    return ngrams_count["n_total_rows"], words_stems_dict, content_hash, cache_hit
+
+
+def count_text_ngrams_cached(
+        text: str | RequestTextRowsParentList, n: int = 3, token_filters: list[TokenFilter] | None = None
+) -> tuple[TextNgramsCount, str, bool]:
+    """
+    Like count_text_ngrams(), but it uses the words frequency result cache keyed by the content hash
+    of the normalized text rows, the n-grams order and the token filters.
+
+    Args:
+        text (str): plain text str, json str or list of text rows dicts (see get_valid_textrows_with_num()).
+        n (int): The maximum number of words to consider for n-grams (default is 3).
+        token_filters (list[str] | None): the token filters applied before counting, see count_ngrams_ids().
+
+    Returns:
+        tuple[TextNgramsCount, str, bool]: the counted n-grams, their content hash and whether it was a cache hit.
+    """
+    valid_textrows_with_num = get_valid_textrows_with_num(text)
+    content_hash = get_content_hash(valid_textrows_with_num, n, sorted(token_filters or []))
+    ngrams_count = words_frequency_cache.get(content_hash)
+    if ngrams_count is not None:
+        app_logger.info(f"words frequency cache hit: {content_hash}.")
+        return ngrams_count, content_hash, True
+    ngrams_count = count_text_ngrams(valid_textrows_with_num, n=n, token_filters=token_filters)
+    words_frequency_cache.set(content_hash, ngrams_count)
+    return ngrams_count, content_hash, False
+
+
+def get_valid_textrows_with_num(text: str | RequestTextRowsParentList) -> RequestTextRowsParentList:
+    """
+    Parse the input text to a list of text rows dicts.
+
+    Args:
+        text (str): plain text str (one row for every line), json str or list of text rows dicts.
+
+    Returns:
+        list[dict]: the list of text rows dicts, with the "idxRow", "text" and optionally the "idxRowChild", "idxRowParent" keys.
+    """
     try:
         valid_textrows_with_num = json.loads(text)
         app_logger.info("valid_textrows_with_num::json")
@@ -56,8 +286,63 @@ def text_stemming(text: str | RequestTextRowsParentList, n = 3) -> ResponseTextR
             raise TypeError(f"Invalid input type. Expected plain text str, json str or list of dictionaries, not '{type(text)}'.")
     app_logger.debug(valid_textrows_with_num)
     app_logger.debug("=============================")
-    row_words_tokens = []
-    row_offsets_tokens = []
+    return valid_textrows_with_num
+
+
+def count_text_ngrams(
+        text: str | RequestTextRowsParentList,
+        n: int = 3,
+        parallel: bool | None = None,
+        token_filters: list[TokenFilter] | None = None
+) -> TextNgramsCount:
+    """
+    Tokenize, stem and count the n-grams of the given text, without converting them yet to a words frequency dict.
+
+    Args:
+        text (str): plain text str, json str or list of text rows dicts (see get_valid_textrows_with_num()).
+        n (int): The maximum number of words to consider for n-grams (default is 3).
+        parallel (bool | None): count the n-grams with count_ngrams_ids_parallel(). When None (default) the parallel
+            mode is used only for texts longer than the PARALLEL_MIN_TEXT_LENGTH constant.
+        token_filters (list[str] | None): the token filters applied before counting, see count_ngrams_ids().
+
+    Returns:
+        TextNgramsCount: the interned stems, the n-grams occurrences and the rows indices.
+    """
+    valid_textrows_with_num = get_valid_textrows_with_num(text)
+    rows, idx_rows, idx_rows_child, idx_rows_parent, rows_dict = get_rows_indices(valid_textrows_with_num)
+    if parallel is None:
+        parallel = PARALLEL_MAX_WORKERS > 1 and sum(len(row) for row in rows) >= PARALLEL_MIN_TEXT_LENGTH
+    if parallel:
+        stems_list, ngram_occurrences = count_ngrams_ids_parallel(rows, n=n, token_filters=token_filters)
+    else:
+        stems_list, ngram_occurrences = count_ngrams_ids(
+            (tokenize_with_spans(row) for row in rows), n=n, token_filters=token_filters
+        )
+    return {
+        "n_total_rows": len(valid_textrows_with_num),
+        "stems_list": stems_list,
+        "ngram_occurrences": ngram_occurrences,
+        "idx_rows": idx_rows,
+        "idx_rows_child": idx_rows_child,
+        "idx_rows_parent": idx_rows_parent,
+        "rows_dict": rows_dict
+    }
+
+
+def get_rows_indices(
+        valid_textrows_with_num: RequestTextRowsParentList
+) -> tuple[list[str], list[int], list[int | None], list[int | None], dict[int, str]]:
+    """
+    Split the text rows dicts in the parallel lists (by row position) used by count_text_ngrams().
+
+    Args:
+        valid_textrows_with_num (list[dict]): the text rows dicts, see get_valid_textrows_with_num().
+
+    Returns:
+        tuple: the rows text, the row indices, the child row indices, the parent row indices
+            and the dict mapping the row indices to their text.
+    """
+    rows = []
     idx_rows = []
     idx_rows_child = []
     idx_rows_parent = []
@@ -73,32 +358,256 @@ def text_stemming(text: str | RequestTextRowsParentList, n = 3) -> ResponseTextR
         except KeyError:
             idx_rows_child.append(None)
             idx_rows_parent.append(None)
-        row_words_tokens.append(wordpunct_tokenize(row))
-        row_offsets_tokens.append(WordPunctTokenizer().span_tokenize(row))
-    words_stems_dict = get_words_tokens_and_indexes_ngrams(row_words_tokens, row_offsets_tokens, idx_rows, idx_rows_child, idx_rows_parent, rows_dict=rows_dict, n=n)
-    n_total_rows = len(valid_textrows_with_num)
-    return n_total_rows, words_stems_dict
+        rows.append(row)
+    return rows, idx_rows, idx_rows_child, idx_rows_parent, rows_dict
 
 
-def update_stems_list(current_stem_tuple: dict, word: str, offsets: list, n_row: int, n_row_child: int, n_row_parent: int) -> tuple:
+def filter_ngrams_count(
+        ngrams_count: TextNgramsCount, min_count: int = 1, top_k: int | None = None, n_words_ngram: list[int] | None = None
+) -> TextNgramsCount:
     """
-    Update the stem list with the new stem and its count.
+    Filter the n-grams counted by count_text_ngrams() before their conversion to a words frequency dict.
+    The top_k n-grams are selected with a heap, without sorting all the n-grams.
 
     Args:
-        current_stem_tuple (tuple): Tuple containing the current stem count and list of words.
-        offsets (list): List of offsets for the word.
-        word (str): The word to stem.
-        n_row (int): The row number in the original text.
-        n_row_child (int): The child row number in the original text.
-        n_row_parent (int): The parent row number in the original text.
+        ngrams_count (TextNgramsCount): the output of count_text_ngrams().
+        min_count (int): keep only the n-grams with at least this count.
+        top_k (int | None): keep only the top_k most frequent n-grams, sorted by descending count.
+        n_words_ngram (list[int] | None): keep only the n-grams with these numbers of words.
+
+    Returns:
+        TextNgramsCount: a copy of ngrams_count with the filtered n-grams occurrences.
+    """
+    if min_count <= 1 and top_k is None and not n_words_ngram:
+        return ngrams_count
+    items = ngrams_count["ngram_occurrences"].items()
+    if min_count > 1 or n_words_ngram:
+        min_length = 3 * min_count
+        items = [
+            (ngram_key, occurrences) for ngram_key, occurrences in items
+            if len(occurrences) >= min_length and (not n_words_ngram or get_n_words_ngram(ngram_key) in n_words_ngram)
+        ]
+    if top_k is not None:
+        items = heapq.nlargest(top_k, items, key=lambda item: len(item[1]))
+    return {**ngrams_count, "ngram_occurrences": dict(items)}
+
+
+def get_words_frequency_from_count(
+        ngrams_count: TextNgramsCount, response_format: ResponseFormat = "dict", offsets_limit: int | None = None
+) -> dict:
+    """
+    Convert the n-grams counted by count_text_ngrams() to the words frequency dict.
+
+    Args:
+        ngrams_count (TextNgramsCount): the output of count_text_ngrams().
+        response_format (str): "dict" (default) or "columnar", see text_stemming().
+        offsets_limit (int | None): the maximum number of offsets for every n-gram, see text_stemming().
+
+    Returns:
+        dict: the words frequency dict.
+    """
+    if response_format == "columnar":
+        return get_ngrams_columnar_from_ids(
+            ngrams_count["stems_list"], ngrams_count["ngram_occurrences"], ngrams_count["idx_rows"],
+            ngrams_count["idx_rows_child"], ngrams_count["idx_rows_parent"], rows_dict=ngrams_count["rows_dict"],
+            offsets_limit=offsets_limit
+        )
+    return dict(iter_words_frequency_from_count(ngrams_count, offsets_limit=offsets_limit))
+
+
+def iter_words_frequency_from_count(
+        ngrams_count: TextNgramsCount, offsets_limit: int | None = None
+) -> Iterator[tuple[str, WordStem]]:
+    """
+    Like get_words_frequency_from_count(), but yields the (n-gram stem, entry) pairs one at a time
+    so the whole words frequency dict is never built.
+
+    Args:
+        ngrams_count (TextNgramsCount): the output of count_text_ngrams().
+        offsets_limit (int | None): the maximum number of offsets for every n-gram, see text_stemming().
+
+    Returns:
+        Iterator[tuple[str, dict]]: a generator of (n-gram stem, words frequency entry) tuples.
+    """
+    return iter_ngrams_dict_from_ids(
+        ngrams_count["stems_list"], ngrams_count["ngram_occurrences"], ngrams_count["idx_rows"],
+        ngrams_count["idx_rows_child"], ngrams_count["idx_rows_parent"], rows_dict=ngrams_count["rows_dict"],
+        offsets_limit=offsets_limit
+    )
+
+
+def get_ngrams_histograms(
+        ngrams_count: TextNgramsCount, n_bins: int = 50, histogram_by: Literal["chars", "rows"] = "chars"
+) -> dict[str, list[int]]:
+    """
+    Get, for every counted n-gram, the histogram of its positions within the text split in n_bins equal bins,
+    e.g. to draw sparklines without downloading all the offsets. All the histograms are computed together with
+    a single numpy.bincount() over the n-grams occurrences.
+
+    Args:
+        ngrams_count (TextNgramsCount): the output of count_text_ngrams() (or filter_ngrams_count()).
+        n_bins (int): the number of bins (default is 50).
+        histogram_by (str): "chars" (default) to bin by character position, with the rows joined by a newline,
+            or "rows" to bin by row position.
+
+    Returns:
+        dict[str, list[int]]: the n-gram stems with their list of n_bins occurrences counts.
+    """
+    ngram_keys = list(ngrams_count["ngram_occurrences"])
+    if not ngram_keys:
+        return {}
+    occurrences_list = [np.frombuffer(occurrences, dtype=np.dtype(occurrences.typecode)) for occurrences in ngrams_count["ngram_occurrences"].values()]
+    lengths = np.array([len(occurrences) // 3 for occurrences in occurrences_list], dtype=np.int64)
+    flat_occurrences = np.concatenate(occurrences_list).reshape(-1, 3).astype(np.int64)
+    rows_positions = flat_occurrences[:, 0]
+    if histogram_by == "rows":
+        positions = rows_positions
+        total_length = ngrams_count["n_total_rows"]
+    else:
+        rows_dict = ngrams_count["rows_dict"]
+        rows_lengths = np.array([len(rows_dict[idx_row]) + 1 for idx_row in ngrams_count["idx_rows"]], dtype=np.int64)
+        rows_offsets = np.concatenate(([0], np.cumsum(rows_lengths)[:-1]))
+        positions = rows_offsets[rows_positions] + flat_occurrences[:, 1]
+        total_length = int(rows_lengths.sum())
+    bins = np.minimum(positions * n_bins // max(total_length, 1), n_bins - 1)
+    ngram_indices = np.repeat(np.arange(len(ngram_keys)), lengths)
+    histograms = np.bincount(ngram_indices * n_bins + bins, minlength=len(ngram_keys) * n_bins).reshape(len(ngram_keys), n_bins)
+    return {
+        get_ngram_stem(ngrams_count["stems_list"], ngram_key): histogram
+        for ngram_key, histogram in zip(ngram_keys, histograms.tolist())
+    }
+
+
+def get_bigrams_collocations(
+        ngrams_count: TextNgramsCount,
+        min_count: int = 5,
+        sort_by: Literal["pmi", "log_likelihood"] = "log_likelihood",
+        top_k: int | None = None
+) -> list[dict]:
+    """
+    Score the counted bigrams as collocations with the pointwise mutual information and the Dunning log-likelihood
+    ratio, reusing the unigrams and bigrams counts from count_text_ngrams(): the scores of all the bigrams are computed
+    together over numpy count arrays. Only the positively associated bigrams (pmi > 0) are returned.
+
+    Args:
+        ngrams_count (TextNgramsCount): the output of count_text_ngrams(), counted with n >= 2 and not yet filtered.
+        min_count (int): score only the bigrams with at least this count (default is 5).
+        sort_by (str): "log_likelihood" (default) or "pmi", the score used to rank the bigrams.
+        top_k (int | None): return only the top_k bigrams.
+
+    Returns:
+        list[dict]: the bigrams sorted by descending score, with their "stem", "count", "pmi" (base 2) and "log_likelihood".
+    """
+    ngram_occurrences = ngrams_count["ngram_occurrences"]
+    unigrams_counts = np.zeros(len(ngrams_count["stems_list"]), dtype=np.float64)
+    bigrams_keys = []
+    bigrams_counts = []
+    for ngram_key, occurrences in ngram_occurrences.items():
+        if isinstance(ngram_key, int):
+            unigrams_counts[ngram_key] = len(occurrences) // 3
+        elif len(ngram_key) == 2 and len(occurrences) >= 3 * min_count:
+            bigrams_keys.append(ngram_key)
+            bigrams_counts.append(len(occurrences) // 3)
+    n_tokens = unigrams_counts.sum()
+    if not bigrams_keys or n_tokens == 0:
+        return []
+    bigrams_ids = np.array(bigrams_keys, dtype=np.int64)
+    k11 = np.array(bigrams_counts, dtype=np.float64)
+    count_first = unigrams_counts[bigrams_ids[:, 0]]
+    count_second = unigrams_counts[bigrams_ids[:, 1]]
+    # with the stopwords token filter the stopwords aren't counted as unigrams; the log-likelihood ratio is high for
+    # the negatively associated bigrams too, so only the ones occurring more than expected (pmi > 0) are scored
+    valid = (count_first >= k11) & (count_second >= k11) & (k11 * n_tokens > count_first * count_second)
+    k11, count_first, count_second = k11[valid], count_first[valid], count_second[valid]
+    bigrams_keys = [bigram_key for bigram_key, is_valid in zip(bigrams_keys, valid.tolist()) if is_valid]
+    pmi = np.log2(k11 * n_tokens / (count_first * count_second))
+    # 2x2 contingency table of the first and second stem occurrences
+    observed = np.stack([
+        k11, count_first - k11, count_second - k11, np.maximum(n_tokens - count_first - count_second + k11, 0)
+    ])
+    expected = np.stack([
+        count_first * count_second, count_first * (n_tokens - count_second),
+        (n_tokens - count_first) * count_second, (n_tokens - count_first) * (n_tokens - count_second)
+    ]) / n_tokens
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.where(observed > 0, observed * np.log(observed / expected), 0.0)
+    log_likelihood = 2 * terms.sum(axis=0)
+    scores = pmi if sort_by == "pmi" else log_likelihood
+    ranking = np.argsort(-scores, kind="stable")
+    if top_k is not None:
+        ranking = ranking[:top_k]
+    return [{
+        "stem": get_ngram_stem(ngrams_count["stems_list"], bigrams_keys[i]),
+        "count": int(k11[i]),
+        "pmi": round(float(pmi[i]), 4),
+        "log_likelihood": round(float(log_likelihood[i]), 4)
+    } for i in ranking.tolist()]
+
+
+def get_stems_ids(ngrams_count: TextNgramsCount, content_hash: str | None = None) -> dict[str, int]:
+    """
+    Get the stem => stem id dict of the counted n-grams (the inverse of their "stems_list"), built only once
+    for every content hash when given (see count_text_ngrams_cached()).
+
+    Args:
+        ngrams_count (TextNgramsCount): the counted n-grams, see count_text_ngrams().
+        content_hash (str | None): the content hash of the counted n-grams, the cache key of the dict.
+
+    Returns:
+        dict[str, int]: the id of every stem.
+    """
+    stems_ids = None if content_hash is None else stems_ids_cache.get(content_hash)
+    if stems_ids is None:
+        stems_ids = {stem: stem_id for stem_id, stem in enumerate(ngrams_count["stems_list"])}
+        if content_hash is not None:
+            stems_ids_cache.set(content_hash, stems_ids)
+    return stems_ids
+
+
+def get_ngram_offsets(
+        ngrams_count: TextNgramsCount,
+        ngram_stem: str,
+        cursor: int = 0,
+        limit: int | None = None,
+        content_hash: str | None = None
+) -> dict:
+    """
+    Get a page of the offsets of a single n-gram stem, e.g. to lazily load the offsets omitted by text_stemming()
+    when using its offsets_limit argument. The page is sliced from the occurrences of the counted n-grams
+    (see count_text_ngrams_cached()), so with a content hash it costs only the page size plus a dict lookup of the stems.
+
+    Args:
+        ngrams_count (TextNgramsCount): the counted n-grams, see count_text_ngrams().
+        ngram_stem (str): the n-gram stem, with the stems joined by a space.
+        cursor (int): the index of the first occurrence to return.
+        limit (int | None): the maximum number of offsets to return (default is all the remaining ones).
+        content_hash (str | None): the content hash of the counted n-grams, to reuse their stems ids, see get_stems_ids().
 
     Returns:
-        dict[str|list|int]: A dictionary with the stem string, its offsets and count.
+        dict: a dict with the "count" of the n-gram, the "offsets_array" page and the "next_cursor" (None on the last page).
     """
-    n, word_offsets = current_stem_tuple["count"], current_stem_tuple["offsets_array"]
-    n += 1
-    word_offsets.append({"word": word, "offsets": list(offsets), "n_row": n_row, "n_row_child": n_row_child, "n_row_parent": n_row_parent})
-    return n, word_offsets
+    stems_ids = get_stems_ids(ngrams_count, content_hash)
+    try:
+        stem_ids = tuple(stems_ids[stem] for stem in ngram_stem.split(" "))
+    except KeyError:
+        return {"count": 0, "offsets_array": [], "next_cursor": None}
+    ngram_key = stem_ids[0] if len(stem_ids) == 1 else stem_ids
+    occurrences = ngrams_count["ngram_occurrences"].get(ngram_key, array("l"))
+    count = len(occurrences) // 3
+    end_page = count if limit is None else min(cursor + limit, count)
+    rows_dict, idx_rows = ngrams_count["rows_dict"], ngrams_count["idx_rows"]
+    offsets_array = []
+    for i in range(cursor, end_page):
+        n_row_position, start, end = occurrences[3 * i], occurrences[3 * i + 1], occurrences[3 * i + 2]
+        offsets_array.append({
+            "word": rows_dict[idx_rows[n_row_position]][start:end],
+            "offsets": [start, end],
+            "n_row": idx_rows[n_row_position],
+            "n_row_child": ngrams_count["idx_rows_child"][n_row_position],
+            "n_row_parent": ngrams_count["idx_rows_parent"][n_row_position]
+        })
+    next_cursor = end_page if end_page < count else None
+    return {"count": count, "offsets_array": offsets_array, "next_cursor": next_cursor}
 
 
 def get_words_tokens_and_indexes_ngrams(
@@ -128,44 +637,494 @@ def get_words_tokens_and_indexes_ngrams(
     Returns:
         dict: Dictionary with n-gram stems as keys and a dictionary of their counts, word prefixes, and offsets as values.
     """
-    from collections import Counter
+    rows_tokens_spans = (
+        ((word, start, end) for word, (start, end) in zip(words_tokens, offsets_tokens))
+        for words_tokens, offsets_tokens in zip(words_tokens_list, offsets_tokens_list)
+    )
+    return get_ngrams_by_tokens_spans(
+        rows_tokens_spans, idx_rows_list, idx_rows_child, idx_rows_parent, rows_dict=rows_dict, n=n
+    )
+
+
+def get_ngrams_by_tokens_spans(
+        rows_tokens_spans: Iterable[Iterable[tuple[str, int, int]]],
+        idx_rows_list: list[int],
+        idx_rows_child: list[int],
+        idx_rows_parent: list[int],
+        rows_dict: dict[int, str],
+        n: int = N_WORDS_GRAM
+) -> dict:
+    """
+    Build the n-grams dict (from 1 up to n words) consuming, for every row, an iterable of (token, start, end)
+    tuples as the ones produced by tokenize_with_spans().
+
+    Args:
+        rows_tokens_spans (Iterable): Iterable of iterables of (token, start, end) tuples, one for every row.
+        idx_rows_list (list[int]): List of row indices corresponding to the tokens.
+        idx_rows_child (list[int]): List of child row indices corresponding to the tokens.
+        idx_rows_parent (list[int]): List of parent row indices corresponding to the tokens.
+        rows_dict (dict[int, str]): Dictionary mapping row indices to their text.
+        n (int): The maximum number of words to consider for n-grams.
+
+    Returns:
+        dict: Dictionary with n-gram stems as keys and a dictionary of their counts, word prefixes, and offsets as values.
+    """
+    stems_list, ngram_occurrences = count_ngrams_ids(rows_tokens_spans, n=n)
+    return get_ngrams_dict_from_ids(
+        stems_list, ngram_occurrences, idx_rows_list, idx_rows_child, idx_rows_parent, rows_dict=rows_dict
+    )
+
+
+@lru_cache(maxsize=CLASSIFY_TOKEN_CACHE_SIZE)
+def classify_token(word: str) -> tuple[bool, bool, bool]:
+    """
+    Classify a token produced by tokenize_with_spans() for the token filters used by count_ngrams_ids().
+
+    Args:
+        word (str): The token to classify.
+
+    Returns:
+        tuple[bool, bool, bool]: whether the token is punctuation, sentence ending punctuation and a stopword.
+    """
+    is_punctuation = WORD_CHAR_PATTERN.match(word) is None
+    is_sentence_end = is_punctuation and SENTENCE_END_PATTERN.search(word) is not None
+    return is_punctuation, is_sentence_end, word.lower() in STOP_WORDS
+
+
+def split_tokens_segments(
+        tokens_spans: Iterable[tuple[str, int, int]], token_filters: list[TokenFilter] | None = None
+) -> list[list[tuple[str, int, int]]]:
+    """
+    Apply the token filters to the (token, start, end) tuples of a row, splitting them in segments that n-grams can't cross:
+    - "punctuation": drop the punctuation tokens
+    - "sentence": the sentence ending punctuation tokens (e.g. '.', '?"') split the row, they are kept only as single tokens segments
+
+    The "stopwords" filter is applied by count_ngrams_ids() while counting.
+
+    Args:
+        tokens_spans (Iterable): the (token, start, end) tuples of a row.
+        token_filters (list[str] | None): the token filters to apply.
+
+    Returns:
+        list[list[tuple[str, int, int]]]: the segments of (token, start, end) tuples.
+    """
+    token_filters = token_filters or []
+    drop_punctuation = "punctuation" in token_filters
+    split_sentences = "sentence" in token_filters
+    segments = []
+    segment = []
+    for token_span in tokens_spans:
+        is_punctuation, is_sentence_end, _ = classify_token(token_span[0])
+        if split_sentences and is_sentence_end:
+            if segment:
+                segments.append(segment)
+                segment = []
+            if not drop_punctuation:
+                segments.append([token_span])
+            continue
+        if drop_punctuation and is_punctuation:
+            continue
+        segment.append(token_span)
+    if segment:
+        segments.append(segment)
+    return segments
+
+
+def iter_ngrams_windows(
+        segment: list[tuple], n: int = N_WORDS_GRAM, skip_stopwords: bool = False
+) -> Iterator[tuple[int, Iterable[int]]]:
+    """
+    Yield the token windows of the n-grams (from 1 up to n words) of a segment, see split_tokens_segments(),
+    grouped by number of words so that the callers keep a tight loop over the start positions.
 
-    ngram_dict = {}
-    for (n_row, n_row_child, n_row_parent, words_tokens, offsets_tokens) in zip(
-            idx_rows_list, idx_rows_child, idx_rows_parent, words_tokens_list, offsets_tokens_list
-    ):
-        words_tokens = list(words_tokens)
-        offsets_tokens = list(offsets_tokens)
-        length = len(words_tokens)
+    Args:
+        segment (list[tuple]): the (token, start, end, ...) tuples of the segment.
+        n (int): The maximum number of words to consider for n-grams.
+        skip_stopwords (bool): skip the n-grams made only by stopwords (the "stopwords" token filter).
+
+    Returns:
+        Iterator[tuple[int, Iterable[int]]]: a generator of (number of words, start token indices) tuples.
+    """
+    length = len(segment)
+    if not skip_stopwords:
         for n_words_ngram in range(1, n + 1):
-            for i in range(length - n_words_ngram + 1):
-                row = rows_dict[n_row]
-                ngram_words = words_tokens[i:i + n_words_ngram]
-                stem_list = [ps.stem(word=word) for word in ngram_words]
-                ngram_offsets = offsets_tokens[i:i + n_words_ngram]
-                start = ngram_offsets[0][0]
-                end = ngram_offsets[-1][1]
-                ngram_stem = " ".join(stem_list)
-                ngram = row[start:end]
-                if ngram_stem not in ngram_dict:
-                    ngram_dict[ngram_stem] = {"count": 0, "word_prefix": ngram, "offsets_array": [], "n_words_ngram": n_words_ngram}
-                # Use update_stems_list to update count and offsets_array
-                count, offsets_array = update_stems_list(
-                    ngram_dict[ngram_stem],
-                    ngram,
-                    [start, end],
-                    n_row=n_row,
-                    n_row_child=n_row_child,
-                    n_row_parent=n_row_parent
-                )
-                ngram_dict[ngram_stem]["count"] = count
-                ngram_dict[ngram_stem]["offsets_array"] = offsets_array
-
-    # Update word_prefix to the most common 'word' in offsets_array
-    for entry in ngram_dict.values():
-        words = [item["word"] for item in entry["offsets_array"] if "word" in item]
-        if words:
-            most_common_word, _ = Counter(words).most_common(1)[0]
-            entry["word_prefix"] = most_common_word
-
-    return ngram_dict
+            yield n_words_ngram, range(length - n_words_ngram + 1)
+        return
+    # stopwords_run[i] is the number of consecutive stopwords starting from the token i
+    stopwords_run = [0] * (length + 1)
+    for i in range(length - 1, -1, -1):
+        if classify_token(segment[i][0])[2]:
+            stopwords_run[i] = stopwords_run[i + 1] + 1
+    for n_words_ngram in range(1, n + 1):
+        yield n_words_ngram, [i for i in range(length - n_words_ngram + 1) if stopwords_run[i] < n_words_ngram]
+
+
+def count_ngrams_ids(
+        rows_tokens_spans: Iterable[Iterable[tuple[str, int, int]]],
+        n: int = N_WORDS_GRAM,
+        token_filters: list[TokenFilter] | None = None,
+        by_lemma: bool = False
+) -> tuple[list[str], dict[int | tuple[int, ...], array]]:
+    """
+    Count the n-grams (from 1 up to n words) of the given rows using integer stem ids instead of strings:
+    every distinct token is stemmed and interned only once, unigrams are keyed by their stem id and
+    longer n-grams by the tuple of their stem ids.
+
+    Args:
+        rows_tokens_spans (Iterable): Iterable of iterables of (token, start, end) tuples, one for every row,
+            or of (token, start, end, lemma) tuples when by_lemma is True.
+        n (int): The maximum number of words to consider for n-grams.
+        token_filters (list[str] | None): the token filters applied before counting: "punctuation" and "sentence"
+            (see split_tokens_segments()) and "stopwords", to skip the n-grams made only by stopwords.
+        by_lemma (bool): key the tokens by their lemma instead of their stem, see text_parsers2.lemmatize_rows_with_spans().
+
+    Returns:
+        tuple[list[str], dict]: the list of the interned stems (the stem id is the list index) and the dict of
+            the n-grams occurrences, as flat integer arrays of [row position, start, end, row position, start, end, ...] values.
+    """
+    stems_list: list[str] = []
+    stems_ids: dict[str, int] = {}
+    tokens_ids: dict[str, int] = {}
+    ngram_occurrences: dict[int | tuple[int, ...], array] = {}
+    skip_stopwords = bool(token_filters) and "stopwords" in token_filters
+    for n_row_position, tokens_spans in enumerate(rows_tokens_spans):
+        segments = split_tokens_segments(tokens_spans, token_filters) if token_filters else (list(tokens_spans),)
+        for segment in segments:
+            ids_tokens = []
+            starts_tokens = []
+            ends_tokens = []
+            if by_lemma:
+                # a separate loop, to keep the stems one free from the lemma handling
+                for _, start, end, lemma in segment:
+                    token_id = stems_ids.get(lemma)
+                    if token_id is None:
+                        token_id = stems_ids[lemma] = len(stems_list)
+                        stems_list.append(lemma)
+                    ids_tokens.append(token_id)
+                    starts_tokens.append(start)
+                    ends_tokens.append(end)
+            else:
+                for word, start, end in segment:
+                    token_id = tokens_ids.get(word)
+                    if token_id is None:
+                        stem = stem_word(word)
+                        token_id = stems_ids.get(stem)
+                        if token_id is None:
+                            token_id = stems_ids[stem] = len(stems_list)
+                            stems_list.append(stem)
+                        tokens_ids[word] = token_id
+                    ids_tokens.append(token_id)
+                    starts_tokens.append(start)
+                    ends_tokens.append(end)
+            for n_words_ngram, starts_windows in iter_ngrams_windows(segment, n=n, skip_stopwords=skip_stopwords):
+                if n_words_ngram == 1:
+                    for i in starts_windows:
+                        occurrences = ngram_occurrences.get(ids_tokens[i])
+                        if occurrences is None:
+                            occurrences = ngram_occurrences[ids_tokens[i]] = array("l")
+                        occurrences.extend((n_row_position, starts_tokens[i], ends_tokens[i]))
+                    continue
+                for i in starts_windows:
+                    ngram_key = tuple(ids_tokens[i:i + n_words_ngram])
+                    occurrences = ngram_occurrences.get(ngram_key)
+                    if occurrences is None:
+                        occurrences = ngram_occurrences[ngram_key] = array("l")
+                    occurrences.extend((n_row_position, starts_tokens[i], ends_tokens[i + n_words_ngram - 1]))
+    return stems_list, ngram_occurrences
+
+
+def count_ngrams_ids_by_rows(
+        rows: list[str], n: int = N_WORDS_GRAM, token_filters: list[TokenFilter] | None = None
+) -> tuple[list[str], dict[int | tuple[int, ...], array]]:
+    """
+    Tokenize the given text rows and count their n-grams with count_ngrams_ids(); used by the process pool workers.
+
+    Args:
+        rows (list[str]): The text rows to analyze.
+        n (int): The maximum number of words to consider for n-grams.
+        token_filters (list[str] | None): the token filters applied before counting.
+
+    Returns:
+        tuple[list[str], dict]: the list of the interned stems and the dict of the n-grams occurrences.
+    """
+    return count_ngrams_ids((tokenize_with_spans(row) for row in rows), n=n, token_filters=token_filters)
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Get the process pool used to count the n-grams in parallel, creating it on the first call.
+    It uses the 'spawn' start method since the webserver calls it from its threadpool.
+
+    Returns:
+        ProcessPoolExecutor: the reusable process pool, with PARALLEL_MAX_WORKERS workers.
+    """
+    if process_pool["executor"] is None:
+        app_logger.info(f"creating process pool with {PARALLEL_MAX_WORKERS} workers...")
+        process_pool["executor"] = ProcessPoolExecutor(
+            max_workers=PARALLEL_MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return process_pool["executor"]
+
+
+def shutdown_process_pool() -> None:
+    """Shutdown the process pool, if created."""
+    if process_pool["executor"] is not None:
+        process_pool["executor"].shutdown(cancel_futures=True)
+        process_pool["executor"] = None
+
+
+def split_rows_in_chunks(rows: list[str], n_chunks: int) -> list[tuple[int, int]]:
+    """
+    Split the rows in contiguous chunks with a similar amount of text.
+
+    Args:
+        rows (list[str]): The text rows to split.
+        n_chunks (int): The desired number of chunks.
+
+    Returns:
+        list[tuple[int, int]]: the (first, last + 1) row positions of every chunk.
+    """
+    chunk_length = sum(len(row) for row in rows) / max(n_chunks, 1)
+    chunks = []
+    chunk_start = 0
+    current_length = 0
+    for n_row_position, row in enumerate(rows):
+        current_length += len(row)
+        if current_length >= chunk_length and len(chunks) < n_chunks - 1:
+            chunks.append((chunk_start, n_row_position + 1))
+            chunk_start = n_row_position + 1
+            current_length = 0
+    if chunk_start < len(rows) or not chunks:
+        chunks.append((chunk_start, len(rows)))
+    return chunks
+
+
+def count_ngrams_ids_parallel(
+        rows: list[str], n: int = N_WORDS_GRAM, n_chunks: int | None = None, token_filters: list[TokenFilter] | None = None
+) -> tuple[list[str], dict[int | tuple[int, ...], array]]:
+    """
+    Like count_ngrams_ids(), but it tokenizes, stems and counts contiguous chunks of rows within the process pool,
+    then merges the partial results remapping the stem ids and the row positions. Since the chunks are merged
+    in order the result (stem ids, n-grams and occurrences order) is the same of count_ngrams_ids(), so the
+    'word_prefix' vote is done later on the merged occurrences.
+
+    Args:
+        rows (list[str]): The text rows to analyze.
+        n (int): The maximum number of words to consider for n-grams.
+        n_chunks (int | None): The number of chunks (default is twice the PARALLEL_MAX_WORKERS constant).
+        token_filters (list[str] | None): the token filters applied before counting.
+
+    Returns:
+        tuple[list[str], dict]: the list of the interned stems and the dict of the n-grams occurrences.
+    """
+    chunks = split_rows_in_chunks(rows, n_chunks or 2 * PARALLEL_MAX_WORKERS)
+    app_logger.info(f"counting n-grams of {len(rows)} rows in {len(chunks)} chunks...")
+    executor = get_process_pool()
+    futures = [executor.submit(count_ngrams_ids_by_rows, rows[first:last], n, token_filters) for first, last in chunks]
+
+    stems_list: list[str] = []
+    stems_ids: dict[str, int] = {}
+    ngram_occurrences: dict[int | tuple[int, ...], array] = {}
+    for (first, _), future in zip(chunks, futures):
+        chunk_stems_list, chunk_ngram_occurrences = future.result()
+        # remap the chunk stem ids to the global ones
+        chunk_ids = []
+        for stem in chunk_stems_list:
+            stem_id = stems_ids.get(stem)
+            if stem_id is None:
+                stem_id = stems_ids[stem] = len(stems_list)
+                stems_list.append(stem)
+            chunk_ids.append(stem_id)
+        for chunk_key, chunk_occurrences in chunk_ngram_occurrences.items():
+            if isinstance(chunk_key, int):
+                ngram_key = chunk_ids[chunk_key]
+            else:
+                ngram_key = tuple([chunk_ids[stem_id] for stem_id in chunk_key])
+            if first:
+                # the chunk row positions start from zero
+                chunk_occurrences[0::3] = array("l", [n_row_position + first for n_row_position in chunk_occurrences[0::3]])
+            occurrences = ngram_occurrences.get(ngram_key)
+            if occurrences is None:
+                ngram_occurrences[ngram_key] = chunk_occurrences
+            else:
+                occurrences.extend(chunk_occurrences)
+    return stems_list, ngram_occurrences
+
+
+def get_n_words_ngram(ngram_key: int | tuple[int, ...]) -> int:
+    """Get the number of words of an n-gram key made by stem ids."""
+    return 1 if isinstance(ngram_key, int) else len(ngram_key)
+
+
+def get_ngram_stem(stems_list: list[str], ngram_key: int | tuple[int, ...]) -> str:
+    """
+    Convert an n-gram key made by stem ids back to its stem string.
+
+    Args:
+        stems_list (list[str]): The list of the interned stems.
+        ngram_key (int | tuple[int, ...]): The stem id of a unigram or the tuple of stem ids of an n-gram.
+
+    Returns:
+        str: the n-gram stem, with the stems joined by a space.
+    """
+    if isinstance(ngram_key, int):
+        return stems_list[ngram_key]
+    return " ".join([stems_list[stem_id] for stem_id in ngram_key])
+
+
+def get_ngrams_dict_from_ids(
+        stems_list: list[str],
+        ngram_occurrences: dict[int | tuple[int, ...], array],
+        idx_rows_list: list[int],
+        idx_rows_child: list[int],
+        idx_rows_parent: list[int],
+        rows_dict: dict[int, str],
+        offsets_limit: int | None = None
+) -> dict:
+    """
+    Convert the n-grams occurrences counted by count_ngrams_ids() to the words frequency dict.
+    The 'word_prefix' is set to the most common 'word' in offsets_array.
+
+    Args:
+        stems_list (list[str]): The list of the interned stems.
+        ngram_occurrences (dict): The dict of n-grams occurrences, keyed by stem ids.
+        idx_rows_list (list[int]): List of row indices, by row position.
+        idx_rows_child (list[int]): List of child row indices, by row position.
+        idx_rows_parent (list[int]): List of parent row indices, by row position.
+        rows_dict (dict[int, str]): Dictionary mapping row indices to their text.
+        offsets_limit (int | None): the maximum number of offsets for every n-gram; when used, every entry
+            has also a 'next_cursor' key (None if all the offsets are included).
+
+    Returns:
+        dict: Dictionary with n-gram stems as keys and a dictionary of their counts, word prefixes, and offsets as values.
+    """
+    return dict(iter_ngrams_dict_from_ids(
+        stems_list, ngram_occurrences, idx_rows_list, idx_rows_child, idx_rows_parent, rows_dict=rows_dict,
+        offsets_limit=offsets_limit
+    ))
+
+
+def iter_ngrams_dict_from_ids(
+        stems_list: list[str],
+        ngram_occurrences: dict[int | tuple[int, ...], array],
+        idx_rows_list: list[int],
+        idx_rows_child: list[int],
+        idx_rows_parent: list[int],
+        rows_dict: dict[int, str],
+        offsets_limit: int | None = None
+) -> Iterator[tuple[str, WordStem]]:
+    """
+    Generator version of get_ngrams_dict_from_ids(), yielding one (n-gram stem, entry) tuple at a time.
+
+    Args:
+        stems_list (list[str]): The list of the interned stems.
+        ngram_occurrences (dict): The dict of n-grams occurrences, keyed by stem ids.
+        idx_rows_list (list[int]): List of row indices, by row position.
+        idx_rows_child (list[int]): List of child row indices, by row position.
+        idx_rows_parent (list[int]): List of parent row indices, by row position.
+        rows_dict (dict[int, str]): Dictionary mapping row indices to their text.
+        offsets_limit (int | None): the maximum number of offsets for every n-gram, see get_ngrams_dict_from_ids().
+
+    Returns:
+        Iterator[tuple[str, dict]]: a generator of (n-gram stem, words frequency entry) tuples.
+    """
+    from collections import Counter
+
+    for ngram_key, occurrences in ngram_occurrences.items():
+        words = [
+            rows_dict[idx_rows_list[occurrences[j]]][occurrences[j + 1]:occurrences[j + 2]]
+            for j in range(0, len(occurrences), 3)
+        ]
+        count = len(words)
+        page_length = count if offsets_limit is None else min(offsets_limit, count)
+        offsets_array = []
+        for i in range(page_length):
+            n_row_position, start, end = occurrences[3 * i], occurrences[3 * i + 1], occurrences[3 * i + 2]
+            offsets_array.append({
+                "word": words[i],
+                "offsets": [start, end],
+                "n_row": idx_rows_list[n_row_position],
+                "n_row_child": idx_rows_child[n_row_position],
+                "n_row_parent": idx_rows_parent[n_row_position]
+            })
+        # word_prefix is the most common 'word' among all the occurrences
+        most_common_word, _ = Counter(words).most_common(1)[0]
+        entry = {
+            "count": count,
+            "word_prefix": most_common_word,
+            "offsets_array": offsets_array,
+            "n_words_ngram": get_n_words_ngram(ngram_key)
+        }
+        if offsets_limit is not None:
+            entry["next_cursor"] = page_length if page_length < count else None
+        yield get_ngram_stem(stems_list, ngram_key), entry
+
+
+def get_ngrams_columnar_from_ids(
+        stems_list: list[str],
+        ngram_occurrences: dict[int | tuple[int, ...], array],
+        idx_rows_list: list[int],
+        idx_rows_child: list[int],
+        idx_rows_parent: list[int],
+        rows_dict: dict[int, str],
+        offsets_limit: int | None = None
+) -> dict:
+    """
+    Convert the n-grams occurrences counted by count_ngrams_ids() to a compact columnar words frequency dict:
+    one table with the distinct surface words, one table with the row indices and, for every n-gram stem,
+    parallel integer arrays (word ids, starts, ends and row positions) instead of an offsets dict for every occurrence.
+    Missing child/parent row indices are represented by -1.
+
+    Args:
+        stems_list (list[str]): The list of the interned stems.
+        ngram_occurrences (dict): The dict of n-grams occurrences, keyed by stem ids.
+        idx_rows_list (list[int]): List of row indices, by row position.
+        idx_rows_child (list[int]): List of child row indices, by row position.
+        idx_rows_parent (list[int]): List of parent row indices, by row position.
+        rows_dict (dict[int, str]): Dictionary mapping row indices to their text.
+        offsets_limit (int | None): the maximum number of occurrences for every n-gram, see get_ngrams_dict_from_ids().
+
+    Returns:
+        dict: a dict with the "words" and "rows" tables and the "stems" dict with the columnar occurrences.
+    """
+    from collections import Counter
+
+    words_list: list[str] = []
+    words_ids: dict[str, int] = {}
+    stems_dict = {}
+    for ngram_key, occurrences in ngram_occurrences.items():
+        rows_positions = occurrences[0::3]
+        starts = occurrences[1::3]
+        ends = occurrences[2::3]
+        word_ids = array("l")
+        for n_row_position, start, end in zip(rows_positions, starts, ends):
+            word = rows_dict[idx_rows_list[n_row_position]][start:end]
+            word_id = words_ids.get(word)
+            if word_id is None:
+                word_id = words_ids[word] = len(words_list)
+                words_list.append(word)
+            word_ids.append(word_id)
+        most_common_word_id, _ = Counter(word_ids).most_common(1)[0]
+        count = len(word_ids)
+        page_length = count if offsets_limit is None else min(offsets_limit, count)
+        entry = {
+            "count": count,
+            "word_prefix": words_list[most_common_word_id],
+            "n_words_ngram": get_n_words_ngram(ngram_key),
+            "word_ids": word_ids[:page_length].tolist(),
+            "starts": starts[:page_length].tolist(),
+            "ends": ends[:page_length].tolist(),
+            "rows": rows_positions[:page_length].tolist()
+        }
+        if offsets_limit is not None:
+            entry["next_cursor"] = page_length if page_length < count else None
+        stems_dict[get_ngram_stem(stems_list, ngram_key)] = entry
+    return {
+        "words": words_list,
+        "rows": {
+            "n_row": list(idx_rows_list),
+            "n_row_child": [-1 if idx is None else idx for idx in idx_rows_child],
+            "n_row_parent": [-1 if idx is None else idx for idx in idx_rows_parent]
+        },
+        "stems": stems_dict
+    }
@@ -6,11 +6,17 @@ import nltk
 import pyinflect
 from typing import Any, Optional
 from fastapi import HTTPException
+from spacy.tokens import Doc
 
-from my_ghost_writer.constants import SPACY_MODEL_NAME, app_logger, ELIGIBLE_POS, NLTK_DATA
+from my_ghost_writer.constants import (SPACY_MODEL_NAME, app_logger, ELIGIBLE_POS, NLTK_DATA, PARALLEL_MIN_TEXT_LENGTH,
+    SPACY_LEMMA_PIPES, SPACY_PIPE_BATCH_SIZE, SPACY_PIPE_N_PROCESS, SPACY_TOKEN_BYTES)
 from my_ghost_writer.custom_synonym_handler import CustomSynonymHandler
+from my_ghost_writer.document_registry import document_registry
+from my_ghost_writer.result_cache import get_content_hash, words_frequency_cache
+from my_ghost_writer.text_parsers import count_ngrams_ids, get_rows_indices, get_valid_textrows_with_num
 from my_ghost_writer.thesaurus import wn
-from my_ghost_writer.type_hints import WordSynonymResult, ContextInfo, SynonymGroup
+from my_ghost_writer.type_hints import (WordSynonymResult, ContextInfo, SynonymGroup, RequestTextRowsParentList,
+    TextNgramsCount, TokenFilter)
 
 
 custom_synonym_handler = CustomSynonymHandler()
@@ -40,11 +46,120 @@ def is_nlp_available() -> bool:
     return nlp is not None
 
 
-def find_synonyms_for_phrase(text: str, start_idx: int, end_idx: int) -> list[WordSynonymResult]:
+def lemmatize_rows_with_spans(
+        rows: list[str], batch_size: int = SPACY_PIPE_BATCH_SIZE, n_process: int | None = None
+) -> list[list[tuple[str, int, int, str]]]:
+    """
+    Tokenize and lemmatize the given text rows with nlp.pipe(), in batches and with only the pipeline components
+    needed by the lemmatizer (see the SPACY_LEMMA_PIPES constant): the parser and the named entity recognizer are
+    disabled. Multiple processes are used only for texts longer than the PARALLEL_MIN_TEXT_LENGTH constant,
+    since every process loads its own copy of the model.
+
+    Args:
+        rows (list[str]): The text rows to lemmatize.
+        batch_size (int): the number of rows processed together by every pipeline component.
+        n_process (int | None): the number of processes (default is from the SPACY_PIPE_N_PROCESS constant).
+
+    Returns:
+        list[list[tuple[str, int, int, str]]]: the (token, start, end, lowercase lemma) tuples of every row,
+            without the whitespace tokens.
+    """
+    if nlp is None:
+        app_logger.error(
+            f"spaCy model '{SPACY_MODEL_NAME}' not found. Please install it with: 'python -m spacy download {SPACY_MODEL_NAME}'"
+        )
+        raise HTTPException(status_code=503, detail="NLP service is unavailable")
+    if n_process is None:
+        n_process = SPACY_PIPE_N_PROCESS if sum(len(row) for row in rows) >= PARALLEL_MIN_TEXT_LENGTH else 1
+    disabled_pipes = [name for name in nlp.pipe_names if name not in SPACY_LEMMA_PIPES]
+    app_logger.info(f"lemmatizing {len(rows)} rows, batch_size: {batch_size}, n_process: {n_process}, disabled: {disabled_pipes}.")
+    return [
+        [(token.text, token.idx, token.idx + len(token.text), token.lemma_.lower()) for token in doc if not token.is_space]
+        for doc in nlp.pipe(rows, batch_size=batch_size, n_process=n_process, disable=disabled_pipes)
+    ]
+
+
+def count_text_ngrams_lemmas(
+        text: str | RequestTextRowsParentList, n: int = 3, token_filters: list[TokenFilter] | None = None
+) -> TextNgramsCount:
+    """
+    Like text_parsers.count_text_ngrams(), but the n-grams are grouped by the spaCy lemmas (e.g. "went" and "go")
+    instead of the Porter stems, so the "stems_list" contains the lemmas.
+
+    Args:
+        text (str): plain text str, json str or list of text rows dicts (see text_parsers.get_valid_textrows_with_num()).
+        n (int): The maximum number of words to consider for n-grams (default is 3).
+        token_filters (list[str] | None): the token filters applied before counting, see text_parsers.count_ngrams_ids().
+
+    Returns:
+        TextNgramsCount: the interned lemmas, the n-grams occurrences and the rows indices.
+    """
+    valid_textrows_with_num = get_valid_textrows_with_num(text)
+    rows, idx_rows, idx_rows_child, idx_rows_parent, rows_dict = get_rows_indices(valid_textrows_with_num)
+    lemmas_list, ngram_occurrences = count_ngrams_ids(
+        lemmatize_rows_with_spans(rows), n=n, token_filters=token_filters, by_lemma=True
+    )
+    return {
+        "n_total_rows": len(valid_textrows_with_num),
+        "stems_list": lemmas_list,
+        "ngram_occurrences": ngram_occurrences,
+        "idx_rows": idx_rows,
+        "idx_rows_child": idx_rows_child,
+        "idx_rows_parent": idx_rows_parent,
+        "rows_dict": rows_dict
+    }
+
+
+def count_text_ngrams_lemmas_cached(
+        text: str | RequestTextRowsParentList, n: int = 3, token_filters: list[TokenFilter] | None = None
+) -> tuple[TextNgramsCount, str, bool]:
+    """
+    Like count_text_ngrams_lemmas(), but it uses the words frequency result cache, see text_parsers.count_text_ngrams_cached().
+
+    Returns:
+        tuple[TextNgramsCount, str, bool]: the counted n-grams, their content hash and whether it was a cache hit.
+    """
+    valid_textrows_with_num = get_valid_textrows_with_num(text)
+    content_hash = get_content_hash(valid_textrows_with_num, n, sorted(token_filters or []), "lemma", SPACY_MODEL_NAME)
+    ngrams_count = words_frequency_cache.get(content_hash)
+    if ngrams_count is not None:
+        app_logger.info(f"words frequency (lemmas) cache hit: {content_hash}.")
+        return ngrams_count, content_hash, True
+    ngrams_count = count_text_ngrams_lemmas(valid_textrows_with_num, n=n, token_filters=token_filters)
+    words_frequency_cache.set(content_hash, ngrams_count)
+    return ngrams_count, content_hash, False
+
+
+def get_document_doc(document_id: str) -> Doc:
+    """
+    Get the spaCy doc of a registered document (see document_registry.DocumentRegistry), parsed only once.
+
+    Args:
+        document_id (str): the document id.
+
+    Returns:
+        Doc: the parsed document, raising a KeyError if the document is missing.
+    """
+    if nlp is None:
+        app_logger.error(
+            f"spaCy model '{SPACY_MODEL_NAME}' not found. Please install it with: 'python -m spacy download {SPACY_MODEL_NAME}'"
+        )
+        raise HTTPException(status_code=503, detail="NLP service is unavailable")
+
+    def build(text: str) -> tuple[Doc, int]:
+        doc = nlp(text)
+        # rough estimate: the token structs and the tok2vec tensor
+        return doc, len(doc) * SPACY_TOKEN_BYTES + doc.tensor.nbytes
+
+    return document_registry.get_artifact(document_id, "spacy_doc", build)
+
+
+def find_synonyms_for_phrase(text: str, start_idx: int, end_idx: int, doc: Doc | None = None) -> list[WordSynonymResult]:
     """
     Finds synonyms for all eligible words within a selected text span.
     It analyzes the span, filters for meaningful words (nouns, verbs, etc.),
-    and returns a list of synonym results for each.
+    and returns a list of synonym results for each. The text is parsed once
+    (or not at all when the parsed doc is given, see get_document_doc()).
     """
     if nlp is None:
         app_logger.error(
@@ -52,7 +167,8 @@ def find_synonyms_for_phrase(text: str, start_idx: int, end_idx: int) -> list[Wo
         )
         raise HTTPException(status_code=503, detail="NLP service is unavailable")
 
-    doc = nlp(text)
+    if doc is None:
+        doc = nlp(text)
     # Use 'expand' to ensure the span covers full tokens even with partial selection
     span = doc.char_span(start_idx, end_idx, alignment_mode="expand")
 
@@ -70,7 +186,7 @@ def find_synonyms_for_phrase(text: str, start_idx: int, end_idx: int) -> list[Wo
             try:
                 # 1. Get context for this specific token
                 context_info_dict = extract_contextual_info_by_indices(
-                    text, token.idx, token.idx + len(token.text), token.text
+                    text, token.idx, token.idx + len(token.text), token.text, doc=doc
                 )
 
                 # 2. Get synonym groups using the token's lemma for a better search
@@ -115,8 +231,10 @@ def find_synonyms_for_phrase(text: str, start_idx: int, end_idx: int) -> list[Wo
     return results
 
 
-def extract_contextual_info_by_indices(text: str, start_idx: int, end_idx: int, target_word: str) -> dict[str, Any]:
-    """Extract grammatical and contextual information using character indices"""
+def extract_contextual_info_by_indices(
+        text: str, start_idx: int, end_idx: int, target_word: str, doc: Doc | None = None
+) -> dict[str, Any]:
+    """Extract grammatical and contextual information using character indices, parsing the text if doc isn't given"""
     if nlp is None:
         raise HTTPException(status_code=500, detail="spaCy model not available")
 
@@ -125,7 +243,8 @@ def extract_contextual_info_by_indices(text: str, start_idx: int, end_idx: int,
         raise HTTPException(status_code=400, detail="Invalid start/end indices")
 
     try:
-        doc = nlp(text)
+        if doc is None:
+            doc = nlp(text)
 
         # Find the token that corresponds to our character indices
         target_token = None
@@ -1,5 +1,8 @@
 from typing import Any, TypedDict, Optional, Literal
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+
+TokenFilter = Literal["punctuation", "stopwords", "sentence"]
 
 
 class RelatedEntry(BaseModel):
@@ -28,23 +31,154 @@ class RequestWordQueryBody(BaseModel):
     word: str
 
 
-class RequestTextFrequencyBody(BaseModel):
+class RequestTextOrDocumentBody(BaseModel):
+    text: Optional[str] = None
+    document_id: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_text_or_document_id(self):
+        """The body needs either the text or the id of a document uploaded with /documents"""
+        if (self.text is None) == (self.document_id is None):
+            raise ValueError("Send either 'text' or 'document_id'.")
+        return self
+
+
+class RequestTextFrequencyBody(RequestTextOrDocumentBody):
+    format: Literal["dict", "columnar", "ndjson"] = "dict"
+    min_count: int = Field(default=1, ge=1)
+    top_k: Optional[int] = Field(default=None, ge=1)
+    n_words_ngram: Optional[list[int]] = None
+    offsets_limit: Optional[int] = Field(default=None, ge=0)
+    token_filters: Optional[list[TokenFilter]] = None
+    approximate: bool = False
+    grouping: Literal["stem", "lemma"] = "stem"
+    histogram_bins: Optional[int] = Field(default=None, ge=1, le=1000)
+    histogram_by: Literal["chars", "rows"] = "chars"
+    collocations: Optional[Literal["pmi", "log_likelihood"]] = None
+    collocations_min_count: int = Field(default=5, ge=1)
+    collocations_top_k: Optional[int] = Field(default=100, ge=1)
+    overuse_reference: Optional[str] = Field(default=None, pattern=r"^[\w-]+$")
+
+
+class RequestCountedTextBody(BaseModel):
+    content_hash: Optional[str] = None
+    text: Optional[str] = None
+    document_id: Optional[str] = None
+    token_filters: Optional[list[TokenFilter]] = None
+
+    @model_validator(mode="after")
+    def check_content_hash_text_or_document_id(self):
+        """The body needs either the content hash returned by /words-frequency, the text or the id of a document"""
+        if sum(value is not None for value in (self.content_hash, self.text, self.document_id)) != 1:
+            raise ValueError("Send either 'content_hash', 'text' or 'document_id'.")
+        return self
+
+
+class RequestWordsFrequencyOffsetsBody(RequestCountedTextBody):
+    stem: str
+    cursor: int = Field(default=0, ge=0)
+    limit: Optional[int] = Field(default=None, ge=1)
+
+
+class RequestWordsFrequencyDeltaBody(BaseModel):
+    old_text: Optional[str] = None
+    new_text: Optional[str] = None
+    old_content_hash: Optional[str] = None
+    new_content_hash: Optional[str] = None
+    min_delta: int = Field(default=1, ge=1)
+    top_k: Optional[int] = Field(default=None, ge=1)
+    n_words_ngram: Optional[list[int]] = None
+    token_filters: Optional[list[TokenFilter]] = None
+
+
+class RequestWordsFrequencySearchBody(RequestCountedTextBody):
+    query: str = ""
+    match: Literal["prefix", "substring", "regex"] = "prefix"
+    sort_by: Literal["count", "alphabetical"] = "count"
+    reverse: bool = False
+    min_count: int = Field(default=1, ge=1)
+    n_words_ngram: Optional[list[int]] = None
+    offset: int = Field(default=0, ge=0)
+    limit: int = Field(default=100, ge=1, le=10000)
+    offsets_limit: Optional[int] = Field(default=None, ge=0)
+
+
+class RequestWordsFrequencySessionBody(BaseModel):
+    text: str
+    session_id: Optional[str] = None
+    format: Literal["delta", "dict", "columnar"] = "delta"
+    token_filters: Optional[list[TokenFilter]] = None
+
+
+class RequestRepeatedPhrasesBody(BaseModel):
     text: str
+    min_words: int = Field(default=4, ge=1)
+    min_count: int = Field(default=2, ge=2)
+    top_k: int = Field(default=100, ge=1)
+    token_filters: Optional[list[TokenFilter]] = None
+
+
+class RequestEchoesBody(BaseModel):
+    text: str
+    window: int = Field(default=30, ge=0)
+    unit: Literal["tokens", "chars"] = "tokens"
+    min_count: int = Field(default=2, ge=2)
+    top_k: Optional[int] = Field(default=None, ge=1)
+    token_filters: Optional[list[TokenFilter]] = None
+
+
+class RequestNearDuplicatesBody(BaseModel):
+    text: str
+    threshold: float = Field(default=0.7, gt=0, le=1)
+    shingle_size: int = Field(default=2, ge=1)
+    min_words: int = Field(default=5, ge=1)
+    top_k: Optional[int] = Field(default=None, ge=1)
+
+
+class RequestIndexChapterBody(BaseModel):
+    chapter_id: str = Field(min_length=1)
+    text: str
+
+
+class RequestIndexSearchBody(BaseModel):
+    phrase: str
+    limit: Optional[int] = Field(default=None, ge=1)
+
+
+class RequestIndexFrequenciesBody(BaseModel):
+    stems: Optional[list[str]] = None
+    top_k: Optional[int] = Field(default=None, ge=1)
 
 
 class RequestQueryThesaurusWordsapiBody(BaseModel):
     query: str
 
 
-class RequestSplitText(BaseModel):
-    text: str
+class RequestSplitText(RequestTextOrDocumentBody):
     end: int
     start: int
     word: str
 
 
-class RequestQueryThesaurusInflatedBody(BaseModel):
+class RequestDocumentBody(BaseModel):
     text: str
+
+
+class RequestCustomLexiconMatchesBody(RequestTextOrDocumentBody):
+    pass
+
+
+class RequestSplitTextWord(BaseModel):
+    start: int
+    end: int
+    word: str
+
+
+class RequestSplitTextBatch(RequestTextOrDocumentBody):
+    words: list[RequestSplitTextWord] = Field(min_length=1)
+
+
+class RequestQueryThesaurusInflatedBody(RequestTextOrDocumentBody):
     end: int
     start: int
     word: str
@@ -134,6 +268,19 @@ class WordStem(TypedDict):
     offsets_array: list[OffsetArray]
 
 
+class TextNgramsCount(TypedDict):
+    """
+    TypedDict for the n-grams counted by text_parsers.count_text_ngrams(), before the conversion to a words frequency dict.
+    """
+    n_total_rows: int
+    stems_list: list[str]
+    ngram_occurrences: dict[int | tuple[int, ...], Any]
+    idx_rows: list[int]
+    idx_rows_child: list[Optional[int]]
+    idx_rows_parent: list[Optional[int]]
+    rows_dict: dict[int, str]
+
+
 class ResultWordsAPI(TypedDict):
     definition: str
     synonyms: Optional[list[str]]
@@ -161,6 +308,7 @@ class ResponseWordsAPI(TypedDict):
     results: list[ResultWordsAPI]
 
 
+ResponseFormat = Literal["dict", "columnar"]
 RequestTextRowsList = list[InputTextRow]
 RequestTextRowsParentList = list[InputTextRowWithParent]
 ResponseTextRowsDict = tuple[int, dict[str, WordStem]]
@@ -0,0 +1,118 @@
+import re
+from bisect import bisect_left
+from typing import Literal
+
+from my_ghost_writer.constants import app_logger, RESULT_CACHE_MAX_ITEMS
+from my_ghost_writer.frequency_delta import get_sorted_ngrams_counts
+from my_ghost_writer.result_cache import ResultCache
+from my_ghost_writer.text_parsers import get_n_words_ngram, iter_words_frequency_from_count
+from my_ghost_writer.type_hints import TextNgramsCount
+
+
+class WordsFrequencySearchIndex:
+    """
+    Search index over the n-grams of a counted text: the n-gram stems sorted alphabetically (a prefix query is a
+    binary search) with their counts, n-gram keys and ranks by descending count, built once for every cached result.
+    """
+    def __init__(self, ngrams_count: TextNgramsCount):
+        sorted_ngrams_counts = get_sorted_ngrams_counts(ngrams_count)
+        self.stems = [stem for stem, _, _ in sorted_ngrams_counts]
+        self.counts = [count for _, count, _ in sorted_ngrams_counts]
+        self.keys = [ngram_key for _, _, ngram_key in sorted_ngrams_counts]
+        self.n_words = [get_n_words_ngram(ngram_key) for ngram_key in self.keys]
+        # the position of every n-gram sorted by descending count and then by stem
+        by_count = sorted(range(len(self.stems)), key=lambda i: -self.counts[i])
+        self.count_ranks = [0] * len(by_count)
+        for rank, i in enumerate(by_count):
+            self.count_ranks[i] = rank
+
+    def match(self, query: str, match: Literal["prefix", "substring", "regex"] = "prefix") -> list[int]:
+        """
+        Find the n-grams whose stem matches the query (case-insensitive, the stems are lowercase).
+
+        Args:
+            query (str): the searched text, an empty query matches all the n-grams.
+            match (str): "prefix" (default), "substring" or "regex" (a python regular expression, searched within the stem).
+
+        Returns:
+            list[int]: the positions of the matching n-grams, sorted alphabetically by stem.
+        """
+        if match == "regex":
+            pattern = re.compile(query, re.IGNORECASE)
+            return [i for i, stem in enumerate(self.stems) if pattern.search(stem)]
+        query = query.lower()
+        if not query:
+            return list(range(len(self.stems)))
+        if match == "substring":
+            return [i for i, stem in enumerate(self.stems) if query in stem]
+        start = bisect_left(self.stems, query)
+        end = start
+        while end < len(self.stems) and self.stems[end].startswith(query):
+            end += 1
+        return list(range(start, end))
+
+
+def get_words_frequency_search_index(ngrams_count: TextNgramsCount, content_hash: str) -> WordsFrequencySearchIndex:
+    """Get the search index of a counted text, built only once for every content hash (see WordsFrequencySearchIndex)."""
+    search_index = search_index_cache.get(content_hash)
+    if search_index is None:
+        search_index = WordsFrequencySearchIndex(ngrams_count)
+        search_index_cache.set(content_hash, search_index)
+        app_logger.info(f"built search index of {content_hash}: {len(search_index.stems)} n-grams.")
+    return search_index
+
+
+def search_words_frequency(
+        ngrams_count: TextNgramsCount,
+        content_hash: str,
+        query: str = "",
+        match: Literal["prefix", "substring", "regex"] = "prefix",
+        sort_by: Literal["count", "alphabetical"] = "count",
+        reverse: bool = False,
+        min_count: int = 1,
+        n_words_ngram: list[int] | None = None,
+        offset: int = 0,
+        limit: int = 100,
+        offsets_limit: int | None = None
+) -> dict:
+    """
+    Search the n-grams of a counted text and render a page of the matching ones as words frequency entries,
+    so the client can fetch only the entries it displays instead of the complete words frequency dict.
+
+    Args:
+        ngrams_count (TextNgramsCount): the counted n-grams, see text_parsers.count_text_ngrams_cached().
+        content_hash (str): the content hash of the counted n-grams, the key of their search index.
+        query (str): the searched text, see WordsFrequencySearchIndex.match().
+        match (str): "prefix" (default), "substring" or "regex".
+        sort_by (str): "count" (default, by descending count) or "alphabetical" (by stem).
+        reverse (bool): reverse the sort order.
+        min_count (int): keep only the n-grams with at least this count.
+        n_words_ngram (list[int] | None): keep only the n-grams with these numbers of words.
+        offset (int): the index of the first matching n-gram to return.
+        limit (int): the maximum number of n-grams to return.
+        offsets_limit (int | None): the maximum number of offsets for every n-gram, see text_parsers.text_stemming().
+
+    Returns:
+        dict: a dict with the "words_frequency" page (n-gram stem -> words frequency entry, in the requested order),
+            the "n_matches" total and the "next_offset" (None on the last page).
+    """
+    search_index = get_words_frequency_search_index(ngrams_count, content_hash)
+    positions = [
+        i for i in search_index.match(query, match)
+        if search_index.counts[i] >= min_count and (not n_words_ngram or search_index.n_words[i] in n_words_ngram)
+    ]
+    if sort_by == "count":
+        positions.sort(key=search_index.count_ranks.__getitem__)
+    if reverse:
+        positions.reverse()
+    page = positions[offset:offset + limit]
+    next_offset = offset + limit if offset + limit < len(positions) else None
+    ngram_occurrences = ngrams_count["ngram_occurrences"]
+    page_count = {**ngrams_count, "ngram_occurrences": {
+        search_index.keys[i]: ngram_occurrences[search_index.keys[i]] for i in page
+    }}
+    words_frequency = dict(iter_words_frequency_from_count(page_count, offsets_limit=offsets_limit))
+    return {"words_frequency": words_frequency, "n_matches": len(positions), "next_offset": next_offset}
+
+
+search_index_cache = ResultCache(RESULT_CACHE_MAX_ITEMS)
@@ -0,0 +1,25 @@
+import unittest
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_iter_matches(self):
+        from my_ghost_writer.aho_corasick import AhoCorasickAutomaton
+        automaton = AhoCorasickAutomaton(["he", "she", "his", "hers", ""])
+        self.assertEqual(list(automaton.iter_matches("ushers")), [(1, 4, 1), (2, 4, 0), (2, 6, 3)])
+        self.assertEqual(list(automaton.iter_matches("this")), [(1, 4, 2)])
+        self.assertEqual(list(automaton.iter_matches("xyz")), [])
+
+    def test_iter_matches_brute_force(self):
+        from my_ghost_writer.aho_corasick import AhoCorasickAutomaton
+        patterns = ["a", "ab", "bab", "bc", "bca", "c", "caa", "aa"]
+        text = "abccabbcaabcabaabcaaab"
+        automaton = AhoCorasickAutomaton(patterns)
+        expected = sorted(
+            (i, i + len(pattern), pattern_id) for pattern_id, pattern in enumerate(patterns)
+            for i in range(len(text)) if text.startswith(pattern, i)
+        )
+        self.assertEqual(sorted(automaton.iter_matches(text)), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
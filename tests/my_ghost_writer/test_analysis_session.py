@@ -0,0 +1,75 @@
+import unittest
+
+from tests import EVENTS_FOLDER
+
+
+class TestAnalysisSession(unittest.TestCase):
+    def setUp(self):
+        with open(EVENTS_FOLDER / "llm_generated_story_3.txt", "r") as src:
+            self.text = src.read()
+
+    def assert_same_words_frequency(self, session, text, response_format="dict", counts_delta=None):
+        from my_ghost_writer.text_parsers import get_words_frequency_from_count, text_stemming
+        n_total_rows, expected_words_stems_dict = text_stemming(
+            text, n=session.n, response_format=response_format, token_filters=session.token_filters
+        )
+        ngrams_count = session.get_ngrams_count()
+        self.assertEqual(ngrams_count["n_total_rows"], n_total_rows)
+        words_stems_dict = get_words_frequency_from_count(ngrams_count, response_format=response_format)
+        self.assertEqual(words_stems_dict, expected_words_stems_dict)
+        self.assertEqual(list(words_stems_dict), list(expected_words_stems_dict))
+        for ngram_stem, count in (counts_delta or {}).items():
+            self.assertEqual(count, expected_words_stems_dict.get(ngram_stem, {}).get("count", 0))
+
+    def test_update(self):
+        from my_ghost_writer.analysis_session import AnalysisSession
+        from my_ghost_writer.text_parsers import get_valid_textrows_with_num
+        session = AnalysisSession(n=3)
+        rows = self.text.split("\n")
+        session_update = session.update(get_valid_textrows_with_num(self.text))
+        self.assertEqual(session_update["added_rows"], len(rows))
+        self.assertEqual(session_update["removed_rows"], 0)
+        self.assert_same_words_frequency(session, self.text)
+        self.assert_same_words_frequency(session, self.text, response_format="columnar")
+
+        # edit a row, remove another one and insert a new one
+        edited_rows = list(rows)
+        edited_rows[0] = "A brand new title, new and renewed"
+        del edited_rows[2]
+        edited_rows.insert(4, "Another new row.")
+        edited_text = "\n".join(edited_rows)
+        session_update = session.update(get_valid_textrows_with_num(edited_text))
+        self.assertEqual(session_update["added_rows"], 2)
+        self.assertEqual(session_update["removed_rows"], 2)
+        self.assertEqual(session_update["counts_delta"]["brand new"], 1)
+        self.assert_same_words_frequency(session, edited_text, counts_delta=session_update["counts_delta"])
+
+        # going back to the original text doesn't count again the rows already within the session
+        session_update = session.update(get_valid_textrows_with_num(edited_text + "\n" + rows[0]))
+        self.assertEqual(session_update["added_rows"], 1)
+        self.assert_same_words_frequency(session, edited_text + "\n" + rows[0])
+        session_update = session.update(get_valid_textrows_with_num("A brand new title, new and renewed"))
+        self.assertEqual(session_update["added_rows"], 0)
+        self.assertNotIn("brand new", session_update["counts_delta"])
+        self.assertEqual(session_update["counts_delta"]["anoth"], 0)
+        self.assert_same_words_frequency(
+            session, "A brand new title, new and renewed", counts_delta=session_update["counts_delta"]
+        )
+
+    def test_update_token_filters(self):
+        from my_ghost_writer.analysis_session import AnalysisSession
+        from my_ghost_writer.text_parsers import get_valid_textrows_with_num
+        session = AnalysisSession(n=2, token_filters=["punctuation", "stopwords"])
+        session.update(get_valid_textrows_with_num(self.text))
+        self.assert_same_words_frequency(session, self.text)
+
+    def test_get_analysis_session(self):
+        from my_ghost_writer.analysis_session import get_analysis_session
+        session = get_analysis_session(None)
+        self.assertIs(get_analysis_session(session.session_id), session)
+        self.assertIsNot(get_analysis_session(session.session_id, n=2), session)
+        self.assertIsNot(get_analysis_session("missing"), session)
+
+
+if __name__ == "__main__":
+    unittest.main()
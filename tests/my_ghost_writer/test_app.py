@@ -1,5 +1,7 @@
 import asyncio
 import importlib
+import json
+import tempfile
 import unittest
 from http.client import responses
 from unittest.mock import patch, MagicMock
@@ -90,22 +92,332 @@ class TestAppEndpoints(unittest.TestCase):
             self.assertEqual(response.status_code, 200)
             self.assertIn("ME_CONFIG_MONGODB_USE_OK:False", response.text)
 
-    @patch("my_ghost_writer.app.text_parsers.text_stemming")
-    def test_words_frequency_success(self, mock_stemming):
-        mock_stemming.return_value = (1, {"word": 2})
+    @patch("my_ghost_writer.app.text_parsers.count_text_ngrams_cached")
+    def test_words_frequency_success(self, mock_count):
+        from my_ghost_writer.text_parsers import count_text_ngrams
+        mock_count.return_value = (count_text_ngrams("word word"), "hash", False)
         body = '{"text": "test test"}'
         response = self.client.post("/words-frequency", json=body)
         self.assertEqual(response.status_code, 200)
-        self.assertIn("words_frequency", response.json())
+        self.assertEqual(json.loads(response.json()["words_frequency"])["word"]["count"], 2)
+        # the same keys for every request, null for the optional parts not requested
+        self.assertEqual(set(response.json()), {
+            "words_frequency", "duration", "n_total_rows", "cache_hit", "content_hash", "heavy_hitters", "histograms",
+            "collocations", "overuse"
+        })
+        self.assertEqual(response.json()["content_hash"], "hash")
+        self.assertIsNone(response.json()["histograms"])
+
+    def test_words_frequency_columnar(self):
+        body = '{"text": "test tests, tested", "format": "columnar"}'
+        response = self.client.post("/words-frequency", json=body)
+        self.assertEqual(response.status_code, 200)
+        words_frequency = json.loads(response.json()["words_frequency"])
+        self.assertEqual(words_frequency["words"][:3], ["test", "tests", "tested"])
+        self.assertEqual(words_frequency["stems"]["test"]["count"], 3)
+        self.assertEqual(words_frequency["stems"]["test"]["starts"], [0, 5, 12])
+
+    def test_words_frequency_ndjson(self):
+        body = '{"text": "test tests, tested", "format": "ndjson"}'
+        response = self.client.post("/words-frequency", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(lines[0]["n_total_rows"], 1)
+        self.assertIn("cache_hit", lines[0])
+        self.assertIn("duration", lines[-1])
+        entries = {line.pop("stem"): line for line in lines[1:-1]}
+        self.assertEqual(entries["test"]["count"], 3)
+        self.assertEqual(entries["test"]["offsets_array"][1], {"word": "tests", "offsets": [5, 10], "n_row": 0, "n_row_child": None, "n_row_parent": None})
+        self.assertEqual(entries["test , test"]["n_words_ngram"], 3)
+
+    def test_words_frequency_filters(self):
+        body = '{"text": "test tests, tested. Other words", "min_count": 2, "top_k": 1, "offsets_limit": 1}'
+        response = self.client.post("/words-frequency", json=body)
+        self.assertEqual(response.status_code, 200)
+        words_frequency = json.loads(response.json()["words_frequency"])
+        self.assertEqual(list(words_frequency), ["test"])
+        self.assertEqual(words_frequency["test"]["count"], 3)
+        self.assertEqual(len(words_frequency["test"]["offsets_array"]), 1)
+        self.assertEqual(words_frequency["test"]["next_cursor"], 1)
+
+    def test_words_frequency_token_filters(self):
+        body = '{"text": "The test, the tests.", "token_filters": ["punctuation", "stopwords"]}'
+        response = self.client.post("/words-frequency", json=body)
+        self.assertEqual(response.status_code, 200)
+        words_frequency = json.loads(response.json()["words_frequency"])
+        self.assertEqual(list(words_frequency), ["test", "the test", "test the", "the test the", "test the test"])
+
+    def test_words_frequency_offsets(self):
+        body = '{"text": "test tests, tested", "stem": "test", "cursor": 1, "limit": 1}'
+        response = self.client.post("/words-frequency-offsets", json=body)
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        self.assertEqual(response_json["count"], 3)
+        self.assertEqual(response_json["next_cursor"], 2)
+        self.assertEqual(response_json["offsets_array"], [{"word": "tests", "offsets": [5, 10], "n_row": 0, "n_row_child": None, "n_row_parent": None}])
+        # the next pages by content hash, without sending the text again
+        body = {"content_hash": response_json["content_hash"], "stem": "test", "cursor": 2}
+        response = self.client.post("/words-frequency-offsets", json=json.dumps(body))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["cache_hit"])
+        self.assertEqual([item["word"] for item in response.json()["offsets_array"]], ["tested"])
+        self.assertIsNone(response.json()["next_cursor"])
+        response = self.client.post("/words-frequency-offsets", json=json.dumps({**body, "content_hash": "missing"}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_words_frequency_cache_hit(self):
+        body = '{"text": "cached text, cached words"}'
+        self.client.post("/words-frequency", json=body)
+        response = self.client.post("/words-frequency", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["cache_hit"])
+        response = self.client.get("/health-cache")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(response.json()["words_frequency"]["hits"], 1)
+        self.assertIn("misses", response.json()["stems"])
+
+    def test_words_frequency_session(self):
+        response = self.client.post("/words-frequency-session", json='{"text": "first row\\nsecond row"}')
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        self.assertEqual(response_json["added_rows"], 2)
+        self.assertEqual(response_json["counts_delta"]["row"], 2)
+        self.assertNotIn("words_frequency", response_json)
+        body = json.dumps({"text": "first row\nthird row", "session_id": response_json["session_id"], "format": "dict"})
+        response = self.client.post("/words-frequency-session", json=body)
+        self.assertEqual(response.status_code, 200)
+        response_json_update = response.json()
+        self.assertEqual(response_json_update["session_id"], response_json["session_id"])
+        self.assertEqual(response_json_update["added_rows"], 1)
+        self.assertEqual(response_json_update["removed_rows"], 1)
+        self.assertEqual(response_json_update["counts_delta"], {"second": 0, "second row": 0, "third": 1, "third row": 1})
+        words_frequency = json.loads(response_json_update["words_frequency"])
+        self.assertEqual(words_frequency["row"]["count"], 2)
+        self.assertEqual(words_frequency["third"]["offsets_array"][0]["n_row"], 1)
+
+    def test_repeated_phrases(self):
+        text = "She said that it was late. Then she said that it was late again.\\nNothing else."
+        body = '{"text": "%s", "min_words": 3}' % text
+        response = self.client.post("/repeated-phrases", json=body)
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        self.assertEqual(response_json["n_total_rows"], 2)
+        self.assertEqual(len(response_json["repeated_phrases"]), 1)
+        repeated_phrase = response_json["repeated_phrases"][0]
+        self.assertEqual(repeated_phrase["phrase_stem"], "she said that it wa late")
+        self.assertEqual(repeated_phrase["count"], 2)
+        self.assertEqual([offsets["offsets"] for offsets in repeated_phrase["offsets_array"]], [[0, 25], [32, 57]])
+
+    def test_words_frequency_approximate(self):
+        body = '{"text": "test tests, tested. Another test, again", "approximate": true, "top_k": 2}'
+        response = self.client.post("/words-frequency", json=body)
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        self.assertFalse(response_json["cache_hit"])
+        self.assertEqual(response_json["heavy_hitters"]["capacity"], 20000)
+        words_frequency = json.loads(response_json["words_frequency"])
+        self.assertEqual(list(words_frequency), ["test", ","])
+        self.assertEqual(words_frequency["test"]["count"], 4)
+
+    def test_echoes(self):
+        body = json.dumps({"text": "The light was bright.\nThe lights went out, far away.", "window": 5, "token_filters": ["stopwords"]})
+        response = self.client.post("/echoes", json=body)
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        self.assertEqual(response_json["n_total_rows"], 2)
+        self.assertEqual(len(response_json["echoes"]), 1)
+        echo = response_json["echoes"][0]
+        self.assertEqual(echo["stem"], "light")
+        self.assertEqual(echo["span"], 4)
+        self.assertEqual([(offsets["word"], offsets["n_row"]) for offsets in echo["offsets_array"]], [("light", 0), ("lights", 1)])
+
+    def test_words_frequency_histograms(self):
+        body = json.dumps({"text": "test tests\nnothing\ntested", "histogram_bins": 3, "histogram_by": "rows", "offsets_limit": 0})
+        response = self.client.post("/words-frequency", json=body)
+        self.assertEqual(response.status_code, 200)
+        response_json = response.json()
+        self.assertEqual(response_json["histograms"]["test"], [2, 0, 1])
+        self.assertEqual(response_json["histograms"]["noth"], [0, 1, 0])
+        words_frequency = json.loads(response_json["words_frequency"])
+        self.assertEqual(words_frequency["test"]["offsets_array"], [])
+        self.assertEqual(words_frequency["test"]["count"], 3)
+        body = json.dumps({"text": "test tests\nnothing\ntested", "histogram_bins": 3, "histogram_by": "rows", "format": "ndjson"})
+        response = self.client.post("/words-frequency", json=body)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual({line["stem"]: line["histogram"] for line in lines[1:-1]}["test"], [2, 0, 1])
+
+    def test_words_frequency_collocations(self):
+        body = json.dumps({"text": "uncle vernon said, uncle vernon said.", "collocations": "pmi", "collocations_min_count": 2, "top_k": 1})
+        response = self.client.post("/words-frequency", json=body)
+        self.assertEqual(response.status_code, 200)
+        collocations = response.json()["collocations"]
+        self.assertEqual([collocation["stem"] for collocation in collocations], ["uncl vernon", "vernon said"])
+        self.assertEqual(collocations[0]["count"], 2)
+        self.assertEqual(len(json.loads(response.json()["words_frequency"])), 1)
+        response = self.client.post("/words-frequency", json=json.dumps({**json.loads(body), "approximate": True}))
+        self.assertEqual(response.status_code, 422)
+
+    def test_index_chapters(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with patch("my_ghost_writer.inverted_index.INVERTED_INDEX_FOLDER", tmp_dir):
+                body = json.dumps({"chapter_id": "ch1", "text": "The owl flew.\nThe owl hooted."})
+                response = self.client.post("/index/book_test/chapter", json=body)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["status"], "added")
+                self.assertEqual(response.json()["n_tokens"], 8)
+                response = self.client.post("/index/book_test/search", json=json.dumps({"phrase": "the owls"}))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["chapters"]["ch1"]["count"], 2)
+                response = self.client.post("/index/book_test/frequencies", json=json.dumps({"stems": ["hoot"]}))
+                self.assertEqual(response.json()["frequencies"], {"hoot": {"count": 1, "chapters": {"ch1": 1}}})
+                response = self.client.delete("/index/book_test/chapter/ch1")
+                self.assertEqual(response.status_code, 200)
+                response = self.client.delete("/index/book_test/chapter/ch1")
+                self.assertEqual(response.status_code, 404)
+
+    @patch("my_ghost_writer.app.count_text_ngrams_lemmas_cached")
+    def test_words_frequency_lemma(self, count_lemmas_mock):
+        from my_ghost_writer.text_parsers import count_text_ngrams
+        ngrams_count = count_text_ngrams("She went home", n=1)
+        ngrams_count["stems_list"] = ["she", "go", "home"]
+        count_lemmas_mock.return_value = ngrams_count, "hash", False
+        response = self.client.post("/words-frequency", json=json.dumps({"text": "She went home", "grouping": "lemma"}))
+        self.assertEqual(response.status_code, 200)
+        words_frequency = json.loads(response.json()["words_frequency"])
+        self.assertEqual(words_frequency["go"]["word_prefix"], "went")
+        count_lemmas_mock.assert_called_once()
+        response = self.client.post("/words-frequency", json=json.dumps({"text": "She went home", "grouping": "lemma", "approximate": True}))
+        self.assertEqual(response.status_code, 422)
+        # the next offsets of a lemma are paged by content hash
+        from my_ghost_writer.result_cache import words_frequency_cache
+        words_frequency_cache.set("lemma-hash", ngrams_count)
+        response = self.client.post("/words-frequency-offsets", json=json.dumps({"content_hash": "lemma-hash", "stem": "go"}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["offsets_array"][0]["word"], "went")
+
+    def test_words_frequency_overuse(self):
+        from my_ghost_writer.reference_frequencies import write_reference_frequencies
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_reference_frequencies({"the": 50, "cat": 10, "whisper": 1}, f"{tmp_dir}/fiction.bin")
+            with patch("my_ghost_writer.reference_frequencies.REFERENCE_FREQUENCIES_FOLDER", tmp_dir), \
+                    patch("my_ghost_writer.reference_frequencies.reference_frequencies", {}):
+                body = {"text": "The cat whispered, whispering. The cat sat", "overuse_reference": "fiction", "min_count": 2}
+                response = self.client.post("/words-frequency", json=json.dumps(body))
+                self.assertEqual(response.status_code, 200)
+                overuse = response.json()["overuse"]
+                self.assertEqual(list(overuse), ["whisper", "cat", "the"])
+                self.assertEqual(overuse["whisper"]["reference_count"], 1)
+                response = self.client.post("/words-frequency", json=json.dumps({**body, "overuse_reference": "missing"}))
+                self.assertEqual(response.status_code, 404)
+                response = self.client.post("/words-frequency", json=json.dumps({**body, "grouping": "lemma"}))
+                self.assertEqual(response.status_code, 422)
+                response = self.client.post("/words-frequency", json=json.dumps({**body, "approximate": True}))
+                self.assertEqual(response.status_code, 422)
+
+    def test_words_frequency_delta(self):
+        body = {"text": "The dark night, the dark room.", "token_filters": ["punctuation"]}
+        response = self.client.post("/words-frequency", json=json.dumps(body))
+        self.assertEqual(response.status_code, 200)
+        old_content_hash = response.json()["content_hash"]
+        body = {
+            "old_content_hash": old_content_hash, "new_text": "The night, the bright room.", "n_words_ngram": [1],
+            "token_filters": ["punctuation"]
+        }
+        response = self.client.post("/words-frequency-delta", json=json.dumps(body))
+        self.assertEqual(response.status_code, 200)
+        content = response.json()
+        self.assertEqual([(item["stem"], item["delta"]) for item in content["delta"]], [("dark", -2), ("bright", 1)])
+        self.assertEqual(content["cache_hit"], {"old": True, "new": False})
+        response = self.client.post("/words-frequency-delta", json=json.dumps({**body, "old_content_hash": "missing"}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post("/words-frequency-delta", json=json.dumps({**body, "old_text": "The night"}))
+        self.assertEqual(response.status_code, 422)
+
+    def test_words_frequency_search(self):
+        body = {"text": "The dark night, the dark room. A dart.", "token_filters": ["punctuation"]}
+        response = self.client.post("/words-frequency", json=json.dumps(body))
+        content_hash = response.json()["content_hash"]
+        body = {"content_hash": content_hash, "query": "dar", "n_words_ngram": [1], "limit": 1}
+        response = self.client.post("/words-frequency-search", json=json.dumps(body))
+        self.assertEqual(response.status_code, 200)
+        content = response.json()
+        self.assertEqual(list(content["words_frequency"]), ["dark"])
+        self.assertEqual((content["n_matches"], content["next_offset"], content["cache_hit"]), (2, 1, True))
+        body = {"text": "The dark night, the dark room. A dart.", "token_filters": ["punctuation"], "query": "^da", "match": "regex",
+                "sort_by": "alphabetical", "n_words_ngram": [1]}
+        response = self.client.post("/words-frequency-search", json=json.dumps(body))
+        self.assertEqual(response.json()["content_hash"], content_hash)
+        self.assertEqual(list(response.json()["words_frequency"]), ["dark", "dart"])
+        self.assertGreaterEqual(self.client.get("/health-cache").json()["words_frequency_search"]["hits"], 1)
+        response = self.client.post("/words-frequency-search", json=json.dumps({**body, "query": "(da"}))
+        self.assertEqual(response.status_code, 422)
+        response = self.client.post("/words-frequency-search", json=json.dumps({"content_hash": "missing"}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post("/words-frequency-search", json={**body, "content_hash": content_hash})
+        self.assertEqual(response.status_code, 422)
+
+    def test_thesaurus_custom_matches(self):
+        from my_ghost_writer.text_parsers2 import custom_synonym_handler
+        custom_synonym_handler.add_entry("gloom", [{"type": "synonym", "words": ["dark", "dusk"]}])
+        try:
+            response = self.client.post("/thesaurus-custom-matches", json=json.dumps({"text": "A dark room at dusk."}))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([(match["start"], match["end"], match["relations"]) for match in response.json()["matches"]], [
+                (2, 6, [{"entry": "gloom", "relation_type": "synonym"}]), (15, 19, [{"entry": "gloom", "relation_type": "synonym"}])
+            ])
+        finally:
+            custom_synonym_handler.delete_entry("gloom")
+        response = self.client.post("/thesaurus-custom-matches", json=json.dumps({"text": "A dark room at dusk."}))
+        self.assertEqual(response.json()["matches"], [])
+        response = self.client.post("/thesaurus-custom-matches", json=json.dumps({"document_id": "missing"}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_documents(self):
+        from array import array
+        text = "The cat sat. The cat ran."
+        response = self.client.post("/documents", json=json.dumps({"text": text}))
+        self.assertEqual(response.status_code, 200)
+        document_id = response.json()["document_id"]
+        response = self.client.post("/words-frequency", json=json.dumps({"document_id": document_id, "top_k": 1}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(json.loads(response.json()["words_frequency"])), ["the"])
+        boundaries = array("l", [0, 13]), array("l", [12, 25])
+        with patch("my_ghost_writer.document_registry.build_sentences_boundaries", return_value=boundaries):
+            body = {"document_id": document_id, "words": [{"word": "ran", "start": 21, "end": 24}]}
+            response = self.client.post("/split-text-batch", json=json.dumps(body))
+            self.assertEqual(response.json()["sentences"], [{"sentence": "The cat ran.", "start_in_sentence": 8, "end_in_sentence": 11}])
+            response = self.client.post("/split-text", json={"document_id": document_id, "word": "sat", "start": 8, "end": 11})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["sentence"], "The cat sat.")
+        self.assertGreaterEqual(self.client.get("/health-cache").json()["documents"]["artifacts_misses"], 2)
+        response = self.client.delete(f"/documents/{document_id}")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post("/words-frequency", json=json.dumps({"document_id": document_id}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post("/split-text", json={"document_id": document_id, "word": "sat", "start": 8, "end": 11})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.delete(f"/documents/{document_id}")
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post("/split-text", json={"text": text, "document_id": document_id, "word": "sat", "start": 8, "end": 11})
+        self.assertEqual(response.status_code, 422)
+
+    def test_near_duplicate_sentences(self):
+        text = "The old house stood on the hill. It was raining. The old houses stood on the hill!"
+        response = self.client.post("/near-duplicate-sentences", json=json.dumps({"text": text, "threshold": 0.5, "min_words": 3}))
+        self.assertEqual(response.status_code, 200)
+        near_duplicates = response.json()["near_duplicates"]
+        self.assertEqual(len(near_duplicates), 1)
+        self.assertEqual([sentence["offsets"] for sentence in near_duplicates[0]["sentences"]], [[0, 31], [49, 81]])
 
     def test_words_frequency_fail_request(self):
         body = '{}'
         response = self.client.post("/words-frequency", json=body)
         self.assertEqual(response.status_code, 500)
 
-    @patch("my_ghost_writer.app.text_parsers.text_stemming")
-    def test_words_frequency_fail_stemming_error(self, mock_stemming):
-        mock_stemming.side_effect = ValueError("stemming error")
+    @patch("my_ghost_writer.app.text_parsers.count_text_ngrams_cached")
+    def test_words_frequency_fail_stemming_error(self, mock_count):
+        mock_count.side_effect = ValueError("stemming error")
         body = '{"text": "test test"}'
         response = self.client.post("/words-frequency", json=body)
         self.assertEqual(response.status_code, 500)
@@ -128,6 +440,15 @@ class TestAppEndpoints(unittest.TestCase):
         self.assertEqual(response.status_code, 500)
         self.assertEqual(response.json(), {"detail": responses[500]})
 
+    @patch("my_ghost_writer.app.text_parsers.get_sentences_by_words")
+    def test_split_text_batch(self, mock_get_sentences):
+        mock_get_sentences.return_value = [{"sentence": "The quick brown fox.", "start_in_sentence": 4, "end_in_sentence": 9}]
+        body = {"text": "The quick brown fox.", "words": [{"word": "quick", "start": 4, "end": 9}]}
+        response = self.client.post("/split-text-batch", json=json.dumps(body))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["sentences"], mock_get_sentences.return_value)
+        mock_get_sentences.assert_called_once_with("The quick brown fox.", [(4, 9, "quick")])
+
     @patch("my_ghost_writer.app.pymongo_operations_rw.get_document_by_word")
     def test_thesaurus_wordsapi_local_success(self, mock_get_doc):
         mock_get_doc.return_value = {"word": "test"}
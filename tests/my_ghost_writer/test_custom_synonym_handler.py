@@ -72,5 +72,29 @@ class TestCustomSynonymHandler(unittest.TestCase):
         self.assertEqual(test_custom_synonym_handler.inverted_index, expected_inverted_index)
 
 
+    def test_custom_synonym_handler_find_matches(self):
+        test_custom_synonym_handler = CustomSynonymHandler()
+        self.assertEqual(test_custom_synonym_handler.find_matches("Happy New York"), [])
+        test_custom_synonym_handler.add_entry("happy", [
+            {'definition': 'definition of happy', 'type': 'synonym', 'words': ['joy', 'New York']},
+            {'definition': 'definition of sad', 'type': 'antonym', 'words': ['sad']}
+        ])
+        test_custom_synonym_handler.add_entry("york", [{'definition': None, 'type': 'synonym', 'words': ['city']}])
+        matches = test_custom_synonym_handler.find_matches("Happy in New York, not sad. Joyful city!")
+        self.assertEqual(matches, [
+            {"start": 0, "end": 5, "text": "Happy", "relations": [{"entry": "happy", "relation_type": None}]},
+            {"start": 9, "end": 17, "text": "New York", "relations": [{"entry": "happy", "relation_type": "synonym"}]},
+            {"start": 13, "end": 17, "text": "York", "relations": [{"entry": "york", "relation_type": None}]},
+            {"start": 23, "end": 26, "text": "sad", "relations": [{"entry": "happy", "relation_type": "antonym"}]},
+            {"start": 35, "end": 39, "text": "city", "relations": [{"entry": "york", "relation_type": "synonym"}]}
+        ])
+        # the automaton is rebuilt only when the lexicon changes
+        automaton = test_custom_synonym_handler._get_automaton()[0]
+        self.assertIs(test_custom_synonym_handler._get_automaton()[0], automaton)
+        test_custom_synonym_handler.delete_entry("york")
+        self.assertIsNot(test_custom_synonym_handler._get_automaton()[0], automaton)
+        self.assertEqual([match["text"] for match in test_custom_synonym_handler.find_matches("Happy in New York")], ["Happy", "New York"])
+
+
 if __name__ == '__main__':
     unittest.main()
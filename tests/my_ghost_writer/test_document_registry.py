@@ -0,0 +1,69 @@
+import hashlib
+import unittest
+from array import array
+from unittest.mock import patch
+
+
+class TestDocumentRegistry(unittest.TestCase):
+    def test_add_and_get_text(self):
+        from my_ghost_writer.document_registry import DocumentRegistry
+        registry = DocumentRegistry(max_bytes=100)
+        result = registry.add("first text")
+        self.assertEqual(result, {"document_id": hashlib.sha256(b"first text").hexdigest(), "n_bytes": 10, "created": True})
+        self.assertFalse(registry.add("first text")["created"])
+        self.assertEqual(registry.get_text(result["document_id"]), "first text")
+        with self.assertRaises(KeyError):
+            registry.get_text("missing")
+        with self.assertRaises(ValueError):
+            registry.add("x" * 101)
+        stats = registry.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["n_items"], stats["n_bytes"]), (1, 1, 1, 10))
+
+    def test_artifacts_and_eviction(self):
+        from my_ghost_writer.document_registry import DocumentRegistry
+        registry = DocumentRegistry(max_bytes=100)
+        first_id = registry.add("a" * 40)["document_id"]
+        second_id = registry.add("b" * 40)["document_id"]
+        builds = []
+
+        def build(text: str):
+            builds.append(text)
+            return text.upper(), 15
+
+        self.assertEqual(registry.get_artifact(first_id, "upper", build), "A" * 40)
+        self.assertEqual(registry.get_artifact(first_id, "upper", build), "A" * 40)
+        self.assertEqual(builds, ["a" * 40])
+        self.assertEqual(registry.get_stats()["n_bytes"], 95)
+        # the second document is now the least recently used one
+        third_id = registry.add("c" * 40)["document_id"]
+        self.assertEqual(list(registry.documents), [first_id, third_id])
+        self.assertEqual(registry.get_stats()["evictions"], 1)
+        # the first document is evicted together with its artifact
+        registry.get_text(third_id)
+        registry.add("d" * 40)
+        self.assertNotIn(first_id, registry.documents)
+        self.assertEqual(registry.get_stats()["n_bytes"], 80)
+        with self.assertRaises(KeyError):
+            registry.get_artifact(second_id, "upper", build)
+        registry.remove(third_id)
+        self.assertEqual(registry.get_stats()["n_bytes"], 40)
+        with self.assertRaises(KeyError):
+            registry.remove(third_id)
+
+    def test_get_document_textrows_and_sentences_boundaries(self):
+        from my_ghost_writer.document_registry import (document_registry, get_document_sentences_boundaries,
+            get_document_textrows)
+        document_id = document_registry.add("First row. Second sentence\nsecond row")["document_id"]
+        textrows = get_document_textrows(document_id)
+        self.assertEqual(textrows, [{"idxRow": 0, "text": "First row. Second sentence"}, {"idxRow": 1, "text": "second row"}])
+        self.assertIs(get_document_textrows(document_id), textrows)
+        boundaries = array("l", [0, 11]), array("l", [10, 37])
+        with patch("my_ghost_writer.document_registry.build_sentences_boundaries", return_value=boundaries) as build_mock:
+            self.assertEqual(get_document_sentences_boundaries(document_id), boundaries)
+            self.assertEqual(get_document_sentences_boundaries(document_id), boundaries)
+        build_mock.assert_called_once_with("First row. Second sentence\nsecond row")
+        document_registry.remove(document_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+
+from tests import EVENTS_FOLDER
+
+
+class TestEchoes(unittest.TestCase):
+    def test_get_words_positions(self):
+        from my_ghost_writer.echoes import get_words_positions
+        rows = [{"idxRow": 0, "text": "The cats, the dogs."}, {"idxRow": 1, "text": "A cat"}]
+        stems_list, positions = get_words_positions(rows)
+        self.assertEqual(stems_list, ["the", "cat", "dog", "a"])
+        self.assertEqual(positions["stem_ids"].tolist(), [0, 1, 0, 2, 3, 1])
+        self.assertEqual(positions["tokens"].tolist(), [1, 2, 3, 4, 5, 6])
+        self.assertEqual(positions["chars_start"].tolist(), [0, 4, 10, 14, 20, 22])
+        self.assertEqual(positions["chars_end"].tolist(), [3, 8, 13, 18, 21, 25])
+        self.assertEqual(positions["rows"].tolist(), [0, 0, 0, 0, 1, 1])
+        self.assertEqual(positions["starts"].tolist(), [0, 4, 10, 14, 0, 2])
+        stems_list, positions = get_words_positions(rows, token_filters=["stopwords"])
+        self.assertEqual(stems_list, ["cat", "dog"])
+        self.assertEqual(positions["tokens"].tolist(), [2, 4, 6])
+
+    def test_find_echo_clusters(self):
+        from my_ghost_writer.echoes import find_echo_clusters
+        stem_ids = np.array([0, 1, 0, 0, 1, 2, 0])
+        positions = np.array([1, 2, 3, 4, 10, 11, 20])
+        clusters = find_echo_clusters(stem_ids, positions, positions, window=2)
+        self.assertEqual([cluster.tolist() for cluster in clusters], [[0, 2, 3]])
+        clusters = find_echo_clusters(stem_ids, positions, positions, window=8)
+        self.assertEqual([cluster.tolist() for cluster in clusters], [[0, 2, 3], [1, 4]])
+        clusters = find_echo_clusters(stem_ids, positions, positions, window=2, min_count=4)
+        self.assertEqual(clusters, [])
+        self.assertEqual(find_echo_clusters(stem_ids[:1], positions[:1], positions[:1], window=2), [])
+
+    def test_get_echoes(self):
+        from my_ghost_writer.echoes import get_echoes
+        text = "She looked at him, then she looked away.\nLater she looked again."
+        n_total_rows, echoes = get_echoes(text, window=6, token_filters=["stopwords"])
+        self.assertEqual(n_total_rows, 2)
+        self.assertEqual([(echo["stem"], echo["count"], echo["span"]) for echo in echoes], [("look", 3, 9)])
+        self.assertEqual(echoes[0]["offsets_array"][2], {
+            "word": "looked", "offsets": [10, 16], "n_row": 1, "n_row_child": None, "n_row_parent": None
+        })
+        _, echoes = get_echoes(text, window=5, unit="chars", token_filters=["stopwords"])
+        self.assertEqual(echoes, [])
+        _, echoes = get_echoes(text, window=20, unit="chars")
+        self.assertEqual([(echo["stem"], echo["count"]) for echo in echoes], [("look", 3), ("she", 2)])
+        _, echoes = get_echoes(text, window=20, unit="chars", top_k=1)
+        self.assertEqual(len(echoes), 1)
+
+    def test_get_echoes_long_text(self):
+        from my_ghost_writer.echoes import get_echoes
+        with open(EVENTS_FOLDER / "very_long_text.txt", "r") as src:
+            text = src.read()
+        _, echoes = get_echoes(text, window=10, token_filters=["stopwords"])
+        self.assertGreater(len(echoes), 0)
+        counts = [echo["count"] for echo in echoes]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        for echo in echoes:
+            self.assertGreaterEqual(echo["count"], 2)
+            self.assertLessEqual(echo["span"], 10 * (echo["count"] - 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
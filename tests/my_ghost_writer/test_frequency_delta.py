@@ -0,0 +1,33 @@
+import unittest
+
+
+class TestFrequencyDelta(unittest.TestCase):
+    def test_get_ngrams_count_delta(self):
+        from my_ghost_writer.frequency_delta import get_ngrams_count_delta
+        from my_ghost_writer.text_parsers import count_text_ngrams
+        old_ngrams_count = count_text_ngrams("The dark night. The dark room was dark.", n=2, token_filters=["punctuation"])
+        new_ngrams_count = count_text_ngrams("A night. The Rooms were bright.", n=2, token_filters=["punctuation"])
+        result = get_ngrams_count_delta(old_ngrams_count, new_ngrams_count, n_words_ngram=[1])
+        self.assertEqual(result["delta"], [
+            {"stem": "dark", "word_prefix": "dark", "n_words_ngram": 1, "old_count": 3, "new_count": 0, "delta": -3, "status": "removed"},
+            {"stem": "a", "word_prefix": "A", "n_words_ngram": 1, "old_count": 0, "new_count": 1, "delta": 1, "status": "added"},
+            {"stem": "bright", "word_prefix": "bright", "n_words_ngram": 1, "old_count": 0, "new_count": 1, "delta": 1, "status": "added"},
+            {"stem": "the", "word_prefix": "The", "n_words_ngram": 1, "old_count": 2, "new_count": 1, "delta": -1, "status": "decreased"},
+            {"stem": "wa", "word_prefix": "was", "n_words_ngram": 1, "old_count": 1, "new_count": 0, "delta": -1, "status": "removed"},
+            {"stem": "were", "word_prefix": "were", "n_words_ngram": 1, "old_count": 0, "new_count": 1, "delta": 1, "status": "added"}
+        ])
+        self.assertEqual((result["n_added"], result["n_removed"], result["n_increased"], result["n_decreased"]), (3, 2, 0, 1))
+        # "room" and "night" have the same count
+        self.assertNotIn("room", [item["stem"] for item in result["delta"]])
+
+        result = get_ngrams_count_delta(old_ngrams_count, new_ngrams_count, min_delta=2, n_words_ngram=[2])
+        self.assertEqual([(item["stem"], item["delta"]) for item in result["delta"]], [("the dark", -2)])
+        result = get_ngrams_count_delta(new_ngrams_count, old_ngrams_count, top_k=2)
+        self.assertEqual([(item["stem"], item["delta"], item["status"]) for item in result["delta"]], [
+            ("dark", 3, "added"), ("the dark", 2, "added")
+        ])
+        self.assertEqual(get_ngrams_count_delta(old_ngrams_count, old_ngrams_count)["delta"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from tests import EVENTS_FOLDER
+
+
+class TestHeavyHitters(unittest.TestCase):
+    def test_count_min_sketch(self):
+        from my_ghost_writer.heavy_hitters import CountMinSketch
+        sketch = CountMinSketch(width_bits=4, depth=3)
+        keys = [("a",)] * 10 + [("b",)] * 5 + [(str(i),) for i in range(20)]
+        sketch.add(keys)
+        self.assertEqual(sketch.total, 35)
+        estimates = sketch.estimate([("a",), ("b",), ("missing",)]).tolist()
+        error, _ = sketch.get_error_bound()
+        # never underestimate
+        self.assertGreaterEqual(estimates[0], 10)
+        self.assertGreaterEqual(estimates[1], 5)
+        self.assertLessEqual(estimates[0], 10 + error)
+        self.assertEqual(sketch.estimate([]).tolist(), [])
+
+    def test_space_saving(self):
+        from my_ghost_writer.heavy_hitters import SpaceSaving
+        space_saving = SpaceSaving(capacity=3)
+        for key in ["a", "b", "a", "c", "a", "d", "a", "e", "b", "a"]:
+            space_saving.add(key)
+        self.assertEqual(len(space_saving.counts), 3)
+        self.assertEqual(space_saving.counts["a"], 5)
+        self.assertEqual(space_saving.errors["a"], 0)
+        for key, count in space_saving.counts.items():
+            self.assertLessEqual(count - space_saving.errors[key], {"a": 5, "b": 2}.get(key, 1))
+        self.assertEqual(space_saving.total, 10)
+
+    def test_iter_rows_ngrams_stems(self):
+        from my_ghost_writer.heavy_hitters import iter_rows_ngrams_stems
+        rows_ngrams = list(iter_rows_ngrams_stems([{"idxRow": 0, "text": "The cats, running"}], n=2))
+        self.assertEqual(rows_ngrams, [[
+            (("the",), 0, 3), (("cat",), 4, 8), ((",",), 8, 9), (("run",), 10, 17),
+            (("the", "cat"), 0, 8), (("cat", ","), 4, 9), ((",", "run"), 8, 17)
+        ]])
+        rows_ngrams = list(iter_rows_ngrams_stems([{"idxRow": 0, "text": "The cats, running"}], n=2, token_filters=["punctuation", "stopwords"]))
+        self.assertEqual(rows_ngrams, [[
+            (("cat",), 4, 8), (("run",), 10, 17), (("the", "cat"), 0, 8), (("cat", "run"), 4, 17)
+        ]])
+
+    def test_count_text_ngrams_heavy_hitters(self):
+        from my_ghost_writer.heavy_hitters import count_text_ngrams_heavy_hitters
+        from my_ghost_writer.text_parsers import count_text_ngrams, filter_ngrams_count, get_words_frequency_from_count
+        with open(EVENTS_FOLDER / "llm_generated_story_3.txt", "r") as src:
+            text = src.read()
+        ngrams_count, heavy_hitters_info = count_text_ngrams_heavy_hitters(text, n=3, top_k=20)
+        words_stems_dict = get_words_frequency_from_count(ngrams_count)
+        expected_words_stems_dict = get_words_frequency_from_count(filter_ngrams_count(count_text_ngrams(text, n=3), top_k=20))
+        self.assertEqual(len(words_stems_dict), 20)
+        counts = [entry["count"] for entry in words_stems_dict.values()]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        self.assertEqual(counts, [entry["count"] for entry in expected_words_stems_dict.values()])
+        for ngram_stem, entry in words_stems_dict.items():
+            if ngram_stem in expected_words_stems_dict:
+                self.assertEqual(entry, expected_words_stems_dict[ngram_stem])
+        self.assertEqual(heavy_hitters_info["capacity"], 20000)
+        self.assertGreater(heavy_hitters_info["n_ngrams_total"], 0)
+        self.assertGreater(heavy_hitters_info["count_min_confidence"], 0.98)
+
+
+if __name__ == "__main__":
+    unittest.main()
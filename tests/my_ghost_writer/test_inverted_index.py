@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+
+
+class TestInvertedIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_build_chapter_index(self):
+        from my_ghost_writer.inverted_index import build_chapter_index
+        chapter_index = build_chapter_index("ch1", [{"idxRow": 0, "text": "Cats, cats"}, {"idxRow": 1, "text": "a cat"}])
+        self.assertEqual({stem: positions.tolist() for stem, positions in chapter_index["postings"].items()}, {
+            "cat": [0, 2, 4], ",": [1], "a": [3]
+        })
+        self.assertEqual(chapter_index["rows"].tolist(), [0, 0, 0, 1, 1])
+        self.assertEqual(chapter_index["starts"].tolist(), [0, 4, 6, 0, 2])
+        self.assertEqual(chapter_index["ends"].tolist(), [4, 5, 10, 1, 5])
+
+    def test_set_chapter_and_search(self):
+        from my_ghost_writer.inverted_index import InvertedIndex
+        inverted_index = InvertedIndex(self.tmp_dir.name)
+        self.assertEqual(inverted_index.set_chapter("ch1", "Uncle Vernon said no.\nUncle\nVernon")["status"], "added")
+        self.assertEqual(inverted_index.set_chapter("ch2", "Aunt Petunia and uncle Vernon.")["status"], "added")
+        self.assertEqual(inverted_index.set_chapter("ch2", "Aunt Petunia and uncle Vernon.")["status"], "unchanged")
+        search_result = inverted_index.search("uncles vernon")
+        self.assertEqual(search_result["stem"], "uncl vernon")
+        self.assertEqual(search_result["count"], 2)
+        # the phrase can't cross the rows
+        self.assertEqual(search_result["chapters"]["ch1"], {"count": 1, "offsets_array": [
+            {"word": "Uncle Vernon", "offsets": [0, 12], "n_row": 0, "n_row_child": None, "n_row_parent": None}
+        ]})
+        self.assertEqual(search_result["chapters"]["ch2"]["offsets_array"][0]["offsets"], [17, 29])
+        self.assertEqual(inverted_index.search("Petunia said")["count"], 0)
+        self.assertEqual(inverted_index.search("")["count"], 0)
+        self.assertEqual(inverted_index.search("uncle", limit=1)["chapters"]["ch1"]["count"], 2)
+        self.assertEqual(len(inverted_index.search("uncle", limit=1)["chapters"]["ch1"]["offsets_array"]), 1)
+
+        # replace and remove chapters
+        self.assertEqual(inverted_index.set_chapter("ch2", "Aunt Petunia said nothing.")["status"], "replaced")
+        self.assertEqual(list(inverted_index.search("vernon")["chapters"]), ["ch1"])
+        self.assertEqual(inverted_index.search("petunia said")["count"], 1)
+        inverted_index.remove_chapter("ch1")
+        self.assertEqual(inverted_index.search("vernon")["count"], 0)
+        with self.assertRaises(KeyError):
+            inverted_index.remove_chapter("ch1")
+
+    def test_get_inverted_index_eviction(self):
+        from unittest.mock import patch
+        from my_ghost_writer import inverted_index
+        from my_ghost_writer.result_cache import ResultCache
+        with patch.object(inverted_index, "INVERTED_INDEX_FOLDER", self.tmp_dir.name), \
+                patch.object(inverted_index, "inverted_indexes", ResultCache(1)):
+            project_index = inverted_index.get_inverted_index("project1")
+            project_index.set_chapter("ch1", "The owl flew.")
+            self.assertIs(inverted_index.get_inverted_index("project1"), project_index)
+            inverted_index.get_inverted_index("project2")
+            self.assertEqual(inverted_index.inverted_indexes.get_stats()["evictions"], 1)
+            # the evicted project is loaded again from its folder
+            reloaded_index = inverted_index.get_inverted_index("project1")
+            self.assertIsNot(reloaded_index, project_index)
+            self.assertEqual(reloaded_index.search("owl")["count"], 1)
+
+    def test_persistence_and_frequencies(self):
+        from my_ghost_writer.inverted_index import InvertedIndex
+        inverted_index = InvertedIndex(self.tmp_dir.name)
+        inverted_index.set_chapter("ch1", "The owl flew. The owls hooted.")
+        inverted_index.set_chapter("ch2", [{"idxRow": 3, "text": "An owl"}])
+        inverted_index.set_chapter("ch3", "Gone")
+        inverted_index.remove_chapter("ch3")
+        reloaded_index = InvertedIndex(self.tmp_dir.name)
+        self.assertEqual(sorted(reloaded_index.get_chapters_ids()), ["ch1", "ch2"])
+        self.assertEqual(reloaded_index.get_frequencies(stems=["owl", "missing"]), {
+            "owl": {"count": 3, "chapters": {"ch1": 2, "ch2": 1}},
+            "missing": {"count": 0, "chapters": {}}
+        })
+        self.assertEqual(list(reloaded_index.get_frequencies(top_k=3)), ["owl", ".", "the"])
+        self.assertEqual(reloaded_index.search("an owl")["chapters"]["ch2"]["offsets_array"][0]["n_row"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+
+
+class TestNearDuplicates(unittest.TestCase):
+    def test_get_sentences_shingles(self):
+        from my_ghost_writer.near_duplicates import get_sentences_shingles
+        rows = [{"idxRow": 0, "text": "The cat sat on the mat. Short one! The cats sat on a mat"}, {"idxRow": 1, "text": "Tiny"}]
+        sentences_spans, shingles_list = get_sentences_shingles(rows, shingle_size=2, min_words=3)
+        self.assertEqual(sentences_spans, [(0, 0, 22), (0, 35, 56)])
+        self.assertEqual(shingles_list[0], {hash(shingle) for shingle in [("the", "cat"), ("cat", "sat"), ("sat", "on"), ("on", "the"), ("the", "mat")]})
+        self.assertEqual(len(shingles_list[0] & shingles_list[1]), 3)
+        _, shingles_list = get_sentences_shingles(rows, shingle_size=5, min_words=1)
+        self.assertEqual(shingles_list[1], {hash(("short", "one"))})
+
+    def test_get_minhash_signatures(self):
+        from my_ghost_writer.near_duplicates import get_minhash_signatures
+        shingles_list = [set(range(100)), set(range(100)), set(range(50, 150)), {1000}]
+        signatures = get_minhash_signatures(shingles_list, num_perm=256, chunk_size=150)
+        self.assertEqual(signatures.shape, (4, 256))
+        self.assertTrue(np.array_equal(signatures[0], signatures[1]))
+        # the fraction of equal minhashes estimates the Jaccard similarity (1/3)
+        self.assertAlmostEqual(float(np.mean(signatures[0] == signatures[2])), 1 / 3, delta=0.1)
+        self.assertEqual(float(np.mean(signatures[0] == signatures[3])), 0.0)
+
+    def test_get_lsh_candidates(self):
+        from my_ghost_writer.near_duplicates import get_lsh_candidates
+        signatures = np.array([[1, 2, 3, 4], [1, 2, 9, 9], [7, 7, 3, 4], [5, 5, 5, 5]], dtype=np.uint64)
+        self.assertEqual(get_lsh_candidates(signatures, n_bands=2), {(0, 1), (0, 2)})
+        self.assertEqual(get_lsh_candidates(signatures, n_bands=1), set())
+        with self.assertRaises(ValueError):
+            get_lsh_candidates(signatures, n_bands=3)
+
+    def test_get_lsh_candidates_max_bucket_pairs(self):
+        from my_ghost_writer.near_duplicates import get_lsh_candidates
+        # the same signature for 100 sentences, a single bucket of 4950 pairs
+        signatures = np.ones((100, 4), dtype=np.uint64)
+        self.assertEqual(len(get_lsh_candidates(signatures, n_bands=2, max_bucket_pairs=5000)), 4950)
+        self.assertEqual(len(get_lsh_candidates(signatures, n_bands=2)), 1000)
+        candidates = get_lsh_candidates(signatures, n_bands=2, max_bucket_pairs=120)
+        self.assertEqual(len(candidates), 120)
+        # the consecutive pairs come first
+        self.assertTrue({(i, i + 1) for i in range(99)} <= candidates)
+
+    def test_get_near_duplicate_sentences(self):
+        from my_ghost_writer.near_duplicates import get_near_duplicate_sentences
+        text = ("She opened the door and looked outside. Nothing happened for a long while.\n"
+                "She opened the doors and looked outside again. The end came at last.")
+        n_total_rows, near_duplicates = get_near_duplicate_sentences(text, threshold=0.6)
+        self.assertEqual(n_total_rows, 2)
+        self.assertEqual(near_duplicates, [{"similarity": 0.8571, "sentences": [
+            {"sentence": "She opened the door and looked outside", "offsets": [0, 38], "n_row": 0, "n_row_child": None, "n_row_parent": None},
+            {"sentence": "She opened the doors and looked outside again", "offsets": [0, 45], "n_row": 1, "n_row_child": None, "n_row_parent": None}
+        ]}])
+        _, near_duplicates = get_near_duplicate_sentences(text, threshold=0.9)
+        self.assertEqual(near_duplicates, [])
+        self.assertEqual(get_near_duplicate_sentences("One short sentence.")[1], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
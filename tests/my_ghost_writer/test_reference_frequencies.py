@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+
+class TestReferenceFrequencies(unittest.TestCase):
+    def test_get_hashes_slots(self):
+        from my_ghost_writer.reference_frequencies import get_hashes_slots
+        table_hashes = np.zeros(8, dtype=np.uint64)
+        table_hashes[[3, 4, 7]] = [11, 3, 15]
+        # 11 and 3 collide within the slot 3, 15 and 23 within the slot 7 (wrapping around)
+        slots = get_hashes_slots(table_hashes, np.array([11, 3, 15, 23, 19], dtype=np.uint64))
+        self.assertEqual(slots.tolist(), [3, 4, 7, 0, 5])
+
+    def test_write_reference_frequencies(self):
+        from my_ghost_writer.reference_frequencies import ReferenceFrequencies, write_reference_frequencies
+        stems_counts = {f"stem{i}": i + 1 for i in range(1000)}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = write_reference_frequencies(stems_counts, Path(tmp_dir) / "ref.bin")
+            reference = ReferenceFrequencies(path)
+            self.assertEqual(reference.n_stems, 1000)
+            self.assertEqual(reference.total, sum(stems_counts.values()))
+            self.assertEqual(len(reference.table_hashes), 2048)
+            self.assertEqual(reference.get_counts(list(stems_counts)).tolist(), list(stems_counts.values()))
+            self.assertEqual(reference.get_counts(["missing", "stem999"]).tolist(), [0, 1000])
+            self.assertEqual(reference.get_counts([]).tolist(), [])
+            del reference
+
+    def test_reference_frequencies_invalid_file(self):
+        from my_ghost_writer.reference_frequencies import ReferenceFrequencies
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "invalid.bin"
+            path.write_bytes(b"\0" * 64)
+            with self.assertRaises(ValueError):
+                ReferenceFrequencies(path)
+
+    def test_build_reference_frequencies_and_overuse_scores(self):
+        from my_ghost_writer.reference_frequencies import build_reference_frequencies, get_overuse_scores, get_reference_frequencies
+        from my_ghost_writer.text_parsers import count_text_ngrams
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            corpus_path = Path(tmp_dir) / "corpus.txt"
+            corpus_path.write_text("The cat runs. The dogs run!\nA cat sleeps.\n", encoding="utf-8")
+            with patch("my_ghost_writer.reference_frequencies.REFERENCE_FREQUENCIES_FOLDER", tmp_dir), \
+                    patch("my_ghost_writer.reference_frequencies.reference_frequencies", {}):
+                build_reference_frequencies([corpus_path], Path(tmp_dir) / "corpus.bin")
+                reference = get_reference_frequencies("corpus")
+                self.assertIs(get_reference_frequencies("corpus"), reference)
+                self.assertEqual(reference.total, 9)
+                self.assertEqual(reference.get_counts(["the", "run", "cat", "."]).tolist(), [2, 2, 2, 0])
+                with self.assertRaises(FileNotFoundError):
+                    get_reference_frequencies("missing")
+                ngrams_count = count_text_ngrams("The cat whispered, whispering.", n=2)
+                overuse = get_overuse_scores(ngrams_count, reference)
+                del reference
+        self.assertEqual(list(overuse), ["whisper", "the", "cat"])
+        # the vocabulary has the 6 reference stems and "whisper": (2.5 / (4 + 0.5 * 7)) / (0.5 / (9 + 0.5 * 7))
+        self.assertEqual(overuse["whisper"], {"log_ratio": 3.0589, "reference_count": 0})
+        # (1.5 / (4 + 0.5 * 7)) / (2.5 / (9 + 0.5 * 7))
+        self.assertEqual(overuse["cat"], {"log_ratio": 0.0, "reference_count": 2})
+
+    def test_get_overuse_scores_smoothing(self):
+        from my_ghost_writer.reference_frequencies import get_overuse_scores, write_reference_frequencies, ReferenceFrequencies
+        from my_ghost_writer.text_parsers import count_text_ngrams
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            reference = ReferenceFrequencies(write_reference_frequencies({"cat": 30, "dog": 10}, Path(tmp_dir) / "ref.bin"))
+            # the same distribution as the reference: without smoothing all the log-ratios are 0
+            overuse = get_overuse_scores(count_text_ngrams("cat cat cat dog", n=1), reference, smoothing=0.0)
+            self.assertEqual(overuse, {"cat": {"log_ratio": 0.0, "reference_count": 30}, "dog": {"log_ratio": 0.0, "reference_count": 10}})
+            # with a missing stem the smoothed frequencies still sum to 1 over the vocabulary (cat, dog and owl)
+            overuse = get_overuse_scores(count_text_ngrams("cat owl", n=1), reference, smoothing=1.0)
+            # owl: ((1 + 1) / (2 + 3)) / ((0 + 1) / (40 + 3))
+            self.assertEqual(overuse["owl"], {"log_ratio": round(float(np.log2((2 / 5) / (1 / 43))), 4), "reference_count": 0})
+            # cat: ((1 + 1) / (2 + 3)) / ((30 + 1) / (40 + 3))
+            self.assertEqual(overuse["cat"]["log_ratio"], round(float(np.log2((2 / 5) / (31 / 43))), 4))
+            del reference
+
+
+if __name__ == "__main__":
+    unittest.main()
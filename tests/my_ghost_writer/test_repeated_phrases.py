@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from tests import EVENTS_FOLDER
+
+
+class TestRepeatedPhrases(unittest.TestCase):
+    def test_build_suffix_array_and_lcp(self):
+        from my_ghost_writer.repeated_phrases import build_lcp_array, build_suffix_array
+        # "banana" as integers
+        sequence = [1, 0, 2, 0, 2, 0]
+        suffix_array = build_suffix_array(np.array(sequence)).tolist()
+        self.assertEqual(suffix_array, [5, 3, 1, 0, 4, 2])
+        self.assertEqual(build_lcp_array(sequence, suffix_array), [0, 1, 3, 0, 0, 2])
+        self.assertEqual(build_suffix_array(np.array([], dtype=np.int64)).tolist(), [])
+
+    def test_find_maximal_repeats(self):
+        from my_ghost_writer.repeated_phrases import build_lcp_array, build_suffix_array, find_maximal_repeats
+        sequence = [7, 1, 2, 3, 4, 8, 1, 2, 3, 4, 9, 2, 3, 10]
+        suffix_array = build_suffix_array(np.array(sequence)).tolist()
+        lcp = build_lcp_array(sequence, suffix_array)
+        repeats = find_maximal_repeats(sequence, suffix_array, lcp, min_words=2)
+        # [2, 3] occurs 3 times but [3, 4] is always preceded by 2, so it isn't maximal
+        self.assertEqual(sorted(repeats), [(2, [2, 7, 11]), (4, [1, 6])])
+        self.assertEqual(find_maximal_repeats(sequence, suffix_array, lcp, min_words=2, min_count=3), [(2, [2, 7, 11])])
+
+    def test_get_repeated_phrases(self):
+        from my_ghost_writer.repeated_phrases import get_repeated_phrases
+        text = "The cat sat on the mat, then the cat sat on the mat again.\nThe cat sat on the sofa."
+        n_total_rows, repeated_phrases = get_repeated_phrases(text, min_words=3)
+        self.assertEqual(n_total_rows, 2)
+        self.assertEqual([(phrase["phrase_stem"], phrase["count"]) for phrase in repeated_phrases], [
+            ("the cat sat on the mat", 2), ("the cat sat on the", 3)
+        ])
+        self.assertEqual(repeated_phrases[0]["offsets_array"], [
+            {"word": "The cat sat on the mat", "offsets": [0, 22], "n_row": 0, "n_row_child": None, "n_row_parent": None},
+            {"word": "the cat sat on the mat", "offsets": [29, 51], "n_row": 0, "n_row_child": None, "n_row_parent": None}
+        ])
+        self.assertEqual(repeated_phrases[1]["offsets_array"][2]["n_row"], 1)
+        _, repeated_phrases = get_repeated_phrases(text, min_words=3, top_k=1)
+        self.assertEqual(len(repeated_phrases), 1)
+
+    def test_get_repeated_phrases_sentence_filter(self):
+        from my_ghost_writer.repeated_phrases import get_repeated_phrases
+        text = "It was late. It was late. It was"
+        # "it wa late . it wa" occurs at overlapping positions, so it's a tandem run and isn't reported
+        _, repeated_phrases = get_repeated_phrases(text, min_words=2)
+        self.assertEqual([phrase["phrase_stem"] for phrase in repeated_phrases], ["it wa"])
+        _, repeated_phrases = get_repeated_phrases(text, min_words=2, token_filters=["sentence"])
+        self.assertEqual([phrase["phrase_stem"] for phrase in repeated_phrases], ["it wa late", "it wa"])
+
+    def test_get_repeated_phrases_tandem_runs(self):
+        from my_ghost_writer.repeated_phrases import get_repeated_phrases
+        sentence = "The old man walked slowly to the river. "
+        text = sentence * 1200
+        _, repeated_phrases = get_repeated_phrases(text, min_words=4)
+        self.assertEqual([(phrase["phrase_stem"], phrase["count"]) for phrase in repeated_phrases], [
+            ("the old man walk slowli to the river .", 1200)
+        ])
+        _, repeated_phrases = get_repeated_phrases(sentence * 600 + "Nothing else. " + sentence * 600, min_words=4)
+        self.assertEqual([(phrase["n_words_ngram"], phrase["count"]) for phrase in repeated_phrases], [(5400, 2), (9, 1200)])
+
+    def test_get_repeated_phrases_top_k(self):
+        from my_ghost_writer.repeated_phrases import get_repeated_phrases
+        text = "\n".join([f"word{i} and then the same phrase ends here {i}" for i in range(50)])
+        _, repeated_phrases = get_repeated_phrases(text, min_words=3)
+        self.assertEqual(len(repeated_phrases), 1)
+        with patch("my_ghost_writer.repeated_phrases.REPEATED_PHRASES_MAX_RESULTS", 1):
+            _, repeated_phrases = get_repeated_phrases("a b c d. a b c d. x y z w. x y z w.", min_words=4, token_filters=["sentence"])
+        self.assertEqual(len(repeated_phrases), 1)
+
+    def test_get_repeated_phrases_word_prefix(self):
+        from my_ghost_writer.repeated_phrases import get_repeated_phrases
+        text = "Once upon a time.\nonce upon a time.\nonce upon a time."
+        _, repeated_phrases = get_repeated_phrases(text, min_words=4)
+        self.assertEqual(repeated_phrases[0]["word_prefix"], "once upon a time.")
+        self.assertEqual(repeated_phrases[0]["offsets_array"][0]["word"], "Once upon a time.")
+
+    def test_get_repeated_phrases_long_text(self):
+        from my_ghost_writer.repeated_phrases import get_repeated_phrases
+        with open(EVENTS_FOLDER / "very_long_text.txt", "r") as src:
+            text = src.read()
+        _, repeated_phrases = get_repeated_phrases(text, min_words=8)
+        for phrase in repeated_phrases:
+            self.assertGreaterEqual(phrase["n_words_ngram"], 8)
+            self.assertGreaterEqual(phrase["count"], 2)
+            words = {offsets["word"].lower() for offsets in phrase["offsets_array"]}
+            self.assertLessEqual(len(words), phrase["count"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class TestResultCache(unittest.TestCase):
+    def test_get_content_hash(self):
+        from my_ghost_writer.result_cache import get_content_hash
+        rows = [{"idxRow": 0, "text": "Hello world"}, {"idxRow": 1, "text": "Hi"}]
+        rows_with_parents = [{"idxRow": 0, "text": "Hello world", "idxRowChild": None, "idxRowParent": None}, {"idxRow": 1, "text": "Hi"}]
+        self.assertEqual(get_content_hash(rows, 3), get_content_hash(rows_with_parents, 3))
+        self.assertNotEqual(get_content_hash(rows, 3), get_content_hash(rows, 2))
+        self.assertNotEqual(get_content_hash(rows, 3), get_content_hash([{"idxRow": 0, "text": "Hello world\nHi"}], 3))
+        self.assertNotEqual(get_content_hash(rows, 3), get_content_hash([{"idxRow": 1, "text": "Hello world"}, {"idxRow": 1, "text": "Hi"}], 3))
+
+    def test_memory_lru(self):
+        from my_ghost_writer.result_cache import ResultCache
+        cache = ResultCache(2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        stats = cache.get_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["n_items"], 2)
+        self.assertAlmostEqual(stats["hit_ratio"], 0.6667)
+        cache.clear()
+        self.assertEqual(cache.get_stats()["n_items"], 0)
+
+    def test_disk_tier(self):
+        from my_ghost_writer.result_cache import ResultCache
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResultCache(1, disk_folder=tmp_dir, disk_max_bytes=10 ** 6)
+            cache.set("a", {"value": [1, 2, 3]})
+            cache.set("b", {"value": [4]})
+            # "a" is evicted from memory but it's still on disk
+            self.assertEqual(cache.get("a"), {"value": [1, 2, 3]})
+            stats = cache.get_stats()
+            self.assertEqual(stats["disk_hits"], 1)
+            self.assertEqual(stats["evictions"], 2)
+            # a new cache instance reads the disk tier
+            other_cache = ResultCache(1, disk_folder=tmp_dir, disk_max_bytes=10 ** 6)
+            self.assertEqual(other_cache.get("b"), {"value": [4]})
+
+    def test_disk_tier_eviction(self):
+        from my_ghost_writer.result_cache import ResultCache
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ResultCache(1, disk_folder=tmp_dir, disk_max_bytes=3000)
+            for key in ["a", "b", "c"]:
+                cache.set(key, "x" * 1000)
+            self.assertEqual(cache.get_stats()["disk_evictions"], 1)
+            self.assertEqual(sorted(path.stem for path in Path(tmp_dir).glob("*.pkl")), ["b", "c"])
+            self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
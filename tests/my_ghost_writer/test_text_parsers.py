@@ -119,25 +119,247 @@ class TestTextParsers(unittest.TestCase):
                 self.assertEqual(str(e), "Invalid input type. Expected plain text str, json str or list of dictionaries, not '<class 'dict'>'.")
                 raise e
 
-    def test_update_stems_list(self):
-        from my_ghost_writer.text_parsers import update_stems_list
-        with open(EVENTS_FOLDER / "update_stem_list_inputs.json", "r") as src:
-            test_args = json.load(src)
-            test_args_inputs = test_args["input"]
-            test_args_outputs = test_args["output"]
-        for arg, expected in zip(test_args_inputs, test_args_outputs):
-            n_row = arg['n_row']
-            offsets = arg['offsets']
-            word = arg['word']
-            current_stem_tuple = arg['current_stem_tuple']
-            n_row_child = arg["n_row_child"]
-            n_row_parent = arg["n_row_parent"]
-            expected_offsets_array = expected['offsets_array']
-            expected_count = expected['count']
-            count, word_offsets = update_stems_list(current_stem_tuple, word, offsets, n_row=n_row, n_row_child=n_row_child, n_row_parent=n_row_parent)
-            self.assertEqual(count, expected_count)
-            self.assertEqual(word_offsets, expected_offsets_array)
+    def test_stem_word_cache(self):
+        from my_ghost_writer.text_parsers import get_stem_cache_info, stem_word
+        stem_word.cache_clear()
+        self.assertEqual(stem_word("running"), self.ps.stem("running"))
+        self.assertEqual(stem_word("running"), "run")
+        self.assertEqual(stem_word("Houses"), "hous")
+        cache_info = get_stem_cache_info()
+        self.assertEqual(cache_info["hits"], 1)
+        self.assertEqual(cache_info["misses"], 2)
+        self.assertEqual(cache_info["currsize"], 2)
+        self.assertGreater(cache_info["maxsize"], 0)
 
+    def test_tokenize_with_spans(self):
+        from my_ghost_writer.text_parsers import tokenize_with_spans
+        for row in self.text_split_newline + ["Good muffins cost $3.88\nin New York.  Please buy me\ntwo of them.\n\nThanks.", ""]:
+            tokens_spans = list(tokenize_with_spans(row))
+            self.assertEqual([token for token, _, _ in tokens_spans], wordpunct_tokenize(row))
+            self.assertEqual([(start, end) for _, start, end in tokens_spans], list(WordPunctTokenizer().span_tokenize(row)))
+
+    def test_text_stemming_same_payload_as_nltk_tokenizers(self):
+        from my_ghost_writer.text_parsers import get_words_tokens_and_indexes_ngrams, text_stemming
+        row_words_tokens, row_offsets_tokens, idx_rows, idx_rows_child, idx_rows_parent, rows_dict = get_inputs_for(
+            self.text_json_list_with_parents
+        )
+        expected_words_stems_dict = get_words_tokens_and_indexes_ngrams(
+            row_words_tokens, row_offsets_tokens, idx_rows, idx_rows_child, idx_rows_parent, rows_dict=rows_dict, n=3
+        )
+        _, words_stems_dict = text_stemming(self.text_json_list_with_parents, n=3)
+        self.assertEqual(json.dumps(words_stems_dict), json.dumps(expected_words_stems_dict))
+
+    def test_count_ngrams_ids(self):
+        from my_ghost_writer.text_parsers import count_ngrams_ids, get_ngram_stem, tokenize_with_spans
+        rows = ["The cats ran, the cat runs.", "Cats run"]
+        stems_list, ngram_occurrences = count_ngrams_ids([tokenize_with_spans(row) for row in rows], n=2)
+        self.assertEqual(stems_list, ["the", "cat", "ran", ",", "run", "."])
+        self.assertEqual(ngram_occurrences[1].tolist(), [0, 4, 8, 0, 18, 21, 1, 0, 4])
+        self.assertEqual(ngram_occurrences[(1, 4)].tolist(), [0, 18, 26, 1, 0, 8])
+        self.assertEqual(ngram_occurrences[(0, 1)].tolist(), [0, 0, 8, 0, 14, 21])
+        self.assertEqual(get_ngram_stem(stems_list, 4), "run")
+        self.assertEqual(get_ngram_stem(stems_list, (0, 1, 4)), "the cat run")
+        self.assertEqual(len(ngram_occurrences), 6 + 6)
+
+    def test_count_ngrams_ids_lemmas(self):
+        from my_ghost_writer.text_parsers import count_ngrams_ids
+        rows_tokens = [
+            [("She", 0, 3, "she"), ("went", 4, 8, "go"), ("home", 9, 13, "home"), (".", 13, 14, ".")],
+            [("They", 0, 4, "they"), ("go", 5, 7, "go"), ("home", 8, 12, "home")]
+        ]
+        stems_list, ngram_occurrences = count_ngrams_ids(rows_tokens, n=2, token_filters=["punctuation"], by_lemma=True)
+        self.assertEqual(stems_list, ["she", "go", "home", "they"])
+        self.assertEqual(ngram_occurrences[1].tolist(), [0, 4, 8, 1, 5, 7])
+        self.assertEqual(ngram_occurrences[(1, 2)].tolist(), [0, 4, 13, 1, 5, 12])
+
+    def test_text_stemming_columnar(self):
+        from my_ghost_writer.text_parsers import text_stemming
+        _, words_stems_dict = text_stemming(self.text_json_list_with_parents, n=3)
+        n_total_rows, columnar_dict = text_stemming(self.text_json_list_with_parents, n=3, response_format="columnar")
+        self.assertEqual(n_total_rows, len(self.text_json_list_with_parents))
+        self.assertEqual(list(columnar_dict["stems"]), list(words_stems_dict))
+        rows = columnar_dict["rows"]
+        n_rows_child = [None if idx == -1 else idx for idx in rows["n_row_child"]]
+        n_rows_parent = [None if idx == -1 else idx for idx in rows["n_row_parent"]]
+        for stem, entry in columnar_dict["stems"].items():
+            expected_entry = words_stems_dict[stem]
+            self.assertEqual(entry["count"], expected_entry["count"])
+            self.assertEqual(entry["word_prefix"], expected_entry["word_prefix"])
+            self.assertEqual(entry["n_words_ngram"], expected_entry["n_words_ngram"])
+            offsets_array = [{
+                "word": columnar_dict["words"][word_id],
+                "offsets": [start, end],
+                "n_row": rows["n_row"][n_row_position],
+                "n_row_child": n_rows_child[n_row_position],
+                "n_row_parent": n_rows_parent[n_row_position]
+            } for word_id, start, end, n_row_position in zip(entry["word_ids"], entry["starts"], entry["ends"], entry["rows"])]
+            self.assertEqual(offsets_array, expected_entry["offsets_array"])
+        self.assertEqual(len(columnar_dict["words"]), len(set(columnar_dict["words"])))
+
+    def test_split_rows_in_chunks(self):
+        from my_ghost_writer.text_parsers import split_rows_in_chunks
+        self.assertEqual(split_rows_in_chunks(["a", "bb", "", "ccc"], 2), [(0, 2), (2, 4)])
+        self.assertEqual(split_rows_in_chunks(["a", "b", "c", "d"], 4), [(0, 1), (1, 2), (2, 3), (3, 4)])
+        self.assertEqual(split_rows_in_chunks(["a"], 4), [(0, 1)])
+        self.assertEqual(split_rows_in_chunks([], 4), [(0, 0)])
+
+    def test_text_stemming_parallel(self):
+        from my_ghost_writer import text_parsers
+        try:
+            with open(EVENTS_FOLDER / "llm_generated_story_1.txt", "r") as src:
+                text = src.read()
+            _, words_stems_dict = text_parsers.text_stemming(text, n=3, parallel=False)
+            _, words_stems_dict_parallel = text_parsers.text_stemming(text, n=3, parallel=True)
+            self.assertEqual(json.dumps(words_stems_dict_parallel), json.dumps(words_stems_dict))
+            rows = text.split("\n")
+            stems_list, ngram_occurrences = text_parsers.count_ngrams_ids_by_rows(rows, n=2)
+            stems_list_parallel, ngram_occurrences_parallel = text_parsers.count_ngrams_ids_parallel(rows, n=2, n_chunks=5)
+            self.assertEqual(stems_list_parallel, stems_list)
+            self.assertEqual(ngram_occurrences_parallel, ngram_occurrences)
+        finally:
+            text_parsers.shutdown_process_pool()
+
+    def test_text_stemming_filters_and_offsets_limit(self):
+        from my_ghost_writer.text_parsers import text_stemming
+        _, words_stems_dict = text_stemming(self.original_text, n=3)
+        _, filtered_dict = text_stemming(self.original_text, n=3, min_count=3, n_words_ngram=[1, 2])
+        expected_stems = [stem for stem, entry in words_stems_dict.items() if entry["count"] >= 3 and entry["n_words_ngram"] < 3]
+        self.assertEqual(list(filtered_dict), expected_stems)
+        _, top_dict = text_stemming(self.original_text, n=3, top_k=4, offsets_limit=2)
+        expected_top = sorted(words_stems_dict, key=lambda stem: words_stems_dict[stem]["count"], reverse=True)[:4]
+        self.assertEqual(list(top_dict), expected_top)
+        for stem, entry in top_dict.items():
+            self.assertEqual(entry["count"], words_stems_dict[stem]["count"])
+            self.assertEqual(entry["word_prefix"], words_stems_dict[stem]["word_prefix"])
+            self.assertEqual(entry["offsets_array"], words_stems_dict[stem]["offsets_array"][:2])
+            self.assertEqual(entry["next_cursor"], 2)
+        _, columnar_dict = text_stemming(self.original_text, n=3, top_k=1, offsets_limit=0, response_format="columnar")
+        columnar_entry = columnar_dict["stems"][expected_top[0]]
+        self.assertEqual(columnar_entry["starts"], [])
+        self.assertEqual(columnar_entry["next_cursor"], 0)
+
+    def test_get_ngram_offsets(self):
+        from my_ghost_writer.text_parsers import count_text_ngrams, get_ngram_offsets, text_stemming
+        _, words_stems_dict = text_stemming(self.text_json_list_no_parents, n=3)
+        ngrams_count = count_text_ngrams(self.text_json_list_no_parents, n=3)
+        for stem, entry in words_stems_dict.items():
+            offsets_page = get_ngram_offsets(ngrams_count, stem)
+            self.assertEqual(offsets_page["count"], entry["count"])
+            self.assertEqual(offsets_page["offsets_array"], entry["offsets_array"])
+            self.assertIsNone(offsets_page["next_cursor"])
+        stem, entry = max(words_stems_dict.items(), key=lambda item: item[1]["count"])
+        offsets_page = get_ngram_offsets(ngrams_count, stem, cursor=1, limit=1)
+        self.assertEqual(offsets_page["offsets_array"], entry["offsets_array"][1:2])
+        self.assertEqual(offsets_page["next_cursor"], 2 if entry["count"] > 2 else None)
+        self.assertEqual(get_ngram_offsets(ngrams_count, "missing stem"), {"count": 0, "offsets_array": [], "next_cursor": None})
+        # the stems ids are built only once for every content hash
+        from my_ghost_writer.text_parsers import get_stems_ids, stems_ids_cache
+        stems_ids_cache.clear()
+        self.assertEqual(get_ngram_offsets(ngrams_count, stem, content_hash="hash")["count"], entry["count"])
+        self.assertIs(get_stems_ids(ngrams_count, "hash"), get_stems_ids(ngrams_count, "hash"))
+        self.assertEqual(stems_ids_cache.get_stats()["misses"], 1)
+
+    def test_split_tokens_segments(self):
+        from my_ghost_writer.text_parsers import split_tokens_segments, tokenize_with_spans
+        row = 'He said: "Stop!" and left.'
+        self.assertEqual(split_tokens_segments(tokenize_with_spans(row), None), [list(tokenize_with_spans(row))])
+        self.assertEqual(split_tokens_segments(tokenize_with_spans(row), ["sentence"]), [
+            [("He", 0, 2), ("said", 3, 7), (":", 7, 8), ('"', 9, 10), ("Stop", 10, 14)], [('!"', 14, 16)],
+            [("and", 17, 20), ("left", 21, 25)], [(".", 25, 26)]
+        ])
+        self.assertEqual(split_tokens_segments(tokenize_with_spans(row), ["sentence", "punctuation"]), [
+            [("He", 0, 2), ("said", 3, 7), ("Stop", 10, 14)], [("and", 17, 20), ("left", 21, 25)]
+        ])
+
+    def test_iter_ngrams_windows(self):
+        from my_ghost_writer.text_parsers import iter_ngrams_windows, tokenize_with_spans
+        segment = list(tokenize_with_spans("the cat of the house"))
+        windows = [(n_words_ngram, list(starts)) for n_words_ngram, starts in iter_ngrams_windows(segment, n=3)]
+        self.assertEqual(windows, [(1, [0, 1, 2, 3, 4]), (2, [0, 1, 2, 3]), (3, [0, 1, 2])])
+        # "of the" is made only by stopwords, "cat of the" isn't
+        windows = [(n_words_ngram, list(starts)) for n_words_ngram, starts in iter_ngrams_windows(segment, n=3, skip_stopwords=True)]
+        self.assertEqual(windows, [(1, [1, 4]), (2, [0, 1, 3]), (3, [0, 1, 2])])
+
+    def test_text_stemming_token_filters(self):
+        from my_ghost_writer.text_parsers import count_text_ngrams, get_ngram_offsets, text_stemming
+        text = "The cat sat. On the mat, the cat!"
+        _, words_stems_dict = text_stemming(text, n=2, token_filters=["punctuation", "stopwords", "sentence"])
+        self.assertEqual(list(words_stems_dict), ["cat", "sat", "the cat", "cat sat", "mat", "the mat", "mat the"])
+        self.assertEqual(words_stems_dict["the cat"]["count"], 2)
+        _, words_stems_dict = text_stemming(text, n=2, token_filters=["stopwords"])
+        self.assertNotIn("the", words_stems_dict)
+        self.assertNotIn("on the", words_stems_dict)
+        self.assertIn(". on", words_stems_dict)
+        self.assertIn("sat .", words_stems_dict)
+        ngrams_count = count_text_ngrams(text, n=2, token_filters=["stopwords"])
+        for stem, entry in words_stems_dict.items():
+            offsets_page = get_ngram_offsets(ngrams_count, stem)
+            self.assertEqual(offsets_page["offsets_array"], entry["offsets_array"])
+
+    def test_text_stemming_cached(self):
+        from my_ghost_writer.result_cache import words_frequency_cache
+        from my_ghost_writer.text_parsers import count_text_ngrams_cached, text_stemming, text_stemming_cached
+        words_frequency_cache.clear()
+        _, expected_words_stems_dict = text_stemming(self.text_json_list_no_parents, n=3)
+        n_total_rows, words_stems_dict, content_hash, cache_hit = text_stemming_cached(self.text_json_list_no_parents, n=3)
+        self.assertFalse(cache_hit)
+        self.assertEqual(n_total_rows, len(self.text_json_list_no_parents))
+        self.assertEqual(words_stems_dict, expected_words_stems_dict)
+        n_total_rows, words_stems_dict, json_content_hash, cache_hit = text_stemming_cached(json.dumps(self.text_json_list_no_parents), n=3)
+        self.assertTrue(cache_hit)
+        self.assertEqual(json_content_hash, content_hash)
+        self.assertEqual(words_stems_dict, expected_words_stems_dict)
+        _, _, n2_content_hash, cache_hit = text_stemming_cached(self.text_json_list_no_parents, n=2)
+        self.assertFalse(cache_hit)
+        self.assertNotEqual(n2_content_hash, content_hash)
+        _, content_hash, cache_hit = count_text_ngrams_cached(self.text_json_list_no_parents, n=3, token_filters=["punctuation"])
+        self.assertFalse(cache_hit)
+        self.assertEqual(len(content_hash), 64)
+        self.assertEqual(words_frequency_cache.get_stats()["hits"], 1)
+
+    def test_get_ngrams_histograms(self):
+        from my_ghost_writer.text_parsers import count_text_ngrams, get_ngrams_histograms, text_stemming
+        ngrams_count = count_text_ngrams("cat dog cat\nbird\ncat", n=2)
+        histograms = get_ngrams_histograms(ngrams_count, n_bins=4)
+        # total length 20 chars (rows joined by a newline): 5 chars for every bin
+        self.assertEqual(histograms["cat"], [1, 1, 0, 1])
+        self.assertEqual(histograms["dog"], [1, 0, 0, 0])
+        self.assertEqual(histograms["dog cat"], [1, 0, 0, 0])
+        self.assertEqual(histograms["bird"], [0, 0, 1, 0])
+        histograms = get_ngrams_histograms(ngrams_count, n_bins=3, histogram_by="rows")
+        self.assertEqual(histograms["cat"], [2, 0, 1])
+        self.assertEqual(histograms["bird"], [0, 1, 0])
+        ngrams_count = count_text_ngrams(self.text_json_list_no_parents, n=3)
+        _, words_stems_dict = text_stemming(self.text_json_list_no_parents, n=3)
+        histograms = get_ngrams_histograms(ngrams_count, n_bins=7)
+        self.assertEqual(list(histograms), list(words_stems_dict))
+        for ngram_stem, histogram in histograms.items():
+            self.assertEqual(len(histogram), 7)
+            self.assertEqual(sum(histogram), words_stems_dict[ngram_stem]["count"])
+        self.assertEqual(get_ngrams_histograms(count_text_ngrams("", n=2)), {})
+
+    def test_get_bigrams_collocations(self):
+        from nltk.metrics import BigramAssocMeasures
+        from my_ghost_writer.text_parsers import count_text_ngrams, get_bigrams_collocations
+        ngrams_count = count_text_ngrams("a b a b c d a b e f c d", n=2)
+        collocations = get_bigrams_collocations(ngrams_count, min_count=2)
+        self.assertEqual([(collocation["stem"], collocation["count"]) for collocation in collocations], [("a b", 3), ("c d", 2)])
+        self.assertAlmostEqual(collocations[0]["log_likelihood"], BigramAssocMeasures.likelihood_ratio(3, (3, 3), 12), places=3)
+        self.assertAlmostEqual(collocations[0]["pmi"], BigramAssocMeasures.pmi(3, (3, 3), 12), places=3)
+        self.assertAlmostEqual(collocations[1]["log_likelihood"], BigramAssocMeasures.likelihood_ratio(2, (2, 2), 12), places=3)
+        collocations = get_bigrams_collocations(ngrams_count, min_count=2, sort_by="pmi", top_k=1)
+        self.assertEqual([collocation["stem"] for collocation in collocations], ["c d"])
+        self.assertEqual(get_bigrams_collocations(ngrams_count, min_count=4), [])
+        # "a b" occurs less than expected from the "a" and "b" counts (pmi < 0), so it isn't a collocation
+        ngrams_count = count_text_ngrams("a a a a a a b b b b b b a b c d a b c d", n=2)
+        collocations = get_bigrams_collocations(ngrams_count, min_count=2)
+        self.assertEqual([collocation["stem"] for collocation in collocations], ["c d", "b c", "a a", "b b"])
+        self.assertTrue(all(collocation["pmi"] > 0 for collocation in collocations))
+        # the bigrams with an uncounted stopword are skipped
+        ngrams_count = count_text_ngrams("the cat, the cat, the cat", n=2, token_filters=["stopwords"])
+        self.assertEqual(get_bigrams_collocations(ngrams_count, min_count=1), [
+            {"stem": "cat ,", "count": 2, "pmi": 0.737, "log_likelihood": 2.911}
+        ])
 
     def test_get_words_tokens_and_indexes_ngrams_no_parents(self):
         from my_ghost_writer.text_parsers import get_words_tokens_and_indexes_ngrams
@@ -204,6 +426,37 @@ class TestTextParsers(unittest.TestCase):
             self.assertEqual(start_in_sentence, expected_start_in_sentence)
             self.assertEqual(end_in_sentence, expected_end_in_sentence)
 
+    def test_get_sentence_by_word_boundaries_cache(self):
+        import re
+        from unittest.mock import MagicMock, patch
+        from my_ghost_writer.text_parsers import (get_sentence_by_word, get_sentences_boundaries, get_sentences_by_words,
+            sentences_boundaries_cache)
+        text = "First sentence here. Second one!  Third."
+        tokenizer_mock = MagicMock()
+        tokenizer_mock.span_tokenize.side_effect = lambda txt: [match.span() for match in re.finditer(r"[^\s][^.!?]*[.!?]", txt)]
+        sentences_boundaries_cache.clear()
+        with patch("my_ghost_writer.text_parsers.get_punkt_tokenizer", return_value=tokenizer_mock):
+            starts, ends = get_sentences_boundaries(text)
+            self.assertEqual(starts.tolist(), [0, 21, 34])
+            self.assertEqual(ends.tolist(), [20, 32, 40])
+            self.assertEqual(get_sentence_by_word(text, "sentence", 6, 14), ("First sentence here.", 6, 14))
+            self.assertEqual(get_sentence_by_word(text, "one", 28, 31), ("Second one!", 7, 10))
+            self.assertEqual(get_sentence_by_word(text, "Third", 34, 39), ("Third.", 0, 5))
+            with self.assertRaises(ValueError):
+                # between two sentences
+                get_sentence_by_word(text, " ", 33, 34)
+            with self.assertRaises(AssertionError):
+                get_sentence_by_word(text, "Second", 28, 31)
+            sentences = get_sentences_by_words(text, [(6, 14, "sentence"), (34, 39, "Third"), (28, 31, "two"), (21, 27, "Second")])
+        self.assertEqual(sentences, [
+            {"sentence": "First sentence here.", "start_in_sentence": 6, "end_in_sentence": 14},
+            {"sentence": "Third.", "start_in_sentence": 0, "end_in_sentence": 5},
+            {"error": "word 'two' doesn't match with start '28' and end '31' positions!"},
+            {"sentence": "Second one!", "start_in_sentence": 0, "end_in_sentence": 6}
+        ])
+        tokenizer_mock.span_tokenize.assert_called_once_with(text)
+        self.assertEqual(sentences_boundaries_cache.get_stats()["n_items"], 1)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -304,6 +304,72 @@ class TestTextParsers2(unittest.TestCase):
         result = process_synonym_groups("look", context_info)
         self.assertListEqual(result, [])
 
+    @staticmethod
+    def get_nlp_lemmas_mock():
+        from types import SimpleNamespace
+
+        lemmas = {"went": "go", "children": "child", "ran": "run"}
+
+        def pipe(rows, **kwargs):
+            from my_ghost_writer.text_parsers import tokenize_with_spans
+            for row in rows:
+                tokens = [SimpleNamespace(text=word, idx=start, lemma_=lemmas.get(word, word), is_space=False)
+                          for word, start, _ in tokenize_with_spans(row)]
+                yield tokens + [SimpleNamespace(text="\n", idx=len(row), lemma_="\n", is_space=True)]
+
+        nlp_mock = MagicMock()
+        nlp_mock.pipe_names = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner"]
+        nlp_mock.pipe.side_effect = pipe
+        return nlp_mock
+
+    def test_lemmatize_rows_with_spans(self):
+        from my_ghost_writer.text_parsers2 import lemmatize_rows_with_spans
+        nlp_mock = self.get_nlp_lemmas_mock()
+        with patch("my_ghost_writer.text_parsers2.nlp", new=nlp_mock):
+            rows_tokens = lemmatize_rows_with_spans(["The children went", "Hi"], batch_size=8)
+        self.assertEqual(rows_tokens, [
+            [("The", 0, 3, "the"), ("children", 4, 12, "child"), ("went", 13, 17, "go")], [("Hi", 0, 2, "hi")]
+        ])
+        nlp_mock.pipe.assert_called_once_with(["The children went", "Hi"], batch_size=8, n_process=1, disable=["parser", "ner"])
+
+    @patch("my_ghost_writer.text_parsers2.nlp", new=None)
+    def test_lemmatize_rows_with_spans_nlp_unavailable(self):
+        from my_ghost_writer.text_parsers2 import lemmatize_rows_with_spans
+        with self.assertRaises(HTTPException) as context:
+            lemmatize_rows_with_spans(["text"])
+        self.assertEqual(context.exception.status_code, 503)
+
+    def test_count_text_ngrams_lemmas(self):
+        from my_ghost_writer.text_parsers import get_words_frequency_from_count
+        from my_ghost_writer.text_parsers2 import count_text_ngrams_lemmas
+        with patch("my_ghost_writer.text_parsers2.nlp", new=self.get_nlp_lemmas_mock()):
+            ngrams_count = count_text_ngrams_lemmas("The children went home.\nThe child went home, then goes out", n=2, token_filters=["punctuation"])
+        words_frequency = get_words_frequency_from_count(ngrams_count)
+        self.assertEqual(words_frequency["child"]["count"], 2)
+        self.assertEqual(words_frequency["child"]["word_prefix"], "children")
+        self.assertEqual([offsets["offsets"] for offsets in words_frequency["go home"]["offsets_array"]], [[13, 22], [10, 19]])
+        self.assertEqual(words_frequency["go"]["count"], 2)
+        # the lemmatizer mock doesn't know "goes"
+        self.assertEqual(words_frequency["goes"]["count"], 1)
+
+    def test_get_document_doc(self):
+        import numpy as np
+        from my_ghost_writer.document_registry import document_registry
+        from my_ghost_writer.text_parsers2 import get_document_doc
+        document_id = document_registry.add("A parsed document.")["document_id"]
+        doc_mock = MagicMock()
+        doc_mock.__len__.return_value = 4
+        doc_mock.tensor = np.zeros((4, 96), dtype=np.float32)
+        nlp_mock = MagicMock(return_value=doc_mock)
+        with patch("my_ghost_writer.text_parsers2.nlp", new=nlp_mock):
+            self.assertIs(get_document_doc(document_id), doc_mock)
+            self.assertIs(get_document_doc(document_id), doc_mock)
+            with self.assertRaises(KeyError):
+                get_document_doc("missing")
+        nlp_mock.assert_called_once_with("A parsed document.")
+        self.assertEqual(document_registry.documents[document_id]["artifacts"]["spacy_doc"][1], 4 * 256 + 4 * 96 * 4)
+        document_registry.remove(document_id)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+
+class TestWordsFrequencySearch(unittest.TestCase):
+    def setUp(self):
+        from my_ghost_writer.text_parsers import count_text_ngrams
+        from my_ghost_writer.words_frequency_search import search_index_cache
+        search_index_cache.clear()
+        self.ngrams_count = count_text_ngrams(
+            "The dark night. The darker room was dark. A dart hit the dark door.", n=2, token_filters=["punctuation"]
+        )
+
+    def test_search_index_match(self):
+        from my_ghost_writer.words_frequency_search import WordsFrequencySearchIndex
+        search_index = WordsFrequencySearchIndex(self.ngrams_count)
+        self.assertEqual(search_index.stems, sorted(search_index.stems))
+        self.assertEqual([search_index.stems[i] for i in search_index.match("DAR")], [
+            "dark", "dark a", "dark door", "dark night", "darker", "darker room", "dart", "dart hit"
+        ])
+        self.assertEqual([search_index.stems[i] for i in search_index.match("oor", "substring")], ["dark door", "door"])
+        self.assertEqual(search_index.match("zzz"), [])
+        self.assertEqual(len(search_index.match("")), len(search_index.stems))
+        self.assertEqual([search_index.stems[i] for i in search_index.match(r"^dar[kt]$", "regex")], ["dark", "dart"])
+
+    def test_search_words_frequency(self):
+        from my_ghost_writer.words_frequency_search import search_index_cache, search_words_frequency
+        result = search_words_frequency(self.ngrams_count, "hash", query="dar", n_words_ngram=[1], limit=2)
+        self.assertEqual(list(result["words_frequency"]), ["dark", "darker"])
+        self.assertEqual(result["words_frequency"]["dark"]["count"], 3)
+        self.assertEqual((result["n_matches"], result["next_offset"]), (3, 2))
+        result = search_words_frequency(self.ngrams_count, "hash", query="dar", n_words_ngram=[1], offset=2, limit=2)
+        self.assertEqual((list(result["words_frequency"]), result["next_offset"]), (["dart"], None))
+        result = search_words_frequency(self.ngrams_count, "hash", query="dar", sort_by="alphabetical", reverse=True, n_words_ngram=[1])
+        self.assertEqual(list(result["words_frequency"]), ["dart", "darker", "dark"])
+        result = search_words_frequency(self.ngrams_count, "hash", min_count=2, offsets_limit=1)
+        self.assertEqual(list(result["words_frequency"]), ["dark", "the", "the dark"])
+        self.assertEqual(len(result["words_frequency"]["dark"]["offsets_array"]), 1)
+        # the index is built only once for every content hash
+        self.assertEqual(search_index_cache.get_stats()["n_items"], 1)
+        self.assertGreaterEqual(search_index_cache.get_stats()["hits"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()